@@ -0,0 +1,96 @@
+### Benchmark of a daily rerun through the aggregate store on synthetic surveys.
+### For each size, the live fish and carcass records of one season are joined once, then summarized: in full by derive and group, by a SurveyAggregates store holding nothing, by the store again with no record changed, and by the store with one record edited. The row hashing that every store run does to find the changes is also timed on its own, since its cost grows with the season rather than with the edits.
+### Usage: python benchmarks/bench_aggregate.py [--sizes 10000,100000,1000000]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic import CUTOVER_SEASON, synthetic_survey_frames
+from wlpsalmon import summary
+from wlpsalmon.aggregate import SurveyAggregates
+from wlpsalmon.joins import SurveyIndex
+from wlpsalmon.keys import add_guid_keys
+from wlpsalmon.memo import INPUT_FIELDS
+from wlpsalmon.schema import apply_categories
+from wlpsalmon.timezones import REPORT_TIMEZONE_COLUMNS, convert_timezones, local_wall_time
+
+### Default sizes, in live fish and in carcass records
+SIZES = [10 ** 4, 10 ** 5, 10 ** 6]
+
+### Sheets of the store with their derive and group functions
+SHEETS = {
+    "Live Fish": (summary.derive_live_fish, summary.group_live_fish),
+    "Carcasses": (summary.derive_carcasses, summary.group_carcasses),
+}
+
+
+def joined_records(rows, year=CUTOVER_SEASON):
+    """Returns the joined live fish and carcass records of *rows* synthetic records of each, keyed by sheet
+    : param rows: Number of live fish records, and of carcass records
+    : param year: The year of the summary
+    """
+    frames = add_guid_keys(convert_timezones(apply_categories(synthetic_survey_frames(rows, seasons=(year,))), REPORT_TIMEZONE_COLUMNS))
+    sedfMetadataYYYY = summary.filter_year(frames["Metadata"], year)
+    dfMetadataObserver = summary.join_metadata_observer(sedfMetadataYYYY, summary.observer_names(frames["Observer"], sedfMetadataYYYY, year))
+    surveys = SurveyIndex(dfMetadataObserver, local_wall_time(sedfMetadataYYYY["dtmDate_Pacific"]).dt.normalize())
+    return {
+        "Live Fish": summary.join_live_fish(surveys, dfMetadataObserver, frames["LiveFish"]),
+        "Carcasses": summary.join_carcasses(surveys, dfMetadataObserver, frames["Carcass"]),
+    }
+
+
+def _edit(dfRecords, sheet):
+    # Returns a copy of the records with the first one edited
+    dfRecords = dfRecords.copy()
+    field = "intNumCarcasses" if sheet == "Carcasses" else "intNumRedds"
+    dfRecords.iloc[0, dfRecords.columns.get_loc(field)] += 1
+    return dfRecords
+
+
+def _time(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run_size(rows, store_dir, year=CUTOVER_SEASON):
+    """Returns a list with the seconds of each way of summarizing *rows* synthetic live fish and carcass records
+    : param rows: Number of live fish records, and of carcass records
+    : param store_dir: Folder of the aggregate store
+    : param year: The year of the summary
+    """
+    records = joined_records(rows, year)
+    results = []
+    for sheet, (derive, group) in SHEETS.items():
+        dfRecords = records[sheet]
+        dfEdited = _edit(dfRecords, sheet)
+        store = SurveyAggregates(os.path.join(store_dir, str(rows)))
+        for case, func in [
+            ("full", lambda: group(derive(dfRecords))),
+            ("row hash", lambda: pd.util.hash_pandas_object(dfRecords[INPUT_FIELDS[sheet]], index=True)),
+            ("store, empty", lambda: store.summarize(year, sheet, dfRecords, derive, group)),
+            ("store, unchanged", lambda: store.summarize(year, sheet, dfRecords, derive, group)),
+            ("store, 1 edit", lambda: store.summarize(year, sheet, dfEdited, derive, group)),
+        ]:
+            results.append({"intSize": rows, "strSheet": sheet, "strCase": case, "intRecords": len(dfRecords), "dblSeconds": _time(func)})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time a rerun through the aggregate store against a full summary on synthetic surveys")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="Comma separated numbers of live fish and carcass records")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as store_dir:
+        for rows in [int(size) for size in args.sizes.split(",")]:
+            for record in run_size(rows, store_dir):
+                print(f"{rows:>10,} {record['strSheet']:<10} {record['strCase']:<17} {record['dblSeconds']:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
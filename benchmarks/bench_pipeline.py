@@ -0,0 +1,185 @@
+### Benchmark of every stage of the join and summary pipeline on synthetic surveys.
+### For each size, the synthetic layers are written to a snapshot and run through the stages of summary.build_summary and the export one at a time: load, coded fields, timezone conversion, GUID keys, joins, rule derivation, groupby, merge and Excel export. Each stage is timed, then run again under tracemalloc for its peak allocated memory. The results are written to a JSON file, and can be compared with a previous file.
+### Usage: python benchmarks/bench_pipeline.py [--sizes 1000,10000,100000] [--out bench_pipeline.json] [--compare previous.json] [--no-memory]
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic import CUTOVER_SEASON, synthetic_survey_frames
+from wlpsalmon import __version__, roster, summary
+from wlpsalmon.export import EXCEL_MAX_ROWS, write_workbook_streaming
+from wlpsalmon.joins import SurveyIndex
+from wlpsalmon.keys import add_guid_keys
+from wlpsalmon.schema import apply_categories
+from wlpsalmon.snapshot import read_snapshot, write_snapshot
+from wlpsalmon.timezones import REPORT_TIMEZONE_COLUMNS, convert_timezones, local_wall_time
+
+### Default sizes, in live fish and in carcass records; up to 10**7 can be given with --sizes
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5]
+
+
+def _rows(value):
+    # Total rows of a DataFrame, or of the DataFrames of a dictionary or tuple
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_rows(v) for v in value.values())
+    if isinstance(value, tuple):
+        return sum(_rows(v) for v in value)
+    return 0
+
+
+def _load(state):
+    return {"frames": read_snapshot(state["snapshot_dir"])}
+
+
+def _categories(state):
+    return {"frames": apply_categories(state["frames"])}
+
+
+def _timezones(state):
+    return {"frames": convert_timezones(state["frames"], REPORT_TIMEZONE_COLUMNS)}
+
+
+def _guid_keys(state):
+    return {"frames": add_guid_keys(state["frames"])}
+
+
+def _joins(state):
+    roster._ROSTERS.clear()
+    frames = state["frames"]
+    sedfMetadataYYYY = summary.filter_year(frames["Metadata"], state["year"])
+    dfMetadataObserver = summary.join_metadata_observer(sedfMetadataYYYY, summary.observer_names(frames["Observer"], sedfMetadataYYYY, state["year"]))
+    surveys = SurveyIndex(dfMetadataObserver, local_wall_time(sedfMetadataYYYY["dtmDate_Pacific"]).dt.normalize())
+    return {
+        "surveys": surveys,
+        "Metadata": dfMetadataObserver,
+        "Live Fish": summary.join_live_fish(surveys, dfMetadataObserver, frames["LiveFish"]),
+        "Carcasses": summary.join_carcasses(surveys, dfMetadataObserver, frames["Carcass"]),
+    }
+
+
+def _rules(state):
+    return {"dfLiveFish": summary.derive_live_fish(state["Live Fish"]), "dfCarcasses": summary.derive_carcasses(state["Carcasses"])}
+
+
+def _groupby(state):
+    return {"dfLiveFishSummary": summary.group_live_fish(state["dfLiveFish"]), "dfCarcassSummary": summary.group_carcasses(state["dfCarcasses"])}
+
+
+def _merge(state):
+    dfLiveFishSummary, dfCarcassSummary = summary.merge_summaries(state["surveys"], state["Metadata"], state["dfLiveFishSummary"], state["dfCarcassSummary"])
+    return {"Live Fish Summary": dfLiveFishSummary, "Carcass Summary": dfCarcassSummary}
+
+
+def _export(state):
+    sheets = {name: state[name] for name in summary.SUMMARY_SHEETS}
+    write_workbook_streaming(sheets, os.path.join(state["out_dir"], "summary.xlsx"))
+    return {}
+
+
+### Stages in pipeline order, with the state fields whose rows count as the stage output
+STAGES = [
+    ("load", _load, ["frames"]),
+    ("categories", _categories, ["frames"]),
+    ("timezones", _timezones, ["frames"]),
+    ("guid_keys", _guid_keys, ["frames"]),
+    ("joins", _joins, ["Metadata", "Live Fish", "Carcasses"]),
+    ("rules", _rules, ["dfLiveFish", "dfCarcasses"]),
+    ("groupby", _groupby, ["dfLiveFishSummary", "dfCarcassSummary"]),
+    ("merge", _merge, ["Live Fish Summary", "Carcass Summary"]),
+    ("export", _export, summary.SUMMARY_SHEETS),
+]
+
+
+def run_size(rows, out_dir, memory=True, year=CUTOVER_SEASON):
+    """Returns a list with the rows in and out, seconds and peak allocated MB of each stage on *rows* synthetic live fish and carcass records
+    : param rows: Number of live fish records, and of carcass records
+    : param out_dir: Folder for the snapshot and the workbook
+    : param memory: When True, each stage is run a second time under tracemalloc for its peak memory
+    : param year: The year of the summary
+    """
+    frames = synthetic_survey_frames(rows, seasons=(year,))
+    snapshot_dir = os.path.join(out_dir, f"snapshot_{rows}")
+    write_snapshot(frames, snapshot_dir, "bench")
+    state = {"snapshot_dir": snapshot_dir, "year": year, "out_dir": out_dir}
+    results = []
+    rows_in = _rows(frames)
+    del frames
+    for stage, func, outputs in STAGES:
+        record = {"intSize": rows, "strStage": stage, "intRowsIn": rows_in}
+        if stage == "export" and max(len(state[name]) for name in summary.SUMMARY_SHEETS) >= EXCEL_MAX_ROWS:
+            record.update({"intRowsOut": None, "dblSeconds": None, "dblPeakMB": None, "strNote": "skipped: a sheet exceeds the Excel row limit"})
+            results.append(record)
+            continue
+        start = time.perf_counter()
+        update = func(state)
+        record["dblSeconds"] = time.perf_counter() - start
+        record["dblPeakMB"] = None
+        if memory:
+            tracemalloc.start()
+            func(state)
+            record["dblPeakMB"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        state.update(update)
+        rows_in = record["intRowsOut"] = sum(_rows(state[name]) for name in outputs)
+        results.append(record)
+    return results
+
+
+def compare(results, previous):
+    """Returns a DataFrame of the seconds and peak MB of each size and stage next to those of a previous run, with their ratios
+    : param results: Result records of this run
+    : param previous: Result records of a previous run
+    """
+    dfNew = pd.DataFrame(results).set_index(["intSize", "strStage"])[["dblSeconds", "dblPeakMB"]]
+    dfOld = pd.DataFrame(previous).set_index(["intSize", "strStage"])[["dblSeconds", "dblPeakMB"]]
+    dfReport = dfOld.join(dfNew, how="inner", lsuffix="_previous")
+    dfReport["dblSecondsRatio"] = dfReport["dblSeconds"] / dfReport["dblSeconds_previous"]
+    dfReport["dblPeakMBRatio"] = dfReport["dblPeakMB"] / dfReport["dblPeakMB_previous"]
+    return dfReport.reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and profile the memory of each pipeline stage on synthetic surveys")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="Comma separated numbers of live fish and carcass records")
+    parser.add_argument("--out", default="bench_pipeline.json", help="JSON file for the results")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare with")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    args = parser.parse_args(argv)
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for rows in [int(size) for size in args.sizes.split(",")]:
+            for record in run_size(rows, out_dir, memory=not args.no_memory):
+                results.append(record)
+                seconds = "skipped" if record["dblSeconds"] is None else f"{record['dblSeconds']:.3f} s"
+                peak = "" if record["dblPeakMB"] is None else f", peak {record['dblPeakMB']:.1f} MB"
+                print(f"{rows:>10,} {record['strStage']:<11} {seconds}{peak}")
+    report = {
+        "strCreated": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "strVersion": __version__,
+        "strPython": platform.python_version(),
+        "strPandas": pd.__version__,
+        "strPlatform": platform.platform(),
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+        print(compare(results, previous).to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+### Benchmark of the categorical coded fields on synthetic live fish and carcass records.
+### Compares object text fields with the categoricals of wlpsalmon.schema for the count derivation and the per-survey groupby, checks that both give the same counts, and prints the memory and seconds taken by each.
+### Usage: python benchmarks/bench_schema.py [rows]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_rules import synthetic_carcasses, synthetic_live_fish
+from wlpsalmon.rules import CARCASS_RULES, LIVE_FISH_RULES, apply_rules
+from wlpsalmon.schema import apply_categories
+
+
+def add_survey_fields(df, species_field, surveys=2000, seed=0):
+    """Adds a survey number and a species field to synthetic records
+    : param df: Records from bench_rules
+    : param species_field: Name of the species field
+    : param surveys: Number of surveys
+    : param seed: Random seed
+    """
+    rng = np.random.default_rng(seed)
+    df["intSurvey"] = rng.integers(0, surveys, len(df))
+    df[species_field] = rng.choice(np.array(["Coho", "Chum", "Chinook", None], dtype=object), len(df))
+    return df
+
+
+def memory_mb(df, fields):
+    return df[fields].memory_usage(index=False, deep=True).sum() / (1024 * 1024)
+
+
+def derive_and_group(df, rules, species_field):
+    df = apply_rules(df.copy(deep=False), rules)
+    targets = sorted({target for target, masks, value in rules})
+    return df.groupby(["intSurvey", species_field], dropna=False, observed=True)[targets].sum().sort_index()
+
+
+def _time(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(rows=1_000_000):
+    for name, layer, df, rules, species_field in [
+        ("live fish", "LiveFish", add_survey_fields(synthetic_live_fish(rows), "strLiveSpecies"), LIVE_FISH_RULES, "strLiveSpecies"),
+        ("carcasses", "Carcass", add_survey_fields(synthetic_carcasses(rows), "strCarcassSpecies"), CARCASS_RULES, "strCarcassSpecies"),
+    ]:
+        dfCoded, seconds_convert = _time(lambda d: apply_categories({layer: d})[layer], df)
+        coded = [col for col in dfCoded.columns if isinstance(dfCoded[col].dtype, pd.CategoricalDtype)]
+        dfText, seconds_text = _time(derive_and_group, df, rules, species_field)
+        dfCodes, seconds_codes = _time(derive_and_group, dfCoded, rules, species_field)
+        same = dfText.reset_index().astype(str).equals(dfCodes.reset_index().astype(str))
+        print(f"{name}: {rows:,} rows, {len(coded)} coded fields; memory {memory_mb(df, coded):.1f} MB text, {memory_mb(dfCoded, coded):.1f} MB categorical; "
+              f"derive and group {seconds_text:.3f} s text, {seconds_codes:.3f} s categorical (+{seconds_convert:.3f} s to convert), identical {same}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,48 @@
+### Benchmark of the cold start of an offline run.
+### Starts a fresh interpreter that parses the command line of a snapshot run and imports every module the run needs, reading no data, and checks that neither arcpy nor arcgis was loaded. Prints the median seconds of several starts against the one second target, next to a bare interpreter and a bare pandas import.
+### Usage: python benchmarks/bench_startup.py [repeats]
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+### Cold start target of an offline run, in seconds
+TARGET_SECONDS = 1.0
+
+OFFLINE_START = """
+import sys
+from wlpsalmon import cli
+args = cli.build_parser().parse_args(["2021", ".", "--source", "snapshot", "--path", "."])
+source = cli.make_source(args)
+from wlpsalmon import pipeline, snapshot
+loaded = sorted(name for name in sys.modules if name.split(".")[0] in ("arcpy", "arcgis"))
+print(",".join(loaded))
+"""
+
+
+def cold_start(code, repeats):
+    """Returns (median seconds, output of the last run) of a fresh interpreter running *code*
+    : param code: Python source run with -c
+    : param repeats: Number of starts
+    """
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        seconds.append(time.perf_counter() - start)
+    return sorted(seconds)[len(seconds) // 2], output.strip()
+
+
+def main(repeats=5):
+    seconds_bare, _ = cold_start("pass", repeats)
+    seconds_pandas, _ = cold_start("import pandas", repeats)
+    seconds_offline, loaded = cold_start(OFFLINE_START, repeats)
+    print(f"interpreter {seconds_bare:.3f} s, pandas import {seconds_pandas:.3f} s")
+    print(f"offline snapshot run ready in {seconds_offline:.3f} s (target {TARGET_SECONDS:.1f} s, {'met' if seconds_offline < TARGET_SECONDS else 'missed'}); ArcGIS modules loaded: {loaded or 'none'}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
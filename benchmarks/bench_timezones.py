@@ -0,0 +1,75 @@
+### Benchmark of the UTC to Pacific conversion of the survey datetime fields.
+### Compares the original per-field change_timezone_of_field loop over every datetime field with timezones.convert_timezones limited to the fields the report uses, and the date text of timezone aware strftime with the wall times computed from the DST transition table, and prints the seconds taken by each. tests/test_timezones.py checks the wall times against pytz around every transition.
+### Usage: python benchmarks/bench_timezones.py [rows]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wlpsalmon.summary import change_timezone_of_field
+from wlpsalmon.timezones import REPORT_TIMEZONE_COLUMNS, convert_timezones, local_wall_time
+
+### Datetime fields of each layer
+LAYER_DATETIMES = {
+    "Metadata": ["dtmDate", "CreationDate", "EditDate"],
+    "LiveFish": ["CreationDate", "EditDate"],
+    "Carcass": ["CreationDate", "EditDate"],
+    "Observer": ["CreationDate", "EditDate"],
+}
+
+
+def synthetic_datetimes(rows, seed=0, start="2015-01-01", end="2030-01-01"):
+    """Returns *rows* naive UTC datetimes in whole milliseconds, as the service stores them, spread over [start, end), with about 1% NaT
+    : param rows: Number of records
+    : param seed: Random seed
+    """
+    rng = np.random.default_rng(seed)
+    values = (rng.integers(pd.Timestamp(start).value // 10**6, pd.Timestamp(end).value // 10**6, rows) * 10**6).view("datetime64[ns]")
+    values[rng.random(rows) < 0.01] = np.datetime64("NaT")
+    return values
+
+
+def synthetic_frames(rows, seed=0):
+    """Returns the four layers with *rows* records each, holding only their datetime fields
+    : param rows: Number of records per layer
+    : param seed: Random seed
+    """
+    return {layer: pd.DataFrame({col: synthetic_datetimes(rows, seed + i) for i, col in enumerate(cols)}) for layer, cols in LAYER_DATETIMES.items()}
+
+
+def original_convert(frames):
+    ### Original loop: every datetime field of every layer gets a _Pacific copy
+    converted = {}
+    for layer, df in frames.items():
+        df = df.copy(deep=False)
+        for col in df.select_dtypes(include=['datetime64']).columns:
+            change_timezone_of_field(df, col, "_Pacific", "UTC", "US/Pacific")
+        converted[layer] = df
+    return converted
+
+
+def _time(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(rows=1_000_000):
+    frames = synthetic_frames(rows)
+    original, seconds_original = _time(original_convert, frames)
+    converted, seconds_converted = _time(convert_timezones, frames, REPORT_TIMEZONE_COLUMNS)
+    same = all(original[layer][col + "_Pacific"].equals(converted[layer][col + "_Pacific"]) for layer, cols in REPORT_TIMEZONE_COLUMNS.items() for col in cols)
+    fields_original = sum(col.endswith("_Pacific") for df in original.values() for col in df.columns)
+    fields_converted = sum(col.endswith("_Pacific") for df in converted.values() for col in df.columns)
+    print(f"conversion: {rows:,} rows per layer; original {fields_original} _Pacific fields in {seconds_original:.3f} s, report only {fields_converted} in {seconds_converted:.3f} s, identical {same}")
+    dates, seconds_dates = _time(lambda s: s.dt.strftime('%m/%d/%Y'), original["Metadata"]["dtmDate_Pacific"])
+    table_dates, seconds_table = _time(lambda s: local_wall_time(s).dt.strftime('%m/%d/%Y'), converted["Metadata"]["dtmDate_Pacific"])
+    print(f"date text: timezone aware strftime {seconds_dates:.3f} s, DST table wall time {seconds_table:.3f} s, identical {dates.equals(table_dates)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,148 @@
+### Synthetic salmon spawning survey data for the benchmarks.
+### synthetic_survey_frames returns the four raw layers as a service pull gives them: naive UTC datetimes, unbracketed lowercase GUIDs in the Metadata, LiveFish and Carcass layers, and bracketed uppercase GUIDs in the Observer table, as arcpy.da.TableToNumPyArray returns them. Live fish records straddle the 11/5/2021 form cutover, and some carcasses have a null ysnCountedLast.
+### Usage: python benchmarks/synthetic.py [rows] [snapshot_dir]
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+### Field values drawn by the generator
+STREAMS = ["Bear River", "Cedar River", "Ellsworth Creek", "Middle Nemah River", "Naselle River", "North Nemah River", "South Nemah River", "Stringer Creek"]
+SPECIES = ["Chinook", "Chum", "Coho", "Unk"]
+FIRST_NAMES = ["Ann", "Ben", "Carla", "Dana", "Eli", "Fern", "Gus", "Hana", "Ivan", "Jo"]
+LAST_NAMES = ["Alvarez", "Brown", "Chen", "Davis", "Evans", "Fisher", "Garcia", "Hill", "Ito", "Jones"]
+
+### Survey season: surveys fall between September 15 and January 31; the season straddling the form cutover gets both live fish formats
+SEASON_START = "09-15"
+SEASON_DAYS = 138
+CUTOVER_SEASON = 2021
+
+
+def _guids(rng, rows, braced=False):
+    # Random version 4 style GUID text
+    values = rng.integers(0, 2 ** 63, (rows, 2), dtype=np.int64).view(np.uint64)
+    text = [f"{hi:016x}{lo:016x}" for hi, lo in values.tolist()]
+    text = [f"{t[:8]}-{t[8:12]}-{t[12:16]}-{t[16:20]}-{t[20:]}" for t in text]
+    return [("{" + t.upper() + "}") for t in text] if braced else text
+
+
+def _choice(rng, values, rows, p=None):
+    return rng.choice(np.array(values, dtype=object), rows, p=p)
+
+
+def _points(rng, rows):
+    return [{"x": x, "y": y, "spatialReference": {"wkid": 4326}} for x, y in zip((-123.9 + rng.random(rows) * 0.3).tolist(), (46.3 + rng.random(rows) * 0.3).tolist())]
+
+
+def synthetic_survey_frames(rows, seasons=(CUTOVER_SEASON,), records_per_survey=5, observers_per_survey=2, seed=0):
+    """Returns a dictionary of synthetic raw DataFrames keyed by layer name, with *rows* live fish records, *rows* carcass records and their surveys and observers
+    : param rows: Number of live fish records, and of carcass records
+    : param seasons: Years of the surveys; surveys are spread evenly over them
+    : param records_per_survey: Mean number of live fish, and of carcass, records per survey
+    : param observers_per_survey: Number of Observer records per survey
+    : param seed: Random seed
+    """
+    rng = np.random.default_rng(seed)
+    surveys = max(1, rows // records_per_survey)
+
+    ## Surveys: a date in one of the seasons, at 8 to 11 am Pacific (16 to 19 UTC)
+    season = np.asarray(seasons)[rng.integers(0, len(seasons), surveys)]
+    first_day = np.array([np.datetime64(f"{year}-{SEASON_START}", "ns") for year in season])
+    dates = first_day + rng.integers(0, SEASON_DAYS, surveys).astype("timedelta64[D]") + rng.integers(16, 19, surveys).astype("timedelta64[h]")
+    start_minutes = rng.integers(8 * 60, 11 * 60, surveys)
+    duration = rng.integers(30, 300, surveys)
+    metadata_guids = _guids(rng, surveys)
+    dfMetadata = pd.DataFrame({
+        "objectid": np.arange(1, surveys + 1),
+        "globalid": metadata_guids,
+        "strStream": _choice(rng, STREAMS, surveys),
+        "dtmDate": dates,
+        "strTideStart": _choice(rng, ["High", "Low", "Incoming", "Outgoing", None], surveys),
+        "strWeather": _choice(rng, ["Clear", "Overcast", "Rain", "Heavy Rain", "Fog"], surveys),
+        "dtmManualTimeStart": [f"{m // 60:02d}:{m % 60:02d}" for m in start_minutes.tolist()],
+        "dtmManualTimeTurn": [f"{m // 60:02d}:{m % 60:02d}" for m in (start_minutes + duration // 2).tolist()],
+        "dtmManualTimeEnd": [f"{m // 60:02d}:{m % 60:02d}" for m in (start_minutes + duration).tolist()],
+        "strStreamFlow": _choice(rng, ["Low", "Normal", "High", "Flood"], surveys),
+        "strViewingConditions": _choice(rng, ["Good", "Fair", "Poor"], surveys),
+        "strViewingConditionsComments": _choice(rng, [None, None, None, "Turbid below the falls"], surveys),
+        "ysnLiveFish": _choice(rng, ["yes", "no"], surveys, p=[0.8, 0.2]),
+        "ysnCarcasses": _choice(rng, ["yes", "no"], surveys, p=[0.8, 0.2]),
+        "strComments": _choice(rng, [None, None, "Log jam at the upper reach"], surveys),
+        "CreationDate": dates + rng.integers(1, 8 * 3600, surveys).astype("timedelta64[s]"),
+        "Creator": "surveyor_fws",
+    })
+    dfMetadata["EditDate"] = dfMetadata["CreationDate"] + rng.integers(0, 30 * 86400, surveys).astype("timedelta64[s]")
+    dfMetadata["Editor"] = "surveyor_fws"
+
+    def child_base(n):
+        parent = rng.integers(0, surveys, n)
+        created = dfMetadata["CreationDate"].to_numpy()[parent] + rng.integers(0, 3600, n).astype("timedelta64[s]")
+        return {
+            "objectid": np.arange(1, n + 1),
+            "globalid": _guids(rng, n),
+            "parentglobalid": np.asarray(metadata_guids, dtype=object)[parent],
+        }, created
+
+    ## Live fish; records created before 11/5/2021 Pacific use the earlier form
+    base, created = child_base(rows)
+    dfLiveFish = pd.DataFrame({
+        **base,
+        "strLiveSpecies": _choice(rng, SPECIES, rows, p=[0.1, 0.3, 0.55, 0.05]),
+        "strLiveSex": _choice(rng, ["M", "F", "Unk", None], rows, p=[0.35, 0.35, 0.2, 0.1]),
+        "ysnPairs": _choice(rng, ["yes", "no"], rows, p=[0.2, 0.8]),
+        "ysnReddBuilding": _choice(rng, ["yes", "no", None], rows, p=[0.1, 0.8, 0.1]),
+        "intNumRedds": rng.integers(0, 3, rows),
+        "strLiveFishRedd": _choice(rng, ["Live Fish", "Redd", "Live Fish and Redd", None], rows, p=[0.6, 0.15, 0.15, 0.1]),
+        "strReddID": _choice(rng, [None, "R1", "R2", "R3"], rows),
+        "SHAPE": _points(rng, rows),
+        "CreationDate": created,
+        "EditDate": created,
+    })
+
+    ## Carcasses; about a fifth have a null ysnCountedLast
+    base, created = child_base(rows)
+    dfCarcass = pd.DataFrame({
+        **base,
+        "strCarcassSpecies": _choice(rng, SPECIES, rows, p=[0.1, 0.3, 0.55, 0.05]),
+        "strCarcassSex": _choice(rng, ["M", "F", "J", "Unk"], rows, p=[0.4, 0.4, 0.05, 0.15]),
+        "strDecomposedFresh": _choice(rng, ["Fresh", "Decomposed"], rows),
+        "intNumCarcasses": rng.integers(1, 5, rows),
+        "ysnCountedLast": _choice(rng, ["yes", "no", None], rows, p=[0.4, 0.4, 0.2]),
+        "SHAPE": _points(rng, rows),
+        "CreationDate": created,
+        "EditDate": created,
+    })
+
+    ## Observers, with bracketed GUIDs and untrimmed names
+    observers = surveys * observers_per_survey
+    parent = np.repeat(np.arange(surveys), observers_per_survey)
+    bracketed = np.array(["{" + guid.upper() + "}" for guid in metadata_guids], dtype=object)
+    dfObserver = pd.DataFrame({
+        "objectid": np.arange(1, observers + 1),
+        "globalid": _guids(rng, observers, braced=True),
+        "strFirstName": _choice(rng, FIRST_NAMES + ["Ann "], observers),
+        "strLastName": _choice(rng, LAST_NAMES + [" Brown"], observers),
+        "parentglobalid": bracketed[parent],
+        "CreationDate": dfMetadata["CreationDate"].to_numpy()[parent],
+        "Creator": "surveyor_fws",
+        "EditDate": dfMetadata["CreationDate"].to_numpy()[parent],
+        "Editor": "surveyor_fws",
+    })
+    for df in (dfMetadata, dfLiveFish, dfCarcass, dfObserver):
+        for col in df.select_dtypes(include=['datetime64']).columns:
+            df[col] = df[col].astype("datetime64[ns]")
+    return {"Metadata": dfMetadata, "LiveFish": dfLiveFish, "Carcass": dfCarcass, "Observer": dfObserver}
+
+
+if __name__ == "__main__":
+    frames = synthetic_survey_frames(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
+    if len(sys.argv) > 2:
+        from wlpsalmon.snapshot import write_snapshot
+        print(write_snapshot(frames, sys.argv[2]))
+    else:
+        for layer, df in frames.items():
+            print(f"{layer}: {len(df):,} records, {len(df.columns)} fields")
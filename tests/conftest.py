@@ -0,0 +1,156 @@
+### Shared fixtures of the tests: synthetic survey layers and a local stand-in for the feature service.
+### FeatureService serves DataFrames through the query endpoint of the ArcGIS REST API on 127.0.0.1: layer descriptions, paged features with exceededTransferLimit, object ids, counts and "EditDate >= TIMESTAMP" where clauses, so rest, sync and sources run as they do against ArcGIS Online. As the service does, each page gives the spatialReference of the layer once and the geometries carry none.
+
+import json
+import os
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from synthetic import synthetic_survey_frames  # noqa: E402
+from wlpsalmon import rest  # noqa: E402
+
+### Esri field types of the DataFrame columns served
+OID_FIELDS = {"objectid": "esriFieldTypeOID", "globalid": "esriFieldTypeGlobalID"}
+
+
+def _esri_type(name, values):
+    # Esri field type of a served column
+    if name in OID_FIELDS:
+        return OID_FIELDS[name]
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return "esriFieldTypeDate"
+    if pd.api.types.is_integer_dtype(values):
+        return "esriFieldTypeInteger"
+    if pd.api.types.is_float_dtype(values):
+        return "esriFieldTypeDouble"
+    return "esriFieldTypeString"
+
+
+def _features(df):
+    # Esri JSON features of a DataFrame: dates as epoch milliseconds, SHAPE as the geometry without its spatial reference
+    dfAttributes = df.drop(columns="SHAPE", errors="ignore").astype(object)
+    for col in df.select_dtypes(include=["datetime64"]).columns:
+        dates = df[col]
+        dfAttributes[col] = np.where(dates.isna(), None, (dates - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)).astype(object)
+    dfAttributes = dfAttributes.where(dfAttributes.notna(), None)
+    records = [{"attributes": {k: (v.item() if isinstance(v, np.generic) else v) for k, v in row.items()}} for row in dfAttributes.to_dict("records")]
+    if "SHAPE" in df.columns:
+        for feature, shape in zip(records, df["SHAPE"]):
+            feature["geometry"] = None if shape is None else {key: value for key, value in shape.items() if key != "spatialReference"}
+    return records
+
+
+def _spatial_reference(df):
+    # Spatial reference of the first point of a DataFrame holding one, or None
+    for shape in df["SHAPE"] if "SHAPE" in df.columns else []:
+        if shape and shape.get("spatialReference"):
+            return shape["spatialReference"]
+    return None
+
+
+class FeatureService:
+    """Stand-in feature service serving one DataFrame per layer, keyed as rest.LAYERS
+    : param frames: Dictionary of raw DataFrames keyed by layer name; edit them, or replace them, between requests
+    : param max_record_count: maxRecordCount of every layer
+    : param spatial_reference: spatialReference of the layers with SHAPE; defaults to that of the first point of each layer
+    """
+
+    def __init__(self, frames, max_record_count=1000, spatial_reference=None):
+        self.frames = frames
+        self.max_record_count = max_record_count
+        self.spatial_reference = spatial_reference
+        # Number of requests still to fail with HTTP 503, and the (path, parameters) of every request answered
+        self.failures = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/FeatureServer"
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+                params = {k: v[0] for k, v in urllib.parse.parse_qs(body).items()}
+                with service._lock:
+                    fail = service.failures > 0
+                    service.failures -= fail
+                    if not fail:
+                        service.requests.append((self.path, params))
+                if fail:
+                    self.send_error(503)
+                    return
+                data = json.dumps(service.respond(self.path, params)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def respond(self, path, params):
+        """Returns the JSON response of a request
+        : param path: Path of the request url, /FeatureServer/<layer id> or /FeatureServer/<layer id>/query
+        : param params: Dictionary of the request parameters
+        """
+        parts = path.strip("/").split("/")
+        layer = {str(layer_id): name for name, layer_id in rest.LAYERS.items()}[parts[1]]
+        if parts[-1] != "query":
+            return {"name": layer, "maxRecordCount": self.max_record_count}
+        df = self.frames[layer].sort_values("objectid", ignore_index=True)
+        where = params.get("where", "1=1")
+        if where.startswith("EditDate >= TIMESTAMP"):
+            df = df[df["EditDate"] >= pd.Timestamp(where.split("'")[1])]
+        elif where != "1=1":
+            raise ValueError(f"where clause not served: {where}")
+        if params.get("returnIdsOnly") == "true":
+            return {"objectIdFieldName": "objectid", "objectIds": df["objectid"].tolist()}
+        if params.get("returnCountOnly") == "true":
+            return {"count": len(df)}
+        if params.get("outFields", "*") != "*":
+            df = df[[col for col in params["outFields"].split(",") if col in df.columns] + (["SHAPE"] if "SHAPE" in df.columns else [])]
+        if params.get("returnGeometry") == "false":
+            df = df.drop(columns="SHAPE", errors="ignore")
+        offset = int(params.get("resultOffset", 0))
+        count = min(int(params.get("resultRecordCount", self.max_record_count)), self.max_record_count)
+        fields = [{"name": col, "type": _esri_type(col, df[col])} for col in df.columns if col != "SHAPE"]
+        page = {"objectIdFieldName": "objectid", "globalIdFieldName": "globalid", "fields": fields}
+        if "SHAPE" in df.columns:
+            page["geometryType"] = "esriGeometryPoint"
+            page["spatialReference"] = self.spatial_reference or _spatial_reference(self.frames[layer])
+        page["features"] = _features(df.iloc[offset:offset + count])
+        page["exceededTransferLimit"] = offset + count < len(df)
+        return page
+
+    def query_requests(self):
+        """Returns the parameters of the query requests answered"""
+        return [params for path, params in self.requests if path.endswith("/query")]
+
+
+@pytest.fixture
+def survey_frames():
+    """Synthetic raw layers of the 2020 and 2021 seasons, see benchmarks/synthetic.py"""
+    return synthetic_survey_frames(400, seasons=(2020, 2021), seed=1)
+
+
+@pytest.fixture
+def feature_service(survey_frames):
+    """FeatureService serving survey_frames, running for the test"""
+    service = FeatureService(survey_frames)
+    thread = threading.Thread(target=service.server.serve_forever, daemon=True)
+    thread.start()
+    yield service
+    service.server.shutdown()
+    service.server.server_close()
@@ -0,0 +1,103 @@
+import pandas as pd
+import pytest
+
+from wlpsalmon import pipeline
+from wlpsalmon.aggregate import SurveyAggregates
+from wlpsalmon.sources import FrameSource, ServiceSource
+from wlpsalmon.summary import build_summary
+
+
+def _edit_carcass(frames, year, edit_date, carcasses=100):
+    # Adds carcasses to the first carcass record of a survey of *year* and stamps its EditDate
+    dfCarcass = frames["Carcass"]
+    survey_years = frames["Metadata"].set_index("globalid")["dtmDate"].dt.year
+    row = dfCarcass.index[dfCarcass["parentglobalid"].map(survey_years) == year][0]
+    dfCarcass.loc[row, "intNumCarcasses"] += carcasses
+    dfCarcass.loc[row, "EditDate"] = edit_date
+
+
+def _run(source, year, tmp_path, name, aggregate_dir=None):
+    return pipeline.run(source, year, str(tmp_path), timestamp=name, message=lambda line: None, aggregate_dir=aggregate_dir, geometry="skip")["sheets"]
+
+
+def test_season_store_sees_edits_synced_by_another_season(feature_service, tmp_path):
+    source = ServiceSource(feature_service.url, cache_dir=str(tmp_path / "cache"))
+    aggregate_dir = str(tmp_path / "aggregates")
+    frames = feature_service.frames
+    latest = max(df["EditDate"].max() for df in frames.values())
+
+    _run(source, 2021, tmp_path, "run1", aggregate_dir)
+    _edit_carcass(frames, 2021, latest + pd.Timedelta(hours=1))
+    _run(source, 2020, tmp_path, "run2", aggregate_dir)
+    _edit_carcass(frames, 2020, latest + pd.Timedelta(hours=2))
+    _run(source, 2020, tmp_path, "run3", aggregate_dir)
+    sheets = _run(source, 2021, tmp_path, "run4", aggregate_dir)
+
+    expected = _run(FrameSource({layer: df.copy() for layer, df in frames.items()}), 2021, tmp_path, "full")
+    assert sheets["Carcass Summary"]["intTotalCarcasses"].sum() == expected["Carcass Summary"]["intTotalCarcasses"].sum()
+    pd.testing.assert_frame_equal(sheets["Carcass Summary"], expected["Carcass Summary"])
+    pd.testing.assert_frame_equal(sheets["Live Fish Summary"], expected["Live Fish Summary"])
+
+
+def _child(frames, layer, year, n=0):
+    # Index label of the n-th record of *layer* belonging to a survey of *year*
+    survey_years = frames["Metadata"].set_index("globalid")["dtmDate"].dt.year
+    df = frames[layer]
+    return df.index[df["parentglobalid"].map(survey_years) == year][n]
+
+
+def _survey(frames, year, other_than):
+    # globalid of a survey of *year* other than *other_than*
+    dfMetadata = frames["Metadata"]
+    surveys = dfMetadata.loc[dfMetadata["dtmDate"].dt.year == year, "globalid"]
+    return surveys[surveys != other_than].iloc[0]
+
+
+def _insert(frames, layer):
+    df = frames[layer]
+    row = df.loc[[_child(frames, layer, 2021)]].assign(objectid=df["objectid"].max() + 1, globalid="0f0e0d0c-0b0a-4909-8807-060504030201")
+    frames[layer] = pd.concat([df, row], ignore_index=True)
+
+
+def _delete(frames, layer):
+    frames[layer] = frames[layer].drop(index=_child(frames, layer, 2021)).reset_index(drop=True)
+
+
+def _move_survey(frames, layer):
+    row = _child(frames, layer, 2021)
+    frames[layer].loc[row, "parentglobalid"] = _survey(frames, 2021, frames[layer].at[row, "parentglobalid"])
+
+
+def _move_season(frames, layer):
+    row = _child(frames, layer, 2021)
+    frames[layer].loc[row, "parentglobalid"] = _survey(frames, 2020, None)
+
+
+def _species(frames, layer):
+    field = {"LiveFish": "strLiveSpecies", "Carcass": "strCarcassSpecies"}[layer]
+    row = _child(frames, layer, 2021)
+    frames[layer].loc[row, field] = "Chinook" if frames[layer].at[row, field] != "Chinook" else "Chum"
+
+
+@pytest.mark.parametrize("edit", [_insert, _delete, _move_survey, _move_season, _species])
+def test_store_matches_a_full_recompute(survey_frames, tmp_path, edit):
+    aggregate_dir = str(tmp_path / "aggregates")
+    for year in (2020, 2021):
+        _run(FrameSource(survey_frames), year, tmp_path, f"first{year}", aggregate_dir)
+    for layer in ("LiveFish", "Carcass"):
+        edit(survey_frames, layer)
+    for year in (2020, 2021):
+        sheets = _run(FrameSource(survey_frames), year, tmp_path, f"rerun{year}", aggregate_dir)
+        expected = _run(FrameSource({layer: df.copy() for layer, df in survey_frames.items()}), year, tmp_path, f"full{year}")
+        for sheet in ("Live Fish Summary", "Carcass Summary"):
+            pd.testing.assert_frame_equal(sheets[sheet], expected[sheet])
+
+
+def test_store_derives_only_the_changed_records(survey_frames, tmp_path):
+    store = SurveyAggregates(str(tmp_path / "aggregates"))
+    build_summary({layer: df.copy() for layer, df in survey_frames.items()}, 2021, memo=store)
+    _species(survey_frames, "Carcass")
+    _delete(survey_frames, "LiveFish")
+    build_summary(survey_frames, 2021, memo=store)
+    assert store.stats["Carcasses"] == {"intRecordsDerived": 1, "intRecordsDropped": 1, "intSurveysGrouped": 1}
+    assert store.stats["Live Fish"] == {"intRecordsDerived": 0, "intRecordsDropped": 1, "intSurveysGrouped": 1}
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from wlpsalmon.escapement import estimate_escapement, spawning_season
+
+
+def _summaries(surveys):
+    # Live Fish Summary and Carcass Summary rows of (stream, species, date, live fish, new carcasses) surveys
+    dfSurveys = pd.DataFrame(surveys, columns=["strStream", "strSpecies", "dtmDate_Pacific", "intLiveFish", "intNewNumCarcasses"])
+    dfLive = dfSurveys.rename(columns={"strSpecies": "strLiveSpecies"}).assign(intNumRedds=1)
+    dfCarcass = dfSurveys.rename(columns={"strSpecies": "strCarcassSpecies"}).assign(intTotalCarcasses=dfSurveys["intNewNumCarcasses"])
+    return dfLive, dfCarcass
+
+
+def test_spawning_season_starts_on_season_start():
+    dates = pd.Series(pd.to_datetime(["2020-06-30", "2020-07-01", "2020-12-31", "2021-01-01", "2021-01-31", "2021-09-15"]))
+    assert spawning_season(dates).tolist() == [2019, 2020, 2020, 2020, 2020, 2021]
+
+
+def test_curves_do_not_bridge_the_months_between_seasons():
+    dfLive, dfCarcass = _summaries([
+        ("Bear River", "Coho", "11/20/2020", 10, 1),
+        ("Bear River", "Coho", "12/20/2020", 20, 2),
+        ("Bear River", "Coho", "01/09/2021", 10, 3),
+        ("Bear River", "Coho", "09/20/2021", 4, 4),
+        ("Bear River", "Coho", "10/10/2021", 8, 5),
+    ])
+    sheets = estimate_escapement(dfLive, dfCarcass, residence_days=10)
+    dfEscapement = sheets["Escapement"].set_index("intSeason")
+    assert dfEscapement.index.tolist() == [2020, 2021]
+    ## 30 days at a mean of 15 fish, then 20 days at 15; the 2021 season has 20 days at 6
+    assert dfEscapement.loc[2020, "dblAUC"] == 30 * 15 + 20 * 15
+    assert dfEscapement.loc[2021, "dblAUC"] == 20 * 6
+    assert np.isclose(dfEscapement.loc[2020, "dblEscapement"], 75)
+    assert dfEscapement.loc[2020, "intSurveys"] == 3
+    assert dfEscapement.loc[2020, "dtmLastSurvey"] == pd.Timestamp("2021-01-09")
+    assert dfEscapement.loc[2020, "intNewCarcasses"] == 6
+    dfCurves = sheets["Carcass Curves"]
+    assert dfCurves["intCumNewCarcasses"].tolist() == [1, 3, 6, 4, 9]
+    assert dfCurves["intSeason"].tolist() == [2020, 2020, 2020, 2021, 2021]
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from wlpsalmon import pipeline
+from wlpsalmon.sources import FrameSource
+
+
+def test_run_report_lists_the_sheets_written(survey_frames, tmp_path):
+    result = pipeline.run(FrameSource(survey_frames), 2021, str(tmp_path), timestamp="t", message=lambda line: None)
+    with open(result["report"]) as f:
+        stages = {record["strStage"]: record for record in json.load(f)["stages"]}
+    sheets = stages["export"]["sheets"]
+    assert [entry["strSheet"] for entry in sheets] == list(result["sheets"]) + ["(close)"]
+    assert [entry["intRows"] for entry in sheets[:-1]] == [len(df) for df in result["sheets"].values()]
+    for entry in sheets:
+        assert set(entry) == {"strSheet", "intRows", "dblSeconds", "dblRSSMB", "dblRSSDeltaMB"}
+        assert entry["dblRSSMB"] is None or entry["dblRSSMB"] > 0
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_batch_relays_season_lines_in_year_order(survey_frames, tmp_path, capfd, processes):
+    lines = []
+    result = pipeline.run_batch(FrameSource(survey_frames), [2020, 2021], str(tmp_path), timestamp="t", processes=processes, message=lines.append)
+    assert capfd.readouterr().out == ""
+    years = [line.split(": ")[0] for line in lines if line.split(": ")[0] in ("2020", "2021")]
+    assert years and years == sorted(years)
+    assert {line.split(": ", 1)[1].split(" in ")[0] for line in lines if line.startswith("2021: ")} >= {"Completed joins", "Completed export"}
+    assert all("messages" not in season for season in result["years"].values())
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wlpsalmon.geometry import PointArray, convert_shape, set_geometry
+from wlpsalmon.snapshot import read_snapshot, write_snapshot
+
+SPATIAL_REFERENCE = {"wkid": 102100, "latestWkid": 3857}
+POINTS = [{"x": -13813000.25, "y": 5830000.5, "spatialReference": SPATIAL_REFERENCE}, None, {"x": 0.0, "y": -1e-9, "spatialReference": SPATIAL_REFERENCE}]
+
+
+def _frames():
+    return {"Carcass": pd.DataFrame({"objectid": [1, 2, 3], "SHAPE": pd.Series(POINTS, dtype=object)}), "Metadata": pd.DataFrame({"objectid": [1]})}
+
+
+def _xy(shapes):
+    # (x, y) of each point, None for null points, whatever the geometry mode
+    array = convert_shape(pd.Series(shapes), "xy").array
+    return [None if np.isnan(x) else (x, y) for x, y in zip(array.x, array.y)]
+
+
+@pytest.mark.parametrize("write_mode", ["esri", "xy", "wkb", "skip"])
+@pytest.mark.parametrize("read_mode", ["esri", "xy", "wkb"])
+def test_modes_round_trip_through_a_snapshot(tmp_path, write_mode, read_mode):
+    write_snapshot(set_geometry(_frames(), write_mode), str(tmp_path), "t")
+    shapes = read_snapshot(str(tmp_path), "t", geometry=read_mode)["Carcass"]["SHAPE"]
+    if write_mode == "skip":
+        assert shapes.isna().all()
+        return
+    assert _xy(shapes) == [(point["x"], point["y"]) if point else None for point in POINTS]
+    ## WKB holds no spatial reference, so the wkb mode does not carry it into the snapshot
+    spatial_reference = None if write_mode == "wkb" else SPATIAL_REFERENCE
+    if read_mode == "esri":
+        expected = [None if point is None else dict(point, spatialReference=spatial_reference) if spatial_reference else {"x": point["x"], "y": point["y"]} for point in POINTS]
+        assert shapes.tolist() == expected
+    elif read_mode == "xy":
+        assert isinstance(shapes.array, PointArray)
+        assert shapes.array.spatial_reference == spatial_reference
+        assert shapes.isna().tolist() == [False, True, False]
+    else:
+        assert shapes.tolist() == list(convert_shape(pd.Series(POINTS, dtype=object), "wkb"))
+
+
+def test_point_array_converts_to_every_mode():
+    shapes = convert_shape(pd.Series(POINTS, dtype=object), "xy")
+    assert shapes.array.spatial_reference == SPATIAL_REFERENCE
+    assert convert_shape(shapes, "esri").tolist() == POINTS
+    assert convert_shape(convert_shape(shapes, "wkb"), "xy").array.spatial_reference is None
+    assert shapes.array.to_text() == [str(POINTS[0]), None, str(POINTS[2])]
+    assert convert_shape(shapes, "skip").isna().all()
+    with pytest.raises(ValueError, match="geometry mode"):
+        convert_shape(shapes, "wkt")
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from wlpsalmon.joins import SurveyIndex
+from wlpsalmon.keys import key_columns
+
+
+def _surveys(streams, dates):
+    # Surveys keyed 1, 2, ... in the given order, with their streams and naive local survey dates
+    keys = np.arange(1, len(streams) + 1, dtype=np.uint64)
+    index = pd.MultiIndex.from_arrays([keys, keys], names=key_columns("globalid"))
+    dfSurveys = pd.DataFrame({"strStream": streams, "strSurvey": [f"s{key}" for key in keys]}, index=index)
+    return dfSurveys, pd.Series(pd.to_datetime(dates))
+
+
+def _children(parents):
+    # Child records of the surveys keyed *parents*, numbered in order
+    parents = np.asarray(parents, dtype=np.uint64)
+    return pd.DataFrame({"parentglobalid_hi": parents, "parentglobalid_lo": parents, "intChild": np.arange(len(parents))})
+
+
+def test_surveys_sort_on_stream_then_date_across_years():
+    ## As '%m/%d/%Y' text, 01/05/2021 would sort before 12/01/2020 and 10/01/2019
+    dfSurveys, dates = _surveys(
+        ["Bear River", "Bear River", "Bear River", "Naselle River", None, "Bear River"],
+        ["2021-01-05", "2020-12-01", "2019-10-01", "2019-09-15", "2019-01-01", None],
+    )
+    index = SurveyIndex(dfSurveys, dates)
+    attached = index.attach("Surveys", dfSurveys[["strSurvey"]], _children([1, 2, 3, 4, 5, 6]))
+    ## Null dates sort last within their stream, and null streams last of all
+    assert attached["strSurvey"].tolist() == ["s3", "s2", "s1", "s6", "s4", "s5"]
+
+
+def test_ties_keep_the_survey_order_and_children_keep_their_order():
+    dfSurveys, dates = _surveys(["Bear River"] * 3, ["2021-10-01", "2021-10-01", "2021-09-30"])
+    index = SurveyIndex(dfSurveys, dates)
+    attached = index.attach("Children", dfSurveys[["strSurvey"]], _children([2, 1, 2, 3, 1, 9]))
+    assert attached["strSurvey"].tolist() == ["s3", "s1", "s1", "s2", "s2"]
+    assert attached["intChild"].tolist() == [3, 1, 4, 0, 2]
+    assert attached.index.get_level_values("globalid_hi").tolist() == [3, 1, 1, 2, 2]
+
+
+def test_left_attach_gives_each_survey_without_children_one_row():
+    dfSurveys, dates = _surveys(["Bear River"] * 3, ["2021-10-01", "2021-10-02", "2021-10-03"])
+    index = SurveyIndex(dfSurveys, dates)
+    attached = index.attach("Summary", dfSurveys[["strSurvey"]], _children([3, 1, 3]), how="left")
+    assert attached["strSurvey"].tolist() == ["s1", "s2", "s3", "s3"]
+    assert attached["intChild"].isna().tolist() == [False, True, False, False]
+    assert attached["intChild"].iloc[[0, 2, 3]].tolist() == [1, 0, 2]
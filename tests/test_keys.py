@@ -0,0 +1,99 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from wlpsalmon import pipeline
+from wlpsalmon.joins import SurveyIndex
+from wlpsalmon.keys import NULL_KEY, add_guid_keys, guid_keys, key_columns, normalize_guids, null_keys
+from wlpsalmon.roster import ObserverRoster
+
+GUID = "5b8e13c2-07d4-4a9f-9e61-0c3d5a7b2f18"
+
+
+@pytest.mark.parametrize("text", [
+    GUID,
+    GUID.upper(),
+    "{" + GUID.upper() + "}",
+    "{" + GUID + "}",
+    GUID.replace("-", ""),
+    "  {" + GUID.upper() + "}\r\n",
+    "\t" + GUID + " " * 40,
+])
+def test_spellings_of_one_guid_give_its_key(text):
+    hi, lo = guid_keys(pd.Series([text], dtype=object))
+    ## The key round trip: the two halves are the 128-bit integer of the GUID
+    assert (int(hi[0]) << 64) | int(lo[0]) == uuid.UUID(GUID).int
+    assert str(uuid.UUID(int=(int(hi[0]) << 64) | int(lo[0]))) == GUID
+
+
+@pytest.mark.parametrize("text", [
+    None,
+    np.nan,
+    "",
+    GUID[:-1],
+    GUID + "0",
+    GUID.replace("b", "g"),
+    GUID + " xyz",
+    GUID[:8] + " " * 30 + GUID[8:] + "0",
+    "{" + GUID + "}é",
+    "not a guid",
+])
+def test_null_and_malformed_guids_get_null_keys(text):
+    hi, lo = guid_keys(pd.Series([GUID, text], dtype=object))
+    assert not null_keys(hi[:1], lo[:1])[0]
+    assert null_keys(hi[1:], lo[1:])[0]
+    assert hi[1] == NULL_KEY and lo[1] == NULL_KEY
+
+
+def test_string_dtype_with_missing_values():
+    hi, lo = guid_keys(pd.Series([GUID.upper(), None], dtype="str"))
+    assert null_keys(hi, lo).tolist() == [False, True]
+
+
+def test_normalize_guids_strips_whitespace_and_brackets():
+    assert normalize_guids(pd.Series([" {" + GUID + "} ", None], dtype=object)).tolist() == [GUID, None]
+
+
+def _frames(metadata_guids, observer_parents, child_parents):
+    # Metadata, Observer and Carcass layers with the given GUID texts
+    dfMetadata = pd.DataFrame({"globalid": metadata_guids, "strStream": "Bear River", "dtmDate": pd.Timestamp("2021-10-01")})
+    dfObserver = pd.DataFrame({"parentglobalid": observer_parents, "strFirstName": [f"Name{i} " for i in range(len(observer_parents))], "strLastName": " Smith"})
+    dfCarcass = pd.DataFrame({"globalid": pd.Series([str(uuid.UUID(int=i + 1)) for i in range(len(child_parents))], dtype=object), "parentglobalid": pd.Series(child_parents, dtype=object)})
+    return add_guid_keys({"Metadata": dfMetadata, "Observer": dfObserver, "Carcass": dfCarcass})
+
+
+def _names(roster, hi, lo):
+    # Roster text of each survey, None where it has no observers
+    return [None if pd.isna(name) else name for name in roster.full_names(hi, lo)]
+
+
+def test_braced_uppercase_observers_join_lowercase_surveys():
+    surveys = [str(uuid.UUID(int=i << 64 | 7)) for i in range(1, 4)]
+    frames = _frames(surveys, ["{" + surveys[1].upper() + "}", "{" + surveys[0].upper() + "}", " {" + surveys[1].upper() + "} "], [])
+    hi, lo = (frames["Metadata"][col].to_numpy() for col in key_columns("globalid"))
+    assert _names(ObserverRoster(frames["Observer"], hi, lo), hi, lo) == ["Name1 Smith", "Name0 Smith, Name2 Smith", None]
+
+
+def test_null_and_malformed_keys_never_join():
+    ## Two surveys and three carcasses without a usable GUID; none of them may be joined to another
+    surveys = [GUID, None, "not a guid"]
+    frames = _frames(surveys, [None, "{" + GUID.upper() + "}"], [GUID.upper(), None, "garbage", "{" + GUID + "}"])
+    dfSurveys = frames["Metadata"].set_index(key_columns("globalid"))
+    index = SurveyIndex(dfSurveys, frames["Metadata"]["dtmDate"])
+    attached = index.attach("Carcasses", dfSurveys[["strStream"]], frames["Carcass"])
+    assert attached["globalid"].tolist() == [str(uuid.UUID(int=1)), str(uuid.UUID(int=4))]
+    assert len(index.attach("Carcasses", dfSurveys[["strStream"]], frames["Carcass"], how="left")) == 4
+    hi, lo = (dfSurveys.index.get_level_values(col).to_numpy() for col in key_columns("globalid"))
+    assert _names(ObserverRoster(frames["Observer"], hi, lo), hi, lo) == ["Name1 Smith", None, None]
+
+
+def test_partition_leaves_out_children_without_a_survey():
+    frames = {
+        "Metadata": pd.DataFrame({"globalid": [GUID, None, "garbage"], "dtmDate": pd.to_datetime(["2021-10-01", "2021-10-02", "2021-10-03"])}),
+        "Carcass": pd.DataFrame({"parentglobalid": ["{" + GUID.upper() + "}", None, "garbage", GUID[:-1]]}),
+    }
+    seasons = pipeline.partition_seasons(frames, [2021])
+    assert seasons[2021]["Carcass"].index.tolist() == [0]
+    assert len(seasons[2021]["Metadata"]) == 3
@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+
+from wlpsalmon.memo import INDEX_FILE, SummaryMemo
+from wlpsalmon.summary import build_summary
+
+
+def _file(memo, season, name, size, mtime):
+    # Writes a memo file of *size* bytes last used at *mtime*; returns its path
+    folder = memo._folder(season, "Live Fish")
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _memo_files(memo):
+    # Names of the memo files of every season and sheet
+    return sorted(name for root, dirs, names in os.walk(memo.memo_dir) for name in names if name != INDEX_FILE)
+
+
+def test_evict_deletes_least_recently_used_files_until_within_the_bound(tmp_path):
+    memo = SummaryMemo(str(tmp_path), max_bytes=250)
+    _file(memo, 2021, "c.parquet", 100, 3000)
+    _file(memo, 2020, "a.parquet", 100, 1000)
+    kept = _file(memo, 2021, "b.parquet", 100, 2000)
+    _file(memo, 2019, "d.parquet", 100, 4000)
+    index = _file(memo, 2019, INDEX_FILE, 1000, 0)
+    ## 400 bytes of files: a, the oldest, is deleted, b is kept as asked, and c brings the folder to 200 bytes
+    assert memo.evict(keep={kept}) == 2
+    assert _memo_files(memo) == ["b.parquet", "d.parquet"]
+    assert os.path.exists(index)
+    ## Within the bound, nothing more is deleted
+    assert memo.evict() == 0
+
+
+def test_evict_stops_at_the_bound(tmp_path):
+    memo = SummaryMemo(str(tmp_path), max_bytes=300)
+    for i, name in enumerate(["a", "b", "c", "d"]):
+        _file(memo, 2021, name + ".parquet", 100, 1000 + i)
+    assert memo.evict() == 1
+    assert _memo_files(memo) == ["b.parquet", "c.parquet", "d.parquet"]
+
+
+def _age(memo, mtime):
+    # Marks every memo file as last used at *mtime*
+    for root, dirs, names in os.walk(memo.memo_dir):
+        for name in names:
+            os.utime(os.path.join(root, name), (mtime, mtime))
+
+
+def _season_files(memo, season):
+    # Names of the memo files of the live fish and carcass sheets of a season
+    return {name for root, dirs, names in os.walk(os.path.join(memo.memo_dir, str(season))) for name in names if name != INDEX_FILE}
+
+
+def test_reads_keep_a_season_from_eviction(survey_frames, tmp_path):
+    memo = SummaryMemo(str(tmp_path / "memo"))
+    build_summary(survey_frames, 2020, memo=memo)
+    _age(memo, 1000)
+    build_summary(survey_frames, 2021, memo=memo)
+    _age(memo, 2000)
+    ## Reading 2020 back marks its files as used; a bound of the size of one season's files then evicts 2021
+    build_summary(survey_frames, 2020, memo=memo)
+    assert memo.stats["Live Fish"]["intSurveysComputed"] == 0
+    files_2020 = _season_files(memo, 2020)
+    memo.max_bytes = sum(os.path.getsize(os.path.join(root, name)) for root, dirs, names in os.walk(os.path.join(memo.memo_dir, "2020")) for name in names if name != INDEX_FILE)
+    memo.evict()
+    assert _season_files(memo, 2020) == files_2020
+    assert not _season_files(memo, 2021)
+
+    ## An evicted season is summarized again, the same as without the memo
+    sheets = build_summary(survey_frames, 2021, memo=memo)
+    assert memo.stats["Live Fish"]["intSurveysReused"] == 0
+    expected = build_summary(survey_frames, 2021)
+    for sheet in ("Live Fish Summary", "Carcass Summary"):
+        pd.testing.assert_frame_equal(sheets[sheet], expected[sheet])
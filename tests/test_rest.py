@@ -0,0 +1,60 @@
+import urllib.error
+
+import pandas as pd
+import pytest
+
+from wlpsalmon import rest
+from wlpsalmon.geometry import points_from_geometries
+
+
+def test_query_pages_until_transfer_limit_is_not_exceeded(feature_service):
+    feature_service.max_record_count = 150
+    stats = rest.TransferStats()
+    df = rest.fetch_layer(feature_service.url, "LiveFish", out_fields=["objectid", "globalid", "EditDate"], return_geometry=False, stats=stats)
+    pages = feature_service.query_requests()
+    assert [int(params["resultOffset"]) for params in pages] == [0, 150, 300]
+    assert {params["resultRecordCount"] for params in pages} == {"150"}
+    assert stats.pages == 3 and stats.requests == 4
+    pd.testing.assert_frame_equal(df, feature_service.frames["LiveFish"][["objectid", "globalid", "EditDate"]])
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_response_spatial_reference_reaches_every_point(feature_service, max_workers):
+    feature_service.max_record_count = 150
+    feature_service.spatial_reference = {"wkid": 102100, "latestWkid": 3857}
+    ## As on ArcGIS Online, the pages give the spatial reference once and the geometries carry none
+    page = rest.request_json(rest.layer_url(feature_service.url, "Carcass") + "/query", {"where": "1=1", "outFields": "*", "resultOffset": 0, "resultRecordCount": 150, "f": "json"})
+    assert page["spatialReference"] == feature_service.spatial_reference and page["exceededTransferLimit"]
+    assert set(page["features"][0]["geometry"]) == {"x", "y"}
+    df = rest.fetch_layer(feature_service.url, "Carcass", max_workers=max_workers)
+    assert df["objectid"].tolist() == feature_service.frames["Carcass"]["objectid"].tolist()
+    expected = [{"x": shape["x"], "y": shape["y"], "spatialReference": feature_service.spatial_reference} for shape in feature_service.frames["Carcass"]["SHAPE"]]
+    assert df["SHAPE"].tolist() == expected
+    points = points_from_geometries(df["SHAPE"])
+    assert points.spatial_reference == feature_service.spatial_reference
+
+
+def test_layers_without_geometry_have_no_shape(feature_service):
+    df = rest.fetch_layer(feature_service.url, "Metadata")
+    assert "SHAPE" not in df.columns
+    assert len(df) == len(feature_service.frames["Metadata"])
+
+
+def test_server_error_is_retried_with_backoff(feature_service, monkeypatch):
+    waits = []
+    monkeypatch.setattr(rest.time, "sleep", waits.append)
+    feature_service.failures = 1
+    url = rest.layer_url(feature_service.url, "Metadata")
+    assert rest.query_count(url) == len(feature_service.frames["Metadata"])
+    assert waits == [rest.BACKOFF]
+    ## The parameters are sent as a POST body; the stand-in answers nothing else
+    assert feature_service.requests == [("/FeatureServer/0/query", {"where": "1=1", "returnCountOnly": "true", "f": "json"})]
+
+
+def test_server_error_is_raised_after_the_last_retry(feature_service, monkeypatch):
+    waits = []
+    monkeypatch.setattr(rest.time, "sleep", waits.append)
+    feature_service.failures = 3
+    with pytest.raises(urllib.error.HTTPError):
+        rest.request_json(rest.layer_url(feature_service.url, "Metadata"), retries=2, backoff=0.5)
+    assert waits == [0.5, 1.0]
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from wlpsalmon import roster
+from wlpsalmon.keys import add_guid_keys, key_columns
+from wlpsalmon.roster import ROSTER_CACHE_SIZE, season_roster
+
+SURVEYS = ["5b8e13c2-07d4-4a9f-9e61-0c3d5a7b2f18", "0c3d5a7b-2f18-4a9f-9e61-5b8e13c207d4"]
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    roster._ROSTERS.clear()
+    yield
+    roster._ROSTERS.clear()
+
+
+def _observers(rows):
+    # Keyed Observer table of (survey number, first name) rows, with bracketed uppercase parent GUIDs
+    return add_guid_keys({"Observer": pd.DataFrame({
+        "parentglobalid": ["{" + SURVEYS[survey].upper() + "}" for survey, name in rows],
+        "strFirstName": [name for survey, name in rows],
+        "strLastName": "Smith",
+    })})["Observer"]
+
+
+def _survey_keys(surveys=SURVEYS):
+    dfMetadata = add_guid_keys({"Metadata": pd.DataFrame({"globalid": surveys})})["Metadata"]
+    return [dfMetadata[col].to_numpy() for col in key_columns("globalid")]
+
+
+def _names(dfObserver, year=2021, surveys=SURVEYS):
+    hi, lo = _survey_keys(surveys)
+    return list(season_roster(dfObserver, year, hi, lo).full_names(hi, lo))
+
+
+def test_reordered_observers_are_not_served_from_the_cache():
+    assert _names(_observers([(0, "Ann"), (0, "Ben"), (1, "Cy")])) == ["Ann Smith, Ben Smith", "Cy Smith"]
+    ## Same records in another order: the xor and sum of the row hashes do not change, the roster does
+    assert _names(_observers([(0, "Ben"), (0, "Ann"), (1, "Cy")])) == ["Ben Smith, Ann Smith", "Cy Smith"]
+
+
+def test_edits_and_other_surveys_are_not_served_from_the_cache():
+    assert _names(_observers([(0, "Ann"), (1, "Cy")])) == ["Ann Smith", "Cy Smith"]
+    assert _names(_observers([(0, "Ann"), (1, "Dee")])) == ["Ann Smith", "Dee Smith"]
+    assert _names(_observers([(0, "Ann"), (1, "Dee")]), surveys=SURVEYS[:1]) == ["Ann Smith"]
+
+
+def test_same_content_is_served_from_the_cache():
+    hi, lo = _survey_keys()
+    first = season_roster(_observers([(0, "Ann"), (1, "Cy")]), 2021, hi, lo)
+    assert season_roster(_observers([(0, "Ann"), (1, "Cy")]), 2021, hi.copy(), lo.copy()) is first
+    assert season_roster(_observers([(0, "Ann"), (1, "Cy")]), 2020, hi, lo) is not first
+
+
+def test_cache_keeps_the_newest_rosters():
+    hi, lo = _survey_keys()
+    dfObserver = _observers([(0, "Ann")])
+    rosters = [season_roster(dfObserver, year, hi, lo) for year in range(ROSTER_CACHE_SIZE + 2)]
+    assert len(roster._ROSTERS) == ROSTER_CACHE_SIZE
+    assert season_roster(dfObserver, ROSTER_CACHE_SIZE + 1, hi, lo) is rosters[-1]
+    assert season_roster(dfObserver, 0, hi, lo) is not rosters[0]
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wlpsalmon.keys import key_columns
+from wlpsalmon.rules import CARCASS_RULES, LIVE_FISH_RULES, apply_rules, live_fish_form
+from wlpsalmon.summary import derive_live_fish, group_live_fish
+
+### A live fish record and a carcass record matched by no rule; each case changes some fields and gives the count fields expected
+LIVE_FISH = {"strLiveSex": None, "ysnPairs": "no", "ysnReddBuilding": "no", "strLiveFishRedd": "Live Fish", "intNumRedds": 0, "intLiveFishForm": 1}
+CARCASS = {"strCarcassSex": None, "strDecomposedFresh": "Fresh", "ysnCountedLast": "yes", "intNumCarcasses": 3}
+LIVE_FISH_TARGETS = ["intReddBuilding", "dblPairs", "intMales", "intFemales", "intUnknown", "intNumRedds"]
+CARCASS_TARGETS = ["intCountedLast", "intNewMales", "intNewFemales", "intNewJuveniles", "intNewUnknown"]
+
+LIVE_FISH_CASES = [
+    ({}, {"intNumRedds": 0}),
+    ({"ysnReddBuilding": "yes"}, {"intReddBuilding": 1, "intNumRedds": 0}),
+    ## Form 0 counts a pair as half a fish and no sexes; form 1 as one male and one female
+    ({"ysnPairs": "yes", "intLiveFishForm": 0}, {"dblPairs": 0.5, "intNumRedds": 0}),
+    ({"ysnPairs": "yes"}, {"dblPairs": 1, "intMales": 1, "intFemales": 1, "intNumRedds": 0}),
+    ({"strLiveSex": "M"}, {"intMales": 1, "intNumRedds": 0}),
+    ({"strLiveSex": "F"}, {"intFemales": 1, "intNumRedds": 0}),
+    ({"strLiveSex": "Unk"}, {"intUnknown": 1, "intNumRedds": 0}),
+    ({"strLiveSex": "M", "ysnPairs": "yes"}, {"dblPairs": 1, "intMales": 1, "intFemales": 1, "intNumRedds": 0}),
+    ({"strLiveFishRedd": "Redd"}, {"intNumRedds": 1}),
+    ({"strLiveFishRedd": "Live Fish and Redd"}, {"intNumRedds": 1}),
+    ## Form 0 does not flag redds, so the entered intNumRedds is kept
+    ({"strLiveFishRedd": "Redd", "intNumRedds": 2, "intLiveFishForm": 0}, {"intNumRedds": 2}),
+    ## Null fields match no rule
+    ({"ysnPairs": None, "ysnReddBuilding": None, "strLiveFishRedd": None}, {"intNumRedds": 0}),
+    ## A record without a form version gets no pair or redd count
+    ({"ysnPairs": "yes", "strLiveFishRedd": "Redd", "intLiveFishForm": -1}, {"intNumRedds": 0}),
+]
+
+CARCASS_CASES = [
+    ({}, {"intCountedLast": 3}),
+    ## Null ysnCountedLast is taken as yes for a decomposed carcass and as no for a fresh one
+    ({"ysnCountedLast": None, "strDecomposedFresh": "Decomposed"}, {"intCountedLast": 3}),
+    ({"ysnCountedLast": None, "strCarcassSex": "M"}, {"intNewMales": 3}),
+    ({"ysnCountedLast": "no", "strCarcassSex": "M"}, {"intNewMales": 3}),
+    ({"ysnCountedLast": "no", "strCarcassSex": "F"}, {"intNewFemales": 3}),
+    ({"ysnCountedLast": "no", "strCarcassSex": "J"}, {"intNewJuveniles": 3}),
+    ({"ysnCountedLast": "no", "strCarcassSex": "Unk"}, {"intNewUnknown": 3}),
+    ({"ysnCountedLast": "yes", "strCarcassSex": "F"}, {"intCountedLast": 3}),
+    ## A new carcass with a null sex, or a null condition, is counted nowhere
+    ({"ysnCountedLast": "no"}, {}),
+    ({"ysnCountedLast": None, "strDecomposedFresh": None, "strCarcassSex": "M"}, {}),
+]
+
+
+def _records(base, changes, categorical):
+    # One-row DataFrame of *base* with *changes*, its text fields categorical when asked, as schema.apply_categories leaves them
+    df = pd.DataFrame([{**base, **changes}])
+    for col in df.columns:
+        if not col.startswith("int"):
+            df[col] = df[col].astype("category") if categorical else df[col].astype(object)
+    return df
+
+
+def _check(df, targets, expected):
+    for target in targets:
+        value = df[target].iloc[0] if target in df.columns else np.nan
+        if target in expected:
+            assert value == expected[target], target
+        else:
+            assert np.isnan(value), target
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+@pytest.mark.parametrize("changes, expected", LIVE_FISH_CASES)
+def test_live_fish_rules(changes, expected, categorical):
+    _check(apply_rules(_records(LIVE_FISH, changes, categorical), LIVE_FISH_RULES), LIVE_FISH_TARGETS, expected)
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+@pytest.mark.parametrize("changes, expected", CARCASS_CASES)
+def test_carcass_rules(changes, expected, categorical):
+    _check(apply_rules(_records(CARCASS, changes, categorical), CARCASS_RULES), CARCASS_TARGETS, expected)
+
+
+def test_existing_values_are_the_default():
+    df = pd.DataFrame({"strCarcassSex": ["M", "M"], "strDecomposedFresh": ["Fresh", "Fresh"], "ysnCountedLast": ["no", "yes"], "intNumCarcasses": [2, 5], "intNewMales": [7, 7]})
+    apply_rules(df, CARCASS_RULES)
+    assert df["intNewMales"].tolist() == [2, 7]
+    assert df["intNewMales"].dtype == np.int64
+    assert np.isnan(df["intCountedLast"].iloc[0]) and df["intCountedLast"].iloc[1] == 5
+
+
+@pytest.mark.parametrize("created, form", [
+    ("2021-11-04 23:59:59.999999999", 0),
+    ("2021-11-05 00:00:00", 1),
+    ("2021-11-05 00:00:00.000000001", 1),
+    (None, -1),
+])
+def test_live_fish_form_at_the_cutover(created, form):
+    local = pd.Series(pd.to_datetime([created]))
+    assert live_fish_form(local).tolist() == [form]
+    ## The same instants as Pacific and as UTC aware datetimes; 11/5/2021 00:00 Pacific is 07:00 UTC, in daylight time
+    aware = local.dt.tz_localize("US/Pacific")
+    assert live_fish_form(aware).tolist() == [form]
+    assert live_fish_form(aware.dt.tz_convert("UTC")).tolist() == [form]
+
+
+def test_pairs_either_side_of_the_cutover_and_null_species():
+    created = pd.to_datetime(["2021-11-04 23:59:59", "2021-11-05 00:00:00", "2021-11-05 00:00:00", None]).tz_localize("US/Pacific")
+    df = pd.DataFrame({"strLiveSpecies": ["Coho", "Coho", None, "Coho"], "strLiveSex": [None] * 4, "ysnPairs": ["yes"] * 4, "ysnReddBuilding": ["no"] * 4, "strLiveFishRedd": ["Redd"] * 4, "intNumRedds": [0] * 4, "CreationDate_Pacific_x": created})
+    for col in key_columns("globalid"):
+        df[col] = np.uint64(1)
+    dfLiveFish = derive_live_fish(df)
+    ## The record without a creation date is left out; the others are counted by their own form
+    assert dfLiveFish["intLiveFishForm"].tolist() == [0, 1, 1]
+    assert dfLiveFish["dblPairs"].tolist() == [0.5, 1, 1]
+    ## The record without a species is left out of the per-species sums, as the groupby of the script did
+    dfSummary = group_live_fish(dfLiveFish)
+    assert dfSummary[["strLiveSpecies", "dblPairs", "intMales", "intFemales", "intNumRedds", "intLiveFish"]].values.tolist() == [["Coho", 1.5, 1, 1, 1, 2]]
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wlpsalmon.schema import apply_categories, categorize, domain_codes, equals, isin
+
+VALUES = ["yes", "no", None, "yes", "maybe"]
+
+
+@pytest.mark.parametrize("codes", [None, ["no", "yes"], ["no", "yes", "unused"]])
+@pytest.mark.parametrize("value", ["yes", "maybe", "unused", "absent", None])
+def test_equals_matches_the_text_comparison(codes, value):
+    series = pd.Series(VALUES, dtype=object)
+    expected = np.array([cell is not None and cell == value for cell in VALUES])
+    assert equals(series, value).tolist() == expected.tolist()
+    assert equals(categorize(series, codes), value).tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize("values", [["yes", "maybe"], ["absent"], ["absent", "no"], [], ["unused", None]])
+def test_isin_matches_the_text_comparison(values):
+    series = pd.Series(VALUES, dtype=object)
+    expected = [cell is not None and cell in values for cell in VALUES]
+    assert isin(series, values).tolist() == expected
+    assert isin(categorize(series, ["no", "yes", "unused"]), values).tolist() == expected
+
+
+def test_values_outside_the_domain_become_categories():
+    fields = [{"name": "ysnPairs", "domain": {"type": "codedValue", "codedValues": [{"code": "yes"}, {"code": "no"}]}}, {"name": "strComments"}]
+    domains = domain_codes(fields)
+    assert domains == {"ysnPairs": ["yes", "no"]}
+    frames = apply_categories({"LiveFish": pd.DataFrame({"ysnPairs": VALUES})}, {"LiveFish": domains})
+    series = frames["LiveFish"]["ysnPairs"]
+    assert list(series.cat.categories) == ["maybe", "no", "yes"]
+    assert series.isna().tolist() == [False, False, True, False, False]
+    assert series.astype(object).where(series.notna(), None).tolist() == VALUES
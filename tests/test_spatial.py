@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from wlpsalmon import pipeline
+from wlpsalmon.snapshot import read_snapshot
+from wlpsalmon.sources import ServiceSource
+from wlpsalmon.spatial import WEB_MERCATOR_WKT, WGS84_WKT, write_spatial
+from wlpsalmon.summary import build_summary
+
+
+def _set_spatial_reference(frames, spatial_reference, project=False):
+    # Gives every live fish and carcass point *spatial_reference*, with its coordinates in Web Mercator metres when *project* is True
+    for layer in ("LiveFish", "Carcass"):
+        shapes = []
+        for shape in frames[layer]["SHAPE"]:
+            x, y = shape["x"], shape["y"]
+            if project:
+                x, y = np.radians(x) * 6378137, np.log(np.tan(np.pi / 4 + np.radians(y) / 2)) * 6378137
+            shapes.append({"x": float(x), "y": float(y), "spatialReference": spatial_reference})
+        frames[layer]["SHAPE"] = shapes
+
+
+def _srs(path):
+    # (srs_id of each layer, definition of each srs_id) of a GeoPackage
+    with sqlite3.connect(path) as connection:
+        layers = dict(connection.execute("SELECT table_name, srs_id FROM gpkg_geometry_columns"))
+        definitions = dict(connection.execute("SELECT srs_id, definition FROM gpkg_spatial_ref_sys"))
+    return layers, definitions
+
+
+def test_wgs84_points(survey_frames, tmp_path):
+    sheets = build_summary(survey_frames, 2021)
+    paths = write_spatial(sheets, str(tmp_path / "summary.xlsx"))
+    layers, definitions = _srs(paths["gpkg"])
+    assert set(layers.values()) == {4326}
+    assert definitions[4326] == WGS84_WKT
+    for path in paths["geoparquet"].values():
+        column = json.loads(pq.read_schema(path).metadata[b"geo"])["columns"]["geometry"]
+        assert "crs" not in column
+    prj = [name for name in os.listdir(tmp_path / "summary_density") if name.endswith(".prj")]
+    assert prj and open(tmp_path / "summary_density" / prj[0]).read() == WGS84_WKT
+
+
+def test_web_mercator_points(survey_frames, tmp_path):
+    _set_spatial_reference(survey_frames, {"wkid": 102100, "latestWkid": 3857}, project=True)
+    sheets = build_summary(survey_frames, 2021)
+    paths = write_spatial(sheets, str(tmp_path / "summary.xlsx"))
+    layers, definitions = _srs(paths["gpkg"])
+    assert set(layers.values()) == {3857}
+    assert definitions[3857] == WEB_MERCATOR_WKT
+    for path in paths["geoparquet"].values():
+        crs = json.loads(pq.read_schema(path).metadata[b"geo"])["columns"]["geometry"]["crs"]
+        assert crs["id"] == {"authority": "EPSG", "code": 3857}
+    prj = [name for name in os.listdir(tmp_path / "summary_density") if name.endswith(".prj")]
+    assert prj and open(tmp_path / "summary_density" / prj[0]).read() == WEB_MERCATOR_WKT
+
+
+@pytest.mark.parametrize("spatial_reference", [{"wkid": 2927}, None])
+def test_unknown_spatial_reference_raises(survey_frames, tmp_path, spatial_reference):
+    _set_spatial_reference(survey_frames, spatial_reference)
+    sheets = build_summary(survey_frames, 2021)
+    for formats in (("gpkg",), ("geoparquet",), ("raster",)):
+        with pytest.raises(ValueError, match="EPSG spatial references"):
+            write_spatial(sheets, str(tmp_path / "summary.xlsx"), formats)
+
+
+def test_season_without_records_gets_no_spatial_outputs(survey_frames, tmp_path):
+    sheets = build_summary(survey_frames, 2019)
+    assert write_spatial(sheets, str(tmp_path / "summary.xlsx")) == {}
+    assert os.listdir(tmp_path) == []
+
+
+def test_sheet_without_records_takes_the_other_spatial_reference(survey_frames, tmp_path):
+    _set_spatial_reference(survey_frames, {"wkid": 102100, "latestWkid": 3857}, project=True)
+    survey_frames["Carcass"] = survey_frames["Carcass"].iloc[:0]
+    sheets = build_summary(survey_frames, 2021)
+    paths = write_spatial(sheets, str(tmp_path / "summary.xlsx"))
+    layers, definitions = _srs(paths["gpkg"])
+    assert set(layers.values()) == {3857}
+    with sqlite3.connect(paths["gpkg"]) as connection:
+        assert connection.execute('SELECT COUNT(*) FROM "Carcasses"').fetchone() == (0,)
+    assert list(paths["geoparquet"]) == ["Live Fish"]
+    assert paths["raster"]["Carcasses"] == {} and paths["raster"]["Redds"]
+
+
+@pytest.mark.parametrize("geometry", ["esri", "xy"])
+def test_service_points_reach_the_geopackage(feature_service, tmp_path, geometry):
+    ## The service gives the spatial reference once per page, as {"wkid": 102100, "latestWkid": 3857} for a hosted layer in Web Mercator
+    _set_spatial_reference(feature_service.frames, None, project=True)
+    feature_service.spatial_reference = {"wkid": 102100, "latestWkid": 3857}
+    result = pipeline.run(ServiceSource(feature_service.url), 2021, str(tmp_path), timestamp="t", snapshot_dir=str(tmp_path / "snapshots"), message=lambda line: None, geometry=geometry, spatial=("gpkg",))
+    layers, definitions = _srs(result["spatial"]["gpkg"])
+    assert set(layers.values()) == {3857}
+    assert definitions[3857] == WEB_MERCATOR_WKT
+    frames = read_snapshot(str(tmp_path / "snapshots"), "t", layers=["Carcass"])
+    assert frames["Carcass"]["SHAPE"].iloc[0]["spatialReference"] == feature_service.spatial_reference
@@ -0,0 +1,17 @@
+from wlpsalmon.spec import SHEET_FIELDS
+from wlpsalmon.summary import build_summary
+
+
+def test_carcasses_sheet_shows_carcass_count_fields(survey_frames):
+    sheets = build_summary(survey_frames, 2021)
+    derived = ["intCountedLast", "intNewMales", "intNewFemales", "intNewJuveniles", "intNewUnknown"]
+    assert list(sheets["Carcasses"].columns) == SHEET_FIELDS["Carcasses"] + derived
+    assert sheets["Carcasses"][derived].sum().sum() == sheets["Carcass Summary"][derived].sum().sum()
+
+
+def test_live_fish_without_species_are_not_summarized(survey_frames):
+    dfLiveFish = survey_frames["LiveFish"]
+    dfLiveFish.loc[dfLiveFish.index[::3], "strLiveSpecies"] = None
+    dfSummary = build_summary(survey_frames, 2021)["Live Fish Summary"]
+    ## Only surveys without live fish of any species keep a row without species, with zero counts
+    assert (dfSummary.loc[dfSummary["strLiveSpecies"].isna(), "intLiveFish"] == 0).all()
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from wlpsalmon.instrument import RunReport
+from wlpsalmon.summary import build_summary
+from wlpsalmon.times import survey_times
+
+DATE = pd.Timestamp("2021-11-20")
+
+
+@pytest.mark.parametrize("start, turn, end, total, end_date, turn_date, conflict", [
+    ("09:00", "10:30", "12:15", "3h15min", DATE, DATE, False),
+    ## A survey crossing midnight, turning before it and after it
+    ("22:30", "23:45", "01:15", "2h45min", DATE + pd.Timedelta(days=1), DATE, False),
+    ("22:30", "00:30", "01:15", "2h45min", DATE + pd.Timedelta(days=1), DATE + pd.Timedelta(days=1), False),
+    ## Start and end typed the wrong way round: the turn between them rules out a midnight crossing
+    ("10:00", "09:45", "09:30", None, None, None, True),
+    ## A turn outside the survey
+    ("09:00", "13:00", "12:00", None, None, None, True),
+    ## Without a turn only a survey ending after its start is in order
+    ("09:00", None, "12:00", "3h", DATE, None, False),
+    ("10:00", None, "09:30", None, None, None, True),
+    ## Null and malformed times are missing, not conflicting
+    (None, "10:00", "12:00", None, DATE, DATE, False),
+    ("9:00", "10:00", "25:00", None, None, DATE, False),
+])
+def test_turn_decides_midnight_crossing(start, turn, end, total, end_date, turn_date, conflict):
+    df = survey_times(pd.Series([DATE]), pd.Series([start], dtype=object), pd.Series([end], dtype=object), pd.Series([turn], dtype=object))
+    row = df.iloc[0]
+    assert row["ysnTimeConflict"] == conflict
+    if total is None:
+        assert pd.isna(row["dtmManualTimeTotal"])
+    else:
+        assert row["dtmManualTimeTotal"] == pd.Timedelta(total)
+    if end_date is None:
+        assert pd.isna(row["dtmManualTimeEnd_dt"])
+    else:
+        assert row["dtmManualTimeEnd_dt"].normalize() == end_date
+    if turn_date is None:
+        assert pd.isna(row["dtmManualTimeTurn_dt"])
+    else:
+        assert row["dtmManualTimeTurn_dt"].normalize() == turn_date
+
+
+def test_conflicting_times_are_reported(survey_frames):
+    dfMetadata = survey_frames["Metadata"]
+    surveys = dfMetadata.index[dfMetadata["dtmDate"].dt.year == 2021][:2]
+    dfMetadata.loc[surveys, ["dtmManualTimeStart", "dtmManualTimeTurn", "dtmManualTimeEnd"]] = [["10:00", "09:45", "09:30"], ["10:00", None, "09:30"]]
+    report = RunReport(lambda line: None)
+    sheets = build_summary(survey_frames, 2021, report=report)
+    conflicts = {record["strStage"]: record for record in report.stages}["observers"]["timeConflicts"]
+    assert conflicts == [
+        {"globalid": dfMetadata.at[surveys[0], "globalid"], "dtmManualTimeStart": "10:00", "dtmManualTimeTurn": "09:45", "dtmManualTimeEnd": "09:30"},
+        {"globalid": dfMetadata.at[surveys[1], "globalid"], "dtmManualTimeStart": "10:00", "dtmManualTimeTurn": None, "dtmManualTimeEnd": "09:30"},
+    ]
+    dfSheet = sheets["Metadata"].set_index("globalid")
+    assert dfSheet.loc[[record["globalid"] for record in conflicts], "dtmManualTimeTotal"].isna().all()
+    assert dfSheet["dtmManualTimeTotal"].notna().sum() == len(dfSheet) - 2
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytz
+
+from wlpsalmon.timezones import REPORT_TIMEZONE_COLUMNS, convert_timezones, dst_table, local_wall_time
+
+
+def _around_transitions(tz_name, start="1970-01-01", end="2038-01-01"):
+    # Every quarter hour within a day of each DST transition of *tz_name* between *start* and *end*, as naive UTC datetimes
+    transitions, offsets = dst_table(tz_name)
+    transitions = transitions[(transitions >= pd.Timestamp(start).value) & (transitions < pd.Timestamp(end).value)]
+    steps = np.arange(-96, 97) * pd.Timedelta(15, "min").value
+    return pd.Series((transitions[:, None] + steps[None, :]).ravel().view("datetime64[ns]"))
+
+
+def test_wall_time_matches_pytz_around_every_transition():
+    tz = pytz.timezone("US/Pacific")
+    utc = _around_transitions("US/Pacific")
+    expected = np.array([pytz.utc.localize(dt).astimezone(tz).replace(tzinfo=None) for dt in utc.dt.to_pydatetime()], dtype="datetime64[ns]")
+    mismatches = int((local_wall_time(utc, "US/Pacific").to_numpy() != expected).sum())
+    assert len(utc) > 100 * 193
+    assert mismatches == 0
+
+
+def test_wall_time_keeps_nat():
+    utc = pd.Series(np.array(["2021-11-07T09:30", "NaT"], dtype="datetime64[ns]"))
+    wall = local_wall_time(utc, "US/Pacific")
+    assert wall[0] == pd.Timestamp("2021-11-07 01:30")
+    assert pd.isna(wall[1])
+
+
+def test_convert_timezones_matches_pandas_with_pytz():
+    utc = _around_transitions("US/Pacific", "2015-01-01", "2030-01-01")
+    utc[::50] = pd.NaT
+    frames = {"Metadata": pd.DataFrame({"dtmDate": utc, "CreationDate": utc[::-1].to_numpy(), "EditDate": utc}), "Observer": pd.DataFrame({"EditDate": utc})}
+    converted = convert_timezones(frames, REPORT_TIMEZONE_COLUMNS)
+    tz = pytz.timezone("US/Pacific")
+    for layer, df in frames.items():
+        for col in df.columns:
+            expected = df[col].dt.tz_localize("UTC")
+            pd.testing.assert_series_equal(converted[layer][col], expected)
+            if col in REPORT_TIMEZONE_COLUMNS.get(layer, []):
+                pacific = converted[layer][col + "_Pacific"]
+                pd.testing.assert_series_equal(pacific, expected.dt.tz_convert(tz), check_names=False)
+                pd.testing.assert_series_equal(local_wall_time(pacific), expected.dt.tz_convert(tz).dt.tz_localize(None), check_names=False)
+            else:
+                assert col + "_Pacific" not in converted[layer].columns
@@ -0,0 +1,5 @@
+### wlpsalmon
+### Author: Khem So, khem_so@fws.gov, (971) 282-2193
+### Abstract: Importable pieces of the Willapa NWR salmon spawning survey data tools. The notebooks and archive scripts in the repository root remain the reference workflow; this package holds the parts that are shared between them.
+
+__version__ = "0.1.0"
@@ -0,0 +1,119 @@
+### Incremental per-survey aggregates of the live fish and carcass records.
+### During the field season the tool is rerun daily and only a few surveys change between runs. SurveyAggregates keeps, for each season and sheet, the derived count fields of every child record and the per-survey, per-species sums built from them. A run applies only the changes: records that are new, edited or deleted since the last run are derived again or dropped, and only the surveys they belong to, before and after the change, are grouped again. The other sums are kept as they are. Changes are found by comparing the child keys, and a hash of each record's rule inputs and survey key, with the stored ones. The globalids a sync cache pulled are not used: they cover the edits since the last sync of any season, not since the store of this season was written, so a season summarized before another season's sync would miss its edits.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .keys import key_columns
+from .memo import INPUT_FIELDS, RULES_VERSION, SPECIES_FIELDS
+
+### Count fields of the derived records that the groupby sums, keyed by sheet
+SUM_FIELDS = {
+    "Live Fish": ["intNumRedds", "intReddBuilding", "dblPairs", "intMales", "intFemales", "intUnknown"],
+    "Carcasses": ["intNumCarcasses", "intCountedLast", "intNewMales", "intNewFemales", "intNewJuveniles", "intNewUnknown"],
+}
+
+### Child globalid field of the joined sheets; records are matched on its normalized text, which the joins already hold, rather than parsing every GUID again
+RECORD_KEY = "globalid_y"
+
+STATE_FILE = "state.json"
+
+
+class SurveyAggregates:
+    """On-disk store of the derived child records and per-survey sums of each season. Only the changed records are derived and only their surveys grouped, but finding them still costs time in proportion to the season: every run hashes the rule inputs of every record, reads the stored records back and matches them on their globalid. benchmarks/bench_aggregate.py times this against a full derive and group; with the vectorized rules, the store does not beat the full summary on the synthetic surveys, and reading and matching cost several times the hashing.
+    : param store_dir: Folder of the store; created if it does not exist
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        # Records derived and dropped, and surveys grouped, by the last summarize call of each sheet
+        self.stats = {}
+
+    def _folder(self, season, sheet):
+        folder = os.path.join(self.store_dir, str(season), sheet.replace(" ", ""))
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def _read(self, folder):
+        # Returns (dfStored, dfSums), or (None, None) when the folder holds nothing written with the current rules
+        try:
+            with open(os.path.join(folder, STATE_FILE)) as f:
+                state = json.load(f)
+            if state.get("strRulesVersion") != RULES_VERSION:
+                return None, None
+            return pd.read_parquet(os.path.join(folder, "records.parquet")), pd.read_parquet(os.path.join(folder, "sums.parquet"))
+        except (OSError, ValueError):
+            return None, None
+
+    def _write(self, folder, dfStored, dfSums):
+        ## The state is written last; a run interrupted before it starts again from a full derivation
+        path = os.path.join(folder, STATE_FILE)
+        if os.path.exists(path):
+            os.remove(path)
+        dfStored.to_parquet(os.path.join(folder, "records.parquet"), index=False)
+        dfSums.to_parquet(os.path.join(folder, "sums.parquet"), index=False)
+        with open(path, "w") as f:
+            json.dump({"strRulesVersion": RULES_VERSION, "intRecords": len(dfStored), "intSums": len(dfSums)}, f, indent=2)
+
+    def _contributions(self, sheet, dfRecords, derive):
+        # Returns the derived count fields of *dfRecords* with the survey key, the child globalid and the hash of the rule inputs of each record
+        dfRecords = dfRecords.copy(deep=False)
+        dfRecords["uintRowHash"] = pd.util.hash_pandas_object(dfRecords[INPUT_FIELDS[sheet]], index=True).to_numpy()
+        dfDerived = derive(dfRecords).reset_index()
+        return dfDerived[key_columns("globalid") + [RECORD_KEY, "uintRowHash", SPECIES_FIELDS[sheet]] + SUM_FIELDS[sheet]]
+
+    def summarize(self, season, sheet, dfRecords, derive, group):
+        """Returns the summary of *dfRecords* as group(derive(dfRecords)) would, deriving only the records changed since the last run and grouping only their surveys
+        : param season: The year of the summary
+        : param sheet: "Live Fish" or "Carcasses"
+        : param dfRecords: Joined child records from summary.join_live_fish or summary.join_carcasses
+        : param derive: summary.derive_live_fish or summary.derive_carcasses
+        : param group: summary.group_live_fish or summary.group_carcasses
+        """
+        keys = key_columns("globalid")
+        species = SPECIES_FIELDS[sheet]
+        folder = self._folder(season, sheet)
+        dfStored, dfSums = self._read(folder)
+
+        if dfStored is None:
+            ## Nothing stored yet: derive and group every record
+            dfStored = self._contributions(sheet, dfRecords, derive)
+            dfSums = group(dfStored)
+            self.stats[sheet] = {"intRecordsDerived": len(dfStored), "intRecordsDropped": 0, "intSurveysGrouped": dfSums[keys].drop_duplicates().shape[0]}
+        else:
+            ## Match the records of this run with the stored ones on the child globalid
+            records = dfRecords[RECORD_KEY].to_numpy(dtype=object)
+            position = pd.Index(dfStored[RECORD_KEY].to_numpy(dtype=object)).get_indexer(records)
+            found = position >= 0
+            kept = np.zeros(len(dfStored), dtype=bool)
+            kept[position[found]] = True
+
+            ## Edited records: other rule inputs, or another survey, than stored; records no longer pulled are dropped
+            row_hashes = pd.util.hash_pandas_object(dfRecords[INPUT_FIELDS[sheet]], index=True).to_numpy()
+            edited = np.zeros(len(dfRecords), dtype=bool)
+            edited[found] = row_hashes[found] != dfStored["uintRowHash"].to_numpy()[position[found]]
+            kept[position[found & edited]] = False
+
+            ## Derive the new and edited records only, and replace the dropped ones
+            dfDerived = self._contributions(sheet, dfRecords[~found | edited], derive)
+            dfDropped = dfStored[~kept]
+            dfStored = pd.concat([dfStored[kept], dfDerived], ignore_index=True)
+
+            ## Group again only the surveys of the dropped and derived records; edited records may have moved to another survey
+            surveys = pd.MultiIndex.from_arrays([np.concatenate([dfDropped[key].to_numpy(), dfDerived[key].to_numpy()]) for key in keys]).unique()
+            regrouped = pd.MultiIndex.from_arrays([dfStored[key].to_numpy() for key in keys]).isin(surveys)
+            unchanged = ~pd.MultiIndex.from_arrays([dfSums[key].to_numpy() for key in keys]).isin(surveys)
+            dfSums = pd.concat([dfSums[unchanged], group(dfStored[regrouped])], ignore_index=True)
+            self.stats[sheet] = {"intRecordsDerived": len(dfDerived), "intRecordsDropped": len(dfDropped), "intSurveysGrouped": len(surveys)}
+            if len(dfDerived) or len(dfDropped):
+                dfSums = dfSums.sort_values(keys + [species], na_position="last", kind="stable", ignore_index=True)
+
+        if self.stats[sheet]["intRecordsDerived"] or self.stats[sheet]["intRecordsDropped"]:
+            self._write(folder, dfStored, dfSums)
+        if isinstance(dfRecords[species].dtype, pd.CategoricalDtype):
+            dfSums[species] = pd.Categorical(dfSums[species].astype(object), categories=dfRecords[species].cat.categories)
+        return dfSums
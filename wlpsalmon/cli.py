@@ -0,0 +1,141 @@
+### Command-line entry point: python -m wlpsalmon YEAR OUT_WORKSPACE [options]
+### Only argparse is imported up front. pandas and the pipeline are imported once the arguments are parsed, and the ArcGIS API for Python only for the sources that need it (a file geodatabase export, or a service token from ArcGIS Pro), so offline runs on snapshots or backup workbooks never load arcpy or arcgis.
+
+import argparse
+import sys
+import time
+
+### Source names accepted by --source
+SOURCES = ("service", "fgdb", "backup", "snapshot")
+
+### Outputs accepted by --spatial, as spatial.SPATIAL_FORMATS; listed here so the parser does not import pandas
+SPATIAL_FORMATS = ("gpkg", "geoparquet", "raster")
+
+### Residence time in days used by --escapement without a value, as escapement.RESIDENCE_DAYS
+RESIDENCE_DAYS = 10.0
+
+
+def parse_years(text):
+    """Returns the list of years of a YEAR or FIRST-LAST argument, as text
+    : param text: For example "2021" or "2015-2025"
+    """
+    first, _, last = text.partition("-")
+    try:
+        first, last = int(first), int(last or first)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YEAR or FIRST-LAST, not {text!r}")
+    if last < first:
+        raise argparse.ArgumentTypeError(f"the last year of {text!r} is before the first")
+    return [str(year) for year in range(first, last + 1)]
+
+
+def parse_spatial(text):
+    """Returns the tuple of spatial outputs of a comma-separated --spatial argument
+    : param text: For example "gpkg,raster"
+    """
+    formats = tuple(name.strip() for name in text.split(",") if name.strip())
+    unknown = [name for name in formats if name not in SPATIAL_FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown spatial outputs {', '.join(unknown)}; choose from {', '.join(SPATIAL_FORMATS)}")
+    return formats
+
+
+def parse_residence_days(text):
+    """Returns the residence time of an --escapement argument: a number of days, or a dictionary of days keyed by species
+    : param text: For example "10" or "Coho=11.3,Chum=10"
+    """
+    try:
+        if "=" not in text:
+            return float(text)
+        return {species.strip(): float(days) for species, _, days in (item.partition("=") for item in text.split(",") if item.strip())}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected DAYS or SPECIES=DAYS,..., not {text!r}")
+
+
+def build_parser():
+    """Returns the argparse parser of the command line"""
+    parser = argparse.ArgumentParser(prog="python -m wlpsalmon", description="Join and summarize the Willapa NWR salmon spawning survey data and write the summary workbook of each year.")
+    parser.add_argument("years", type=parse_years, help="Year of interest, or a FIRST-LAST range of years written from one download")
+    parser.add_argument("out_workspace", help="Folder for local file saving")
+    parser.add_argument("--source", choices=SOURCES, default="service", help="Where the raw data is read from (default: service)")
+    parser.add_argument("--path", help="Path of the .gdb folder, BKUP workbook or snapshot folder read by the fgdb, backup and snapshot sources")
+    parser.add_argument("--snapshot-timestamp", help="Pull timestamp of the snapshot to read; defaults to the most recent one")
+    parser.add_argument("--service-url", help="The url of the FeatureServer")
+    parser.add_argument("--token", help="ArcGIS token for the service source")
+    parser.add_argument("--arcgis-pro", action="store_true", help="Take the service token from the ArcGIS Pro sign-in; loads the ArcGIS API for Python")
+    parser.add_argument("--cache-dir", help="Sync cache folder for the service source")
+    parser.add_argument("--plan-year", action="store_true", help="Push the year filter into the service queries")
+    parser.add_argument("--backup", action="store_true", help="Also write the raw BKUP workbook")
+    parser.add_argument("--snapshot-dir", help="Also save the raw pull as a snapshot in this folder")
+    parser.add_argument("--datetime-mode", choices=("text", "native"), default="text", help="How timezone aware datetime fields are written (default: text)")
+    parser.add_argument("--timestamp", help="Timestamp for file naming, '%%Y-%%m-%%d_%%H%%M'; defaults to now")
+    parser.add_argument("--processes", type=int, help="Worker processes for a range of years; defaults to the number of CPUs")
+    parser.add_argument("--memo-dir", help="Folder of the summary memo; only surveys changed since an earlier run are summarized again")
+    parser.add_argument("--aggregate-dir", help="Folder of the incremental aggregate store; only records changed since the last run are derived again")
+    parser.add_argument("--geometry", choices=("esri", "xy", "wkb", "skip"), default="esri", help="How SHAPE is carried through the summary: Esri JSON, x/y arrays, WKB, or not at all (default: esri)")
+    parser.add_argument("--spatial", type=parse_spatial, default=(), help="Comma-separated spatial outputs written next to each workbook: gpkg, geoparquet, raster")
+    parser.add_argument("--escapement", type=parse_residence_days, nargs="?", const=RESIDENCE_DAYS, metavar="DAYS", help="Also write the escapement workbook, using this residence time in days or SPECIES=DAYS,... (default: 10)")
+    parser.add_argument("--profile", metavar="STAGE", help="Profile one stage, for example joins; the profile is saved next to the run report")
+    parser.add_argument("--profiler", choices=("cprofile", "pyinstrument"), default="cprofile", help="Profiler used by --profile (default: cprofile)")
+    return parser
+
+
+def make_source(args):
+    """Returns the sources.Source instance selected by the parsed arguments
+    : param args: Parsed arguments of build_parser
+    """
+    from . import sources
+    if args.source != "service" and not args.path:
+        raise SystemExit(f"--path is required with --source {args.source}")
+    if args.source == "fgdb":
+        return sources.FileGeodatabaseSource(args.path)
+    if args.source == "backup":
+        return sources.BackupWorkbookSource(args.path)
+    if args.source == "snapshot":
+        ## Snapshots store WKB, which the xy and wkb modes keep without decoding each point
+        return sources.SnapshotSource(args.path, args.snapshot_timestamp, geometry=args.geometry if args.geometry in ("esri", "xy") else "wkb")
+    token = args.token
+    if args.arcgis_pro and not token:
+        from arcgis.gis import GIS
+        token = GIS("pro")._con.token
+    kwargs = {"service_url": args.service_url} if args.service_url else {}
+    return sources.ServiceSource(token=token, cache_dir=args.cache_dir, plan_year=args.plan_year, **kwargs)
+
+
+def main(argv=None):
+    """Runs the command line and returns the exit status
+    : param argv: Arguments; defaults to sys.argv[1:]
+    """
+    start = time.perf_counter()
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.memo_dir and args.aggregate_dir:
+        parser.error("--memo-dir and --aggregate-dir cannot be used together")
+    if args.spatial and args.geometry in ("skip", "wkb"):
+        parser.error("--spatial needs --geometry esri or xy")
+    from . import pipeline
+    source = make_source(args)
+    options = dict(timestamp=args.timestamp, backup=args.backup, snapshot_dir=args.snapshot_dir, datetime_mode=args.datetime_mode, profile_stage=args.profile, profiler=args.profiler, memo_dir=args.memo_dir, aggregate_dir=args.aggregate_dir, geometry=args.geometry, spatial=args.spatial, escapement=args.escapement)
+    print(f"Ready in {time.perf_counter() - start:.2f} s")
+    if len(args.years) == 1:
+        result = pipeline.run(source, args.years[0], args.out_workspace, **options)
+        print(f"Summary data exported to {result['summary']}")
+    else:
+        result = pipeline.run_batch(source, args.years, args.out_workspace, processes=args.processes, **options)
+        for year, season in result["years"].items():
+            print(f"{year}: {season['summary']} ({result['timings'][year]:.2f} s)")
+    if "backup" in result:
+        print(f"Exported raw data to {result['backup']}")
+    if "escapement" in result:
+        print(f"Escapement estimates exported to {result['escapement']}")
+    if "spatial" in result:
+        print(f"Spatial outputs written next to {result['summary']}")
+    if "snapshot" in result:
+        print(f"Saved snapshot to {result['snapshot']}")
+    print(f"Run report written to {result['report']}")
+    print(f"Completed in {time.perf_counter() - start:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
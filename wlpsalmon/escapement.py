@@ -0,0 +1,139 @@
+### Season estimates of escapement from the per-survey counts of the summary sheets.
+### For each stream, species and spawning season, the live fish counts of the Live Fish Summary sheet are integrated over the survey dates with the trapezoidal rule. The area under the curve (fish-days) divided by the residence time (the days a fish stays in the survey reach) estimates the escapement. The same groups get the redd total, the peak live and carcass counts, and the cumulative new carcass curve from intNewNumCarcasses of the Carcass Summary sheet. Every group of every season is computed at once: the counts are put on one sorted table of stream, species, season and survey date, and each estimate is a whole-array operation over it.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+### First day (MM-DD) of a spawning season. Surveys run from September into January, so a season is named by the year it starts in and its January surveys belong to the season of the year before; the curves never bridge the months between seasons.
+SEASON_START = "07-01"
+
+### Default residence time in days. Survey life differs by species, stream and year; pass the values used for the season, for example a dictionary keyed by species.
+RESIDENCE_DAYS = 10.0
+
+### Fields of the groups of every estimate
+GROUP_FIELDS = ["strStream", "strSpecies", "intSeason"]
+
+### Sheet names of the escapement workbook
+ESCAPEMENT_SHEETS = ("Escapement", "Carcass Curves")
+
+
+def escapement_path(out_workspace, years, timestamp):
+    """Returns the path of the escapement workbook of a range of years
+    : param out_workspace: Folder for local file saving
+    : param years: The years of interest
+    : param timestamp: Timestamp for file naming, '%Y-%m-%d_%H%M'
+    """
+    years = [str(year) for year in years]
+    span = years[0] if len(years) == 1 else f"{years[0]}-{years[-1]}"
+    return os.path.join(out_workspace, ('WLP_Salmon_Spawning_Escapement_' + span + '_' + timestamp + '.xlsx'))
+
+
+def spawning_season(dates, season_start=SEASON_START):
+    """Returns the spawning season of each date as an integer array: the year the season started in, the year before for dates earlier than *season_start*
+    : param dates: Series of datetimes
+    : param season_start: First day of a season, MM-DD
+    """
+    month, day = (int(part) for part in season_start.split("-"))
+    years = dates.dt.year.to_numpy()
+    return years - ((dates.dt.month * 100 + dates.dt.day).to_numpy() < month * 100 + day)
+
+
+def survey_counts(dfSummary, species, fields, season_start=SEASON_START):
+    """Returns the counts of *fields* summed per stream, species, spawning season and survey date, with a zero row for each survey of the stream and season that saw none of a species seen there that season; sorted on GROUP_FIELDS and dtmDate
+    : param dfSummary: Live Fish Summary or Carcass Summary sheets of one or more years, see summary.merge_summaries
+    : param species: Species field of *dfSummary*, strLiveSpecies or strCarcassSpecies
+    : param fields: Count fields of *dfSummary*
+    : param season_start: First day of a spawning season, MM-DD
+    """
+    dates = pd.to_datetime(dfSummary["dtmDate_Pacific"], format="%m/%d/%Y")
+    df = pd.DataFrame({"strStream": dfSummary["strStream"].astype(object).to_numpy(), "strSpecies": dfSummary[species].astype(object).to_numpy(), "intSeason": spawning_season(dates, season_start), "dtmDate": dates.to_numpy()})
+    for field in fields:
+        df[field] = pd.to_numeric(dfSummary[field]).fillna(0).to_numpy(dtype=float)
+    df = df[df["strStream"].notna() & df["dtmDate"].notna()]
+    ## Every survey date of each stream and season, crossed with the species seen there that season
+    dfDates = df[["strStream", "intSeason", "dtmDate"]].drop_duplicates()
+    dfSeen = df[df["strSpecies"].notna()]
+    dfGrid = dfSeen[["strStream", "intSeason", "strSpecies"]].drop_duplicates().merge(dfDates, on=["strStream", "intSeason"])
+    dfCounts = dfSeen.groupby(GROUP_FIELDS + ["dtmDate"], as_index=False, sort=False)[fields].sum()
+    dfGrid = dfGrid.merge(dfCounts, on=GROUP_FIELDS + ["dtmDate"], how="left")
+    dfGrid[fields] = dfGrid[fields].fillna(0)
+    return dfGrid.sort_values(GROUP_FIELDS + ["dtmDate"], kind="stable", ignore_index=True)[GROUP_FIELDS + ["dtmDate"] + fields]
+
+
+def _group_starts(dfCounts):
+    # Boolean array marking the first row of each group of the sorted counts
+    same = np.ones(max(len(dfCounts) - 1, 0), dtype=bool)
+    for field in GROUP_FIELDS:
+        values = dfCounts[field].to_numpy()
+        same &= values[1:] == values[:-1]
+    return np.r_[len(dfCounts) > 0, ~same]
+
+
+def trapezoid_auc(dfCounts, field):
+    """Returns the area under the curve of *field* over the survey dates of each group, in count-days, as a Series indexed by GROUP_FIELDS
+    : param dfCounts: Counts from survey_counts
+    : param field: Count field
+    """
+    counts = dfCounts[field].to_numpy(dtype=float)
+    days = (dfCounts["dtmDate"].to_numpy(dtype="datetime64[ns]") - np.datetime64(0, "ns")) / np.timedelta64(1, "D")
+    ## Trapezoid between each survey and the one before it in the same group
+    areas = np.zeros(len(counts))
+    areas[1:] = np.diff(days) * (counts[1:] + counts[:-1]) / 2
+    areas[_group_starts(dfCounts)] = 0
+    return pd.Series(areas, index=pd.MultiIndex.from_frame(dfCounts[GROUP_FIELDS])).groupby(level=GROUP_FIELDS, sort=False).sum()
+
+
+def _residence_days(species, residence_days):
+    # Residence time of each group; a dictionary is keyed by species, and species missing from it get NaN
+    if isinstance(residence_days, dict):
+        return pd.Series(species).map(residence_days).astype(float).to_numpy()
+    return np.full(len(species), float(residence_days))
+
+
+def _peaks(dfCounts, field, prefix):
+    # Peak count of *field* in each group and the first survey date it was reached
+    dfPeaks = dfCounts.sort_values(GROUP_FIELDS + [field, "dtmDate"], ascending=[True] * len(GROUP_FIELDS) + [False, True], kind="stable").drop_duplicates(GROUP_FIELDS)
+    return dfPeaks.set_index(GROUP_FIELDS)[[field, "dtmDate"]].set_axis([f"int{prefix}", f"dtm{prefix}"], axis=1)
+
+
+def carcass_curves(dfCarcassSummary, season_start=SEASON_START):
+    """Returns the new carcasses of each survey and their running total over the season, per stream, species and spawning season
+    : param dfCarcassSummary: Carcass Summary sheets of one or more years
+    : param season_start: First day of a spawning season, MM-DD
+    """
+    dfCounts = survey_counts(dfCarcassSummary, "strCarcassSpecies", ["intNewNumCarcasses", "intTotalCarcasses"], season_start)
+    ## Running total within each group: the cumulative sum, less the total of the groups before it
+    new = dfCounts["intNewNumCarcasses"].to_numpy()
+    total = np.cumsum(new)
+    starts = _group_starts(dfCounts)
+    group = np.cumsum(starts) - 1
+    before = np.r_[0.0, total][np.flatnonzero(starts)]
+    dfCounts["intCumNewCarcasses"] = total - before[group]
+    return dfCounts
+
+
+def estimate_escapement(dfLiveFishSummary, dfCarcassSummary, residence_days=RESIDENCE_DAYS, season_start=SEASON_START):
+    """Returns a dictionary of the escapement workbook sheets keyed by sheet name (see ESCAPEMENT_SHEETS): the estimates of each stream, species and spawning season, and the cumulative new carcass curves. The summary sheets of a calendar year hold the January surveys of the season before; a season is only complete when the sheets of both of its years are given.
+    : param dfLiveFishSummary: Live Fish Summary sheets of one or more years, see summary.merge_summaries
+    : param dfCarcassSummary: Carcass Summary sheets of the same years
+    : param residence_days: Residence time in days, one number or a dictionary keyed by species
+    : param season_start: First day of a spawning season, MM-DD
+    """
+    dfLive = survey_counts(dfLiveFishSummary, "strLiveSpecies", ["intLiveFish", "intNumRedds"], season_start)
+    dfLiveGroups = dfLive.groupby(GROUP_FIELDS, sort=False).agg(intSurveys=("dtmDate", "size"), dtmFirstSurvey=("dtmDate", "min"), dtmLastSurvey=("dtmDate", "max"), intRedds=("intNumRedds", "sum"))
+    dfLiveGroups["dblAUC"] = trapezoid_auc(dfLive, "intLiveFish")
+    dfLiveGroups["dblResidenceDays"] = _residence_days(dfLiveGroups.index.get_level_values("strSpecies"), residence_days)
+    dfLiveGroups["dblEscapement"] = dfLiveGroups["dblAUC"] / dfLiveGroups["dblResidenceDays"]
+    dfLiveGroups = dfLiveGroups.join(_peaks(dfLive, "intLiveFish", "PeakLiveFish"))
+
+    dfCurves = carcass_curves(dfCarcassSummary, season_start)
+    dfCarcassGroups = dfCurves.groupby(GROUP_FIELDS, sort=False).agg(intNewCarcasses=("intNewNumCarcasses", "sum"))
+    dfCarcassGroups = dfCarcassGroups.join(_peaks(dfCurves, "intTotalCarcasses", "PeakCarcasses"))
+
+    dfEscapement = dfLiveGroups.join(dfCarcassGroups, how="outer").reset_index()
+    dfEscapement = dfEscapement.sort_values(["intSeason", "strStream", "strSpecies"], kind="stable", ignore_index=True)
+    dfEscapement = dfEscapement[["intSeason", "strStream", "strSpecies", "intSurveys", "dtmFirstSurvey", "dtmLastSurvey", "dblAUC", "dblResidenceDays", "dblEscapement", "intPeakLiveFish", "dtmPeakLiveFish", "intRedds", "intNewCarcasses", "intPeakCarcasses", "dtmPeakCarcasses"]]
+    dfCurves = dfCurves.sort_values(["intSeason", "strStream", "strSpecies", "dtmDate"], kind="stable", ignore_index=True)
+    return dict(zip(ESCAPEMENT_SHEETS, [dfEscapement, dfCurves[["intSeason", "strStream", "strSpecies", "dtmDate", "intNewNumCarcasses", "intCumNewCarcasses", "intTotalCarcasses"]]]))
@@ -0,0 +1,215 @@
+### Excel export of the raw backup and the summary workbook.
+### Workbooks are streamed row by row through xlsxwriter in constant_memory mode, so memory use does not grow with the size of the raw tables. Numbers and naive datetimes are written as native Excel values with a number format.
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .geometry import PointArray
+from .timezones import convert_timezones, local_wall_time
+
+### Sheet names of the raw backup workbook keyed by layer name
+BACKUP_SHEETS = {"Metadata": "Metadata", "LiveFish": "Live Fish", "Carcass": "Carcasses", "Observer": "Observers"}
+
+### Excel number format of naive datetime fields
+DATETIME_FORMAT = "mm/dd/yyyy hh:mm:ss"
+
+### How timezone aware datetime fields are exported: "text" converts them with archive_dt_field; "native" writes their local wall time as Excel date serials and names the timezone in a note on the header cell
+DATETIME_MODES = ("text", "native")
+
+### Day zero of Excel date serials in the 1900 date system
+EXCEL_EPOCH = np.datetime64("1899-12-30T00:00:00", "ns")
+
+### Rows converted to Python values at a time while streaming a sheet
+CHUNK_ROWS = 10000
+
+### Maximum number of rows of an Excel worksheet, including the header row
+EXCEL_MAX_ROWS = 1048576
+
+
+### This function converts Python datetime64 fields to %m/%d/%Y %H:%M:%S %Z%z format
+def archive_dt_field(df):
+    """Selects fields with datetime data types, timezone aware or naive, and converts to %m/%d/%Y %H:%M:%S %Z%z format for archiving to Excel
+    : param df: The name of the spatially enabled or pandas DataFrame containing datetime fields
+    """
+    archive_dt_field_list = df.select_dtypes(include=['datetimetz', 'datetime64'])
+    for col in archive_dt_field_list:
+        df[col] = df[col].dt.strftime('%m/%d/%Y %H:%M:%S %Z%z')
+
+
+def backup_path(out_workspace, timestamp):
+    """Returns the path of the raw backup workbook
+    : param out_workspace: Folder for local file saving
+    : param timestamp: Timestamp for file naming, '%Y-%m-%d_%H%M'
+    """
+    return os.path.join(out_workspace, ('WLP_Salmon_Spawning_Survey_BKUP_' + timestamp + '.xlsx'))
+
+
+def summary_path(out_workspace, year, timestamp):
+    """Returns the path of the summary workbook of a year
+    : param out_workspace: Folder for local file saving
+    : param year: The year of interest
+    : param timestamp: Timestamp for file naming, '%Y-%m-%d_%H%M'
+    """
+    return os.path.join(out_workspace, ('WLP_Salmon_Spawning_Survey_' + str(year) + '_' + timestamp + '.xlsx'))
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of the process in MB, or None where it cannot be read"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return None
+
+
+def rss_mb():
+    """Returns the current resident set size of the process in MB, or None where it cannot be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss / (1024 * 1024)
+        except ImportError:
+            return None
+
+
+def _rss_delta(before, after):
+    # Change of the resident set size between two readings of rss_mb, or None where it cannot be read
+    return None if before is None or after is None else after - before
+
+
+def _column_values(series):
+    """Returns (kind, values) for a chunk of one column: the Excel cell type and a list of Python values, with None for empty cells"""
+    if pd.api.types.is_bool_dtype(series):
+        return "boolean", series.tolist()
+    if pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        return "number", [None if value != value else value for value in values.tolist()]
+    if isinstance(series.array, PointArray):
+        return "string", series.array.to_text()
+    if pd.api.types.is_datetime64_dtype(series):
+        values = series.to_numpy(dtype="datetime64[ns]")
+        serials = (values - EXCEL_EPOCH) / np.timedelta64(1, "D")
+        return "datetime", [None if value != value else value for value in serials.tolist()]
+    values = series.astype(object).tolist()
+    ## WKB geometries are written as hex text
+    return "string", [None if value is None or value != value else value if isinstance(value, str) else value.hex() if isinstance(value, bytes) else str(value) for value in values]
+
+
+def native_datetimes(df):
+    """Returns (df, notes): a shallow copy of *df* in which every timezone aware datetime field holds its naive local wall time, and a dictionary of header notes naming the timezone of each converted field
+    : param df: The DataFrame to export
+    """
+    aware = df.select_dtypes(include=['datetimetz']).columns
+    if not len(aware):
+        return df, {}
+    df = df.copy(deep=False)
+    notes = {}
+    for col in aware:
+        notes[col] = f"Local time in {df[col].dt.tz}"
+        df[col] = local_wall_time(df[col])
+    return df, notes
+
+
+def write_sheet(workbook, sheet_name, df, formats, notes=None):
+    """Streams one DataFrame to a new worksheet of an xlsxwriter workbook in constant_memory mode, one row at a time
+    : param workbook: An open xlsxwriter.Workbook
+    : param sheet_name: Name of the worksheet
+    : param df: The DataFrame to write
+    : param formats: Dictionary of xlsxwriter formats with "header" and "datetime" keys
+    : param notes: Optional dictionary of header cell notes keyed by field name
+    """
+    if len(df) + 1 > EXCEL_MAX_ROWS:
+        raise ValueError(f"Sheet {sheet_name} has {len(df)} rows; an Excel worksheet holds at most {EXCEL_MAX_ROWS - 1}")
+    worksheet = workbook.add_worksheet(sheet_name)
+    for col_idx, col in enumerate(df.columns):
+        worksheet.write_string(0, col_idx, str(col), formats["header"])
+        if notes and col in notes:
+            worksheet.write_comment(0, col_idx, notes[col])
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+        columns = [(col_idx,) + _column_values(chunk.iloc[:, col_idx]) for col_idx in range(len(df.columns))]
+        for i in range(len(chunk)):
+            row = start + i + 1
+            for col_idx, kind, values in columns:
+                value = values[i]
+                if value is None:
+                    continue
+                if kind == "string":
+                    worksheet.write_string(row, col_idx, value)
+                elif kind == "number":
+                    worksheet.write_number(row, col_idx, value)
+                elif kind == "datetime":
+                    worksheet.write_number(row, col_idx, value, formats["datetime"])
+                else:
+                    worksheet.write_boolean(row, col_idx, value)
+
+
+def write_workbook_streaming(sheets, path, datetime_mode="text"):
+    """Writes DataFrames to an Excel workbook, one sheet per DataFrame, through a constant memory writer. The DataFrames are not modified. Returns a list with the rows and write seconds of each sheet, the resident set size after it was written and its change while it was written (dblRSSMB, dblRSSDeltaMB), plus a final entry for closing the workbook.
+    : param sheets: Dictionary of DataFrames keyed by sheet name
+    : param path: Path of the workbook
+    : param datetime_mode: How timezone aware datetime fields are written, see DATETIME_MODES
+    """
+    if datetime_mode not in DATETIME_MODES:
+        raise ValueError(f"datetime_mode must be one of {DATETIME_MODES}, not {datetime_mode!r}")
+    import xlsxwriter
+    report = []
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    formats = {"header": workbook.add_format({"bold": True}), "datetime": workbook.add_format({"num_format": DATETIME_FORMAT})}
+    for sheet_name, df in sheets.items():
+        start = time.perf_counter()
+        rss = rss_mb()
+        notes = {}
+        if datetime_mode == "native":
+            df, notes = native_datetimes(df)
+        elif len(df.select_dtypes(include=['datetimetz']).columns):
+            df = df.copy(deep=False)
+            dfAware = df.select_dtypes(include=['datetimetz'])
+            archive_dt_field(dfAware)
+            df[dfAware.columns] = dfAware
+        write_sheet(workbook, sheet_name, df, formats, notes)
+        after = rss_mb()
+        report.append({"strSheet": sheet_name, "intRows": len(df), "dblSeconds": time.perf_counter() - start, "dblRSSMB": after, "dblRSSDeltaMB": _rss_delta(rss, after)})
+    start = time.perf_counter()
+    rss = rss_mb()
+    workbook.close()
+    after = rss_mb()
+    report.append({"strSheet": "(close)", "intRows": 0, "dblSeconds": time.perf_counter() - start, "dblRSSMB": after, "dblRSSDeltaMB": _rss_delta(rss, after)})
+    return report
+
+
+def write_workbook(sheets, path, datetime_mode="text", sheet_stats=None):
+    """Writes DataFrames to an Excel workbook with write_workbook_streaming and returns its path
+    : param sheets: Dictionary of DataFrames keyed by sheet name
+    : param path: Path of the workbook
+    : param datetime_mode: How timezone aware datetime fields are written, see DATETIME_MODES
+    : param sheet_stats: Optional list; when given, the entry of each sheet returned by write_workbook_streaming is added to it
+    """
+    stats = write_workbook_streaming(sheets, path, datetime_mode)
+    if sheet_stats is not None:
+        sheet_stats.extend(stats)
+    return path
+
+
+def write_backup(frames, out_workspace, timestamp, datetime_mode="text", sheet_stats=None):
+    """Writes the raw DataFrames, with the _Pacific fields added by convert_timezones, to the timestamped backup workbook and returns its path
+    : param frames: Dictionary of raw DataFrames keyed by layer name, with naive UTC datetime fields
+    : param out_workspace: Folder for local file saving
+    : param timestamp: Timestamp for file naming, '%Y-%m-%d_%H%M'
+    : param datetime_mode: How timezone aware datetime fields are written, see DATETIME_MODES
+    : param sheet_stats: Optional list; when given, the entry of each sheet returned by write_workbook_streaming is added to it
+    """
+    frames = convert_timezones(frames)
+    return write_workbook({BACKUP_SHEETS[layer]: df for layer, df in frames.items()}, backup_path(out_workspace, timestamp), datetime_mode, sheet_stats)
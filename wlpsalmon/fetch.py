@@ -0,0 +1,69 @@
+### Concurrent download of the four source layers.
+### The Metadata, LiveFish and Carcass layers and the Observer table are requested at the same time from a thread pool, and the result pages of each layer are fetched in parallel with a bounded number of workers. Transient errors are retried with backoff by rest.request_json.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from . import rest
+
+### Default concurrency: one thread per layer and up to four pages in flight per layer
+LAYER_WORKERS = 4
+PAGE_WORKERS = 4
+
+
+def _timed_fetch(service_url, layer, where, token, page_workers, fields, stats):
+    start = time.perf_counter()
+    out_fields, return_geometry = fields.get(layer, (rest.OBSERVER_FIELDS if layer == "Observer" else "*", True))
+    df = rest.fetch_layer(service_url, layer, where=where, out_fields=out_fields, return_geometry=return_geometry, token=token, max_workers=page_workers, stats=stats)
+    return df, time.perf_counter() - start
+
+
+def fetch_layers(service_url=rest.SERVICE_URL, layers=tuple(rest.LAYERS), where=None, token=None, layer_workers=LAYER_WORKERS, page_workers=PAGE_WORKERS, fields=None, transfer=None):
+    """Returns (frames, timings): a dictionary of DataFrames keyed by layer name, and a dictionary of the seconds spent on each layer plus the "Total" wall-clock time
+    : param service_url: The url of the FeatureServer
+    : param layers: Names of the layers to download
+    : param where: Optional dictionary of where clauses keyed by layer name; layers not listed use 1=1
+    : param token: Optional ArcGIS token
+    : param layer_workers: Maximum number of layers downloaded at the same time
+    : param page_workers: Maximum number of pages requested at the same time within each layer
+    : param fields: Optional dictionary of (out_fields, return_geometry) keyed by layer name, see spec.layer_fields; layers not listed request every field and the geometry
+    : param transfer: Optional dictionary; when given, the rest.TransferStats of each layer are added to it keyed by layer name
+    """
+    where = where or {}
+    fields = fields or {}
+    transfer = {} if transfer is None else transfer
+    for layer in layers:
+        transfer[layer] = rest.TransferStats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(layer_workers, len(layers)))) as executor:
+        futures = {layer: executor.submit(_timed_fetch, service_url, layer, where.get(layer, "1=1"), token, page_workers, fields, transfer[layer]) for layer in layers}
+        results = {layer: future.result() for layer, future in futures.items()}
+    frames = {layer: result[0] for layer, result in results.items()}
+    timings = {layer: result[1] for layer, result in results.items()}
+    timings["Total"] = time.perf_counter() - start
+    return frames, timings
+
+
+def fetch_layers_serial(service_url=rest.SERVICE_URL, layers=tuple(rest.LAYERS), where=None, token=None, fields=None, transfer=None):
+    """Returns (frames, timings) like fetch_layers, downloading one layer and one page at a time as the script does
+    : param service_url: The url of the FeatureServer
+    : param layers: Names of the layers to download
+    : param where: Optional dictionary of where clauses keyed by layer name
+    : param token: Optional ArcGIS token
+    : param fields: Optional dictionary of (out_fields, return_geometry) keyed by layer name
+    : param transfer: Optional dictionary for the rest.TransferStats of each layer
+    """
+    return fetch_layers(service_url, layers, where=where, token=token, layer_workers=1, page_workers=1, fields=fields, transfer=transfer)
+
+
+def timing_report(serial_timings, parallel_timings):
+    """Returns a DataFrame comparing per-layer seconds of the serial and the concurrent fetch, with the speedup of each layer and of the total
+    : param serial_timings: Timings returned by fetch_layers_serial
+    : param parallel_timings: Timings returned by fetch_layers
+    """
+    dfReport = pd.DataFrame({"dblSerialSeconds": pd.Series(serial_timings), "dblParallelSeconds": pd.Series(parallel_timings)})
+    dfReport["dblSpeedup"] = dfReport["dblSerialSeconds"] / dfReport["dblParallelSeconds"]
+    dfReport.index.name = "strLayer"
+    return dfReport.reset_index()
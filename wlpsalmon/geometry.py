@@ -0,0 +1,241 @@
+### Geometry modes for the SHAPE column of the survey layers.
+### A pull holds one Python geometry per record, an Esri JSON dictionary or an arcgis Geometry. These objects are carried through every join and copy and only written to Excel as text. set_geometry keeps SHAPE in one of these modes instead:
+###   "esri" - Esri JSON dictionaries, as pulled
+###   "xy"   - PointArray, two float64 arrays of 2D point coordinates; a dictionary is only created for a cell that is read on its own, and the Excel text is formatted from the arrays
+###   "wkb"  - WKB bytes, one small object per record
+###   "skip" - no geometry; the layers are queried without it and SHAPE is left empty
+### The survey layers hold points. Geometries of any other type are kept as WKB in the "xy" mode.
+
+import struct
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import ExtensionArray, ExtensionDtype, register_extension_dtype, take
+
+### Geometry modes accepted by set_geometry
+GEOMETRY_MODES = ("esri", "xy", "wkb", "skip")
+
+### Layers whose sheets show SHAPE
+GEOMETRY_LAYERS = ("LiveFish", "Carcass")
+
+### WKB layout of a little-endian 2D point: byte order, geometry type, x, y
+WKB_POINT = np.dtype([("order", "u1"), ("type", "<u4"), ("x", "<f8"), ("y", "<f8")])
+_WKB_POINT = struct.Struct("<BIdd")
+
+
+def _object_array(values):
+    # 1-D object array of *values*, whatever they hold
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+@register_extension_dtype
+class PointDtype(ExtensionDtype):
+    """pandas dtype of PointArray"""
+
+    name = "point"
+    type = dict
+    na_value = None
+
+    @classmethod
+    def construct_array_type(cls):
+        return PointArray
+
+
+class PointArray(ExtensionArray):
+    """2D points held as two float64 arrays; null points are NaN in both
+    : param x: x coordinates
+    : param y: y coordinates
+    : param spatial_reference: Optional Esri spatial reference dictionary of every point
+    """
+
+    def __init__(self, x, y, spatial_reference=None):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.spatial_reference = spatial_reference
+
+    @classmethod
+    def _from_sequence(cls, scalars, dtype=None, copy=False):
+        points = points_from_geometries(list(scalars))
+        if points is None:
+            raise TypeError("PointArray holds only 2D points")
+        return points
+
+    @classmethod
+    def _from_factorized(cls, values, original):
+        return cls._from_sequence(values)
+
+    @property
+    def dtype(self):
+        return PointDtype()
+
+    @property
+    def nbytes(self):
+        return self.x.nbytes + self.y.nbytes
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self._point(self.x[item], self.y[item])
+        item = pd.api.indexers.check_array_indexer(self, item)
+        return PointArray(self.x[item], self.y[item], self.spatial_reference)
+
+    def __eq__(self, other):
+        if isinstance(other, PointArray):
+            return (self.x == other.x) & (self.y == other.y)
+        return np.array([point == other for point in self], dtype=bool)
+
+    def _point(self, x, y):
+        # Esri JSON dictionary of one point, as snapshot.wkb_to_esri_point gives it
+        if np.isnan(x):
+            return None
+        point = {"x": float(x), "y": float(y)}
+        if self.spatial_reference:
+            point["spatialReference"] = self.spatial_reference
+        return point
+
+    def isna(self):
+        return np.isnan(self.x)
+
+    def take(self, indices, allow_fill=False, fill_value=None):
+        return PointArray(take(self.x, indices, allow_fill=allow_fill, fill_value=np.nan), take(self.y, indices, allow_fill=allow_fill, fill_value=np.nan), self.spatial_reference)
+
+    def copy(self):
+        return PointArray(self.x.copy(), self.y.copy(), self.spatial_reference)
+
+    @classmethod
+    def _concat_same_type(cls, to_concat):
+        spatial_reference = next((array.spatial_reference for array in to_concat if array.spatial_reference), None)
+        return cls(np.concatenate([array.x for array in to_concat]), np.concatenate([array.y for array in to_concat]), spatial_reference)
+
+    def _values_for_factorize(self):
+        return self.to_esri(), None
+
+    def __arrow_array__(self, type=None):
+        # Written to Parquet as WKB, as snapshots store SHAPE
+        import pyarrow as pa
+        return pa.array(self.to_wkb(), type=pa.binary())
+
+    def to_esri(self):
+        """Returns an object array of the Esri JSON dictionary of each point, None for null points"""
+        return _object_array([self._point(x, y) for x, y in zip(self.x.tolist(), self.y.tolist())])
+
+    def to_wkb(self):
+        """Returns an object array of the WKB bytes of each point, None for null points"""
+        records = np.empty(len(self), dtype=WKB_POINT)
+        records["order"] = 1
+        records["type"] = 1
+        records["x"] = self.x
+        records["y"] = self.y
+        buffer = records.tobytes()
+        size = WKB_POINT.itemsize
+        wkb = _object_array([buffer[start:start + size] for start in range(0, len(buffer), size)])
+        wkb[self.isna()] = None
+        return wkb
+
+    def to_text(self):
+        """Returns the text written to Excel for each point, the same as str() of its Esri JSON dictionary; None for null points"""
+        suffix = "}" if not self.spatial_reference else f", 'spatialReference': {self.spatial_reference!r}}}"
+        return [None if x != x else f"{{'x': {x!r}, 'y': {y!r}{suffix}" for x, y in zip(self.x.tolist(), self.y.tolist())]
+
+
+def points_from_wkb(wkb, spatial_reference=None):
+    """Returns a PointArray of WKB point bytes, or None if any of them holds another geometry type; decoded as one array when every point is little-endian
+    : param wkb: Sequence of WKB bytes or None
+    : param spatial_reference: Optional spatial reference dictionary of the points
+    """
+    values = pd.Series(wkb, dtype=object)
+    valid = values.notna().to_numpy()
+    x = np.full(len(values), np.nan)
+    y = np.full(len(values), np.nan)
+    present = values[valid].tolist()
+    if not present:
+        return PointArray(x, y, spatial_reference)
+    if all(len(value) == WKB_POINT.itemsize for value in present):
+        records = np.frombuffer(b"".join(present), dtype=WKB_POINT)
+        if (records["order"] == 1).all():
+            if not (records["type"] == 1).all():
+                return None
+            x[valid] = records["x"]
+            y[valid] = records["y"]
+            return PointArray(x, y, spatial_reference)
+    return None
+
+
+def points_from_geometries(geometries, spatial_reference=None):
+    """Returns a PointArray of Esri JSON points, arcgis or shapely points, or WKB point bytes, or None if any geometry is not a 2D point
+    : param geometries: Sequence of geometries or None
+    : param spatial_reference: Optional spatial reference dictionary; defaults to that of the first Esri JSON point having one
+    """
+    x = np.full(len(geometries), np.nan)
+    y = np.full(len(geometries), np.nan)
+    for i, geometry in enumerate(geometries):
+        if geometry is None or geometry != geometry:
+            continue
+        if isinstance(geometry, dict):
+            if "x" not in geometry or "y" not in geometry or set(geometry) - {"x", "y", "spatialReference"}:
+                return None
+            if geometry["x"] is None or geometry["y"] is None:
+                continue
+            x[i], y[i] = geometry["x"], geometry["y"]
+            spatial_reference = spatial_reference or geometry.get("spatialReference")
+            continue
+        from .snapshot import geometry_to_wkb
+        wkb = geometry_to_wkb(geometry)
+        if len(wkb) != _WKB_POINT.size or wkb[0] != 1:
+            return None
+        _, geometry_type, x[i], y[i] = _WKB_POINT.unpack(wkb)
+        if geometry_type != 1:
+            return None
+    return PointArray(x, y, spatial_reference)
+
+
+def convert_shape(series, mode):
+    """Returns the SHAPE values of *series* in a geometry mode
+    : param series: SHAPE column holding Esri JSON, arcgis or shapely geometries, WKB bytes or a PointArray
+    : param mode: One of GEOMETRY_MODES
+    """
+    if mode not in GEOMETRY_MODES:
+        raise ValueError(f"geometry mode must be one of {GEOMETRY_MODES}, not {mode!r}")
+    if mode == "skip":
+        return pd.Series(None, index=series.index, dtype=object, name=series.name)
+    array = series.array
+    if isinstance(array, PointArray):
+        if mode == "xy":
+            return series
+        values = array.to_esri() if mode == "esri" else array.to_wkb()
+        return pd.Series(values, index=series.index, name=series.name)
+    values = series.tolist()
+    if mode == "xy":
+        points = None
+        if all(value is None or isinstance(value, bytes) for value in values):
+            points = points_from_wkb(values)
+        if points is None:
+            points = points_from_geometries(values)
+        if points is not None:
+            return pd.Series(points, index=series.index, name=series.name)
+        ## Other geometry types are kept as WKB
+        mode = "wkb"
+    if mode == "wkb":
+        from .snapshot import geometry_to_wkb
+        return pd.Series(_object_array([geometry_to_wkb(value) for value in values]), index=series.index, name=series.name)
+    points = points_from_wkb(values) if all(value is None or isinstance(value, bytes) for value in values) else None
+    return series if points is None else pd.Series(points.to_esri(), index=series.index, name=series.name)
+
+
+def set_geometry(frames, mode="esri", layers=GEOMETRY_LAYERS):
+    """Returns shallow copies of *frames* whose SHAPE column is in a geometry mode. In the "skip" mode, an empty SHAPE column is added to *layers* that have none, so the sheets keep their fields.
+    : param frames: Dictionary of raw DataFrames keyed by layer name
+    : param mode: One of GEOMETRY_MODES
+    : param layers: Layers whose sheets show SHAPE
+    """
+    converted = {}
+    for layer, df in frames.items():
+        if "SHAPE" in df.columns or (mode == "skip" and layer in layers):
+            df = df.copy(deep=False)
+            df["SHAPE"] = convert_shape(df["SHAPE"] if "SHAPE" in df.columns else pd.Series(None, index=df.index, dtype=object), mode)
+        converted[layer] = df
+    return converted
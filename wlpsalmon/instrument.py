@@ -0,0 +1,142 @@
+### Stage instrumentation and the run report.
+### RunReport.stage wraps one pipeline stage and records its wall and CPU seconds, the peak resident set size of the process when it ends, and the rows it read and wrote. Every completed stage is passed to a message function: arcpy.AddMessage inside an ArcGIS toolbox, print otherwise. The report, with the requests, pages and bytes pulled for each layer, is written as JSON next to the workbook. One stage can be profiled with cProfile or pyinstrument.
+
+import contextlib
+import json
+import os
+import sys
+import time
+
+from . import __version__
+from .export import peak_rss_mb
+
+### Profilers accepted by RunReport; pyinstrument must be installed separately
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+def default_message():
+    """Returns arcpy.AddMessage when arcpy is already loaded, as in an ArcGIS toolbox script, and print otherwise. arcpy is never imported here."""
+    arcpy = sys.modules.get("arcpy")
+    return arcpy.AddMessage if arcpy is not None else print
+
+
+def count_rows(value):
+    """Returns the total rows of a DataFrame, or of the DataFrames of a dictionary, list or tuple
+    : param value: A DataFrame or a container of DataFrames
+    """
+    if isinstance(value, dict):
+        return sum(count_rows(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(count_rows(v) for v in value)
+    return len(value) if hasattr(value, "columns") else 0
+
+
+def report_path(workbook_path):
+    """Returns the path of the run report written next to a workbook
+    : param workbook_path: Path of the workbook
+    """
+    return os.path.splitext(workbook_path)[0] + "_report.json"
+
+
+def stage(report, name, rows_in=None):
+    """Returns report.stage(name, rows_in), or a context yielding a record that is not kept when *report* is None
+    : param report: A RunReport or None
+    : param name: Name of the stage
+    : param rows_in: Optional rows read by the stage
+    """
+    return contextlib.nullcontext({}) if report is None else report.stage(name, rows_in)
+
+
+class RunReport:
+    """Records of the stages of one run
+    : param message: Function called with a line of text after each stage; defaults to default_message()
+    : param profile_stage: Optional name of a stage to profile
+    : param profiler: "cprofile" or "pyinstrument"
+    """
+
+    def __init__(self, message=None, profile_stage=None, profiler="cprofile"):
+        if profiler not in PROFILERS:
+            raise ValueError(f"profiler must be one of {PROFILERS}, not {profiler!r}")
+        self.message = message or default_message()
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.stages = []
+        self.layers = {}
+        self._profile = None
+        self._start = time.perf_counter()
+
+    def _start_profiler(self):
+        if self.profiler == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profiler(self, profiler):
+        if self.profiler == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+        self._profile = profiler
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None):
+        """Times the enclosed stage. The yielded record is a dictionary; set its "intRowsOut" to the rows the stage wrote.
+        : param name: Name of the stage
+        : param rows_in: Optional rows read by the stage
+        """
+        record = {"strStage": name, "intRowsIn": rows_in, "intRowsOut": None}
+        profiler = self._start_profiler() if name == self.profile_stage else None
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        yield record
+        record["dblSeconds"] = time.perf_counter() - wall
+        # Includes the CPU time of every thread of the process, so it can exceed the wall time of a concurrent download
+        record["dblCPUSeconds"] = time.process_time() - cpu
+        if profiler is not None:
+            self._stop_profiler(profiler)
+        record["dblPeakRSSMB"] = peak_rss_mb()
+        self.stages.append(record)
+        rows = "" if record["intRowsOut"] is None else f", {record['intRowsOut']:,} rows"
+        peak = "" if record["dblPeakRSSMB"] is None else f", peak {record['dblPeakRSSMB']:.0f} MB"
+        self.message(f"Completed {name} in {record['dblSeconds']:.2f} s (CPU {record['dblCPUSeconds']:.2f} s{rows}{peak})")
+
+    def add_transfer(self, transfer):
+        """Adds the requests, pages and bytes pulled for each layer
+        : param transfer: Dictionary of rest.TransferStats keyed by layer name, for example ServiceSource.transfer
+        """
+        for layer, stats in transfer.items():
+            self.layers[layer] = stats.as_dict()
+            self.message(f"Downloaded {layer}: {stats.pages:,} pages, {stats.bytes / (1024 * 1024):.1f} MB in {stats.requests:,} requests")
+
+    def as_dict(self):
+        """Returns the report as a dictionary of JSON types"""
+        return {
+            "strCreated": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "strVersion": __version__,
+            "dblTotalSeconds": time.perf_counter() - self._start,
+            "stages": self.stages,
+            "layers": self.layers,
+        }
+
+    def write(self, path):
+        """Writes the report as JSON, and the profile of the profiled stage next to it, and returns the path of the report
+        : param path: Path of the report, see report_path
+        """
+        report = self.as_dict()
+        if self._profile is not None:
+            base = os.path.splitext(path)[0] + "_" + self.profile_stage
+            if self.profiler == "pyinstrument":
+                report["strProfile"] = base + ".html"
+                with open(report["strProfile"], "w", encoding="utf-8") as f:
+                    f.write(self._profile.output_html())
+            else:
+                report["strProfile"] = base + ".prof"
+                self._profile.dump_stats(report["strProfile"])
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return path
@@ -0,0 +1,88 @@
+### Indexed join engine for the survey sheets.
+### The surveys of the year are indexed once on the globalid key and ordered once on (strStream, survey date), with the survey date as a real date rather than '%m/%d/%Y' text, which does not sort across years. Child records and per-survey summaries are attached by looking up the position of their parent survey and taking only the survey fields a sheet needs, so the wide Metadata fields are not copied into every child frame. Attached rows come out in survey order, and in their own order within a survey, so the sheets need no further sort. The seconds taken by each join are kept in SurveyIndex.timings.
+
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+from .keys import key_columns, null_keys
+
+
+def _take(series, positions):
+    # Values of *series* at *positions*, with nulls where a position is -1; the dtype is kept when nothing is missing
+    if not len(positions) or positions.min() >= 0:
+        return series.array.take(positions)
+    values = take(series.array, positions, allow_fill=True)
+    return np.asarray(values, dtype=object) if series.dtype == object else values
+
+
+class SurveyIndex:
+    """Surveys indexed on the globalid key and ordered on (strStream, survey date)
+    : param dfSurveys: Surveys from summary.join_metadata_observer, indexed by the globalid key
+    : param dates: The survey date of each survey, as naive local datetimes aligned with *dfSurveys*
+    : param stream_field: The stream field of *dfSurveys*
+    """
+
+    def __init__(self, dfSurveys, dates, stream_field="strStream"):
+        start = time.perf_counter()
+        self.hi, self.lo = (dfSurveys.index.get_level_values(level).to_numpy(dtype=np.uint64) for level in key_columns("globalid"))
+        ## Surveys with a null or malformed globalid are left out of the lookup, so no child record is attached to them
+        self._lookup = np.flatnonzero(~null_keys(self.hi, self.lo))
+        self._keys = pd.MultiIndex.from_arrays([self.hi[self._lookup], self.lo[self._lookup]])
+        ## Null streams and dates sort last, as with sort_values
+        stream_codes, streams = pd.factorize(dfSurveys[stream_field], sort=True)
+        stream_codes = np.where(stream_codes < 0, len(streams), stream_codes)
+        date_values = pd.Series(dates).to_numpy(dtype="datetime64[ns]")
+        date_codes = np.where(np.isnat(date_values), np.iinfo(np.int64).max, date_values.view(np.int64))
+        ## lexsort is stable, so surveys of the same stream and date keep their order
+        self.order = np.lexsort((date_codes, stream_codes))
+        self.rank = np.empty(len(self.order), dtype=np.int64)
+        self.rank[self.order] = np.arange(len(self.order))
+        self.timings = {"Index": time.perf_counter() - start}
+
+    def __len__(self):
+        return len(self.order)
+
+    def attach(self, name, dfSurveys, dfChild, how="inner", on=None):
+        """Returns the records of *dfChild* with the fields of their parent survey, in survey order and indexed by the survey key. Fields found in both frames get _x and _y suffixes, as with pd.merge.
+        : param name: Name of the join in timings
+        : param dfSurveys: Survey fields to attach, aligned row for row with the surveys of the index
+        : param dfChild: Child records or per-survey summaries
+        : param how: "inner" keeps the child records of the surveys of the index; "left" also gives one row with null child fields to each survey without any
+        : param on: The two key fields of *dfChild* holding the survey key; defaults to the parentglobalid key
+        """
+        start = time.perf_counter()
+        on = key_columns("parentglobalid") if on is None else on
+        position = self._keys.get_indexer(pd.MultiIndex.from_arrays([dfChild[col].to_numpy(dtype=np.uint64) for col in on]))
+        ## Surveys of the index hold their sort rank; records of other surveys, or with a null key, get -1, also when the index is empty
+        found = position >= 0
+        position[found] = self._lookup[position[found]]
+        rank = np.full(len(position), -1, dtype=np.int64)
+        rank[found] = self.rank[position[found]]
+        matched = np.flatnonzero(rank >= 0)
+        matched = matched[np.argsort(rank[matched], kind="stable")]
+        if how == "inner":
+            child_rows = matched
+            survey_rows = position[matched]
+        else:
+            ## One slot per child record, or a single empty slot for a survey without any
+            counts = np.bincount(rank[matched], minlength=len(self))
+            slots = np.maximum(counts, 1)
+            survey_rows = np.repeat(self.order, slots)
+            child_rows = np.full(int(slots.sum()), -1, dtype=np.int64)
+            first_slot = np.cumsum(slots) - slots
+            first_child = np.cumsum(counts) - counts
+            matched_rank = rank[matched]
+            child_rows[first_slot[matched_rank] + np.arange(len(matched)) - first_child[matched_rank]] = matched
+        overlap = set(dfSurveys.columns) & set(dfChild.columns)
+        data = {}
+        for col in dfSurveys.columns:
+            data[col + "_x" if col in overlap else col] = _take(dfSurveys[col], survey_rows)
+        for col in dfChild.columns:
+            data[col + "_y" if col in overlap else col] = _take(dfChild[col], child_rows)
+        index = pd.MultiIndex.from_arrays([self.hi[survey_rows], self.lo[survey_rows]], names=key_columns("globalid"))
+        attached = pd.DataFrame(data, index=index)
+        self.timings[name] = time.perf_counter() - start
+        return attached
@@ -0,0 +1,87 @@
+### GUID keys for the joins between the survey layers.
+### Only the globalid and parentglobalid fields are normalized: surrounding whitespace and curly brackets are removed from the text, and each GUID is parsed into a 128-bit key held in two uint64 fields (<field>_hi, <field>_lo), so the joins and groupbys of the summary match integers instead of hashing GUID text. Parsing ignores case, whitespace, brackets and hyphens; null or malformed GUIDs get NULL_KEY in both halves. NULL_KEY marks a missing key, not a value: the joins never match it, so records with null or malformed GUIDs are left out rather than joined to each other.
+
+import numpy as np
+
+### GUID fields of the survey layers
+GUID_FIELDS = ["globalid", "parentglobalid"]
+
+### Key value of null or malformed GUIDs
+NULL_KEY = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# Bytes ignored between the hex digits of a GUID
+_SEPARATORS = b"\x00{}- \t\r\n"
+
+# Nibble value of each ASCII hex digit; 255 marks any other byte
+_HEX = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate(b"0123456789abcdef"):
+    _HEX[_c] = _i
+    _HEX[ord(chr(_c).upper())] = _i
+
+
+def key_columns(field):
+    """Returns the names of the two uint64 key fields of a GUID field
+    : param field: The GUID field, for example "globalid"
+    """
+    return [f"{field}_hi", f"{field}_lo"]
+
+
+def normalize_guids(series):
+    """Returns the GUID text of *series* without surrounding whitespace and curly brackets; nulls stay null
+    : param series: GUID text, for example "{5B8E...}"
+    """
+    return series.str.strip().str.strip("{}")
+
+
+def null_keys(hi, lo):
+    """Returns a boolean array, True where a key is NULL_KEY in both halves, from a null or malformed GUID
+    : param hi: High halves of the keys
+    : param lo: Low halves of the keys
+    """
+    return (np.asarray(hi) == NULL_KEY) & (np.asarray(lo) == NULL_KEY)
+
+
+def guid_keys(series):
+    """Returns (hi, lo), the high and low 64 bits of each GUID of *series* as uint64 arrays
+    : param series: GUID text, with or without curly brackets, hyphens and surrounding whitespace; any other text, including non-ASCII text, is malformed
+    """
+    values = series.to_numpy(dtype=object, na_value="")
+    ## Read the text as fixed-width ASCII, as wide as the longest text so nothing is cut off
+    try:
+        codes = values.astype("S")
+    except (UnicodeEncodeError, TypeError):
+        codes = np.array([value if isinstance(value, str) and value.isascii() else "\x01" for value in values], dtype="S")
+    width = max(codes.dtype.itemsize, 1)
+    codes = codes.astype(f"S{width}").view(np.uint8).reshape(-1, width)
+    nibbles = _HEX[codes]
+    digit = nibbles != 255
+    separator = np.isin(codes, np.frombuffer(_SEPARATORS, dtype=np.uint8))
+    valid = (digit.sum(axis=1) == 32) & (digit | separator).all(axis=1)
+    ## Keep the 32 hex digits of each valid GUID, pack pairs of nibbles into bytes and read each half as a big-endian 64-bit integer
+    nibbles = nibbles[valid]
+    digits = nibbles[nibbles != 255].reshape(-1, 32)
+    packed = np.ascontiguousarray((digits[:, 0::2] << 4) | digits[:, 1::2])
+    halves = packed.view(">u8").astype(np.uint64).reshape(-1, 2)
+    hi = np.full(len(codes), NULL_KEY, dtype=np.uint64)
+    lo = np.full(len(codes), NULL_KEY, dtype=np.uint64)
+    hi[valid] = halves[:, 0]
+    lo[valid] = halves[:, 1]
+    return hi, lo
+
+
+def add_guid_keys(frames):
+    """Returns shallow copies of *frames* in which the GUID_FIELDS present are normalized and have their two uint64 key fields added
+    : param frames: Dictionary of raw DataFrames keyed by layer name
+    """
+    keyed = {}
+    for layer, df in frames.items():
+        df = df.copy(deep=False)
+        for field in GUID_FIELDS:
+            if field in df.columns:
+                df[field] = normalize_guids(df[field])
+                hi, lo = guid_keys(df[field])
+                df[key_columns(field)[0]] = hi
+                df[key_columns(field)[1]] = lo
+        keyed[layer] = df
+    return keyed
+
@@ -0,0 +1,189 @@
+### Content-addressed memoization of the per-survey live fish and carcass summaries.
+### Each survey gets a digest of the fields the count rules read from each of its child records, keyed by the rule tables themselves: two 64-bit sums of independently keyed row hashes, plus the record count. The summary rows of a survey are stored on disk with its key and digest, so a re-run derives and groups only the records of surveys whose digest is new, for example those edited since the last run, and reads the rows of every other survey back. Rows are kept in Parquet files in one folder per season and sheet, with a Parquet index of the survey keys and digests each file holds. Digests, lookups and reads are whole-array operations. Files are evicted least recently used first, across all seasons, once the memo folder grows past its size bound.
+
+import hashlib
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .keys import key_columns
+from .rules import CARCASS_RULES, LIVE_FISH_FORM_CUTOVERS, LIVE_FISH_RULES
+
+### Fields of the joined child records that the count rules and the groupby read, keyed by sheet; CreationDate_Pacific_x, the survey creation date, selects the live fish form
+INPUT_FIELDS = {
+    "Live Fish": ["strLiveSpecies", "strLiveSex", "ysnPairs", "ysnReddBuilding", "strLiveFishRedd", "intNumRedds", "CreationDate_Pacific_x"],
+    "Carcasses": ["strCarcassSpecies", "strCarcassSex", "strDecomposedFresh", "intNumCarcasses", "ysnCountedLast"],
+}
+
+### Species field of the summary rows of each sheet
+SPECIES_FIELDS = {"Live Fish": "strLiveSpecies", "Carcasses": "strCarcassSpecies"}
+
+### Digest of the rule tables. Its two halves key the row hashes, so a change to the rules changes every survey digest.
+RULES_VERSION = hashlib.blake2b(repr((LIVE_FISH_RULES, CARCASS_RULES, LIVE_FISH_FORM_CUTOVERS, INPUT_FIELDS)).encode("utf-8"), digest_size=16).hexdigest()
+
+### Fields identifying the stored rows of one version of a survey
+DIGEST_FIELDS = key_columns("globalid") + ["intRecords", "uintDigestA", "uintDigestB"]
+
+### Default size bound of the memo folder
+MAX_BYTES = 256 * 1024 * 1024
+
+### A run that reads rows from more files than this rewrites the rows of the season into one file
+COMPACT_FILES = 8
+
+INDEX_FILE = "index.parquet"
+
+
+def survey_digests(dfRecords, fields):
+    """Returns a DataFrame with the DIGEST_FIELDS of each survey with records in *dfRecords*. The digest does not depend on the order of the records.
+    : param dfRecords: Joined child records, indexed by the survey key
+    : param fields: The fields of each record that the summary reads
+    """
+    hi, lo = (dfRecords.index.get_level_values(level).to_numpy(dtype=np.uint64) for level in key_columns("globalid"))
+    ## Group the records of each survey together; the sums wrap around modulo 2**64
+    order = np.lexsort((lo, hi))
+    hi, lo = hi[order], lo[order]
+    starts = np.flatnonzero(np.r_[True, (hi[1:] != hi[:-1]) | (lo[1:] != lo[:-1])]) if len(hi) else np.zeros(0, dtype=np.intp)
+    digests = {"globalid_hi": hi[starts], "globalid_lo": lo[starts], "intRecords": np.diff(np.r_[starts, len(hi)]).astype(np.int64)}
+    for field, hash_key in [("uintDigestA", RULES_VERSION[:16]), ("uintDigestB", RULES_VERSION[16:])]:
+        row_hashes = pd.util.hash_pandas_object(dfRecords[fields], index=False, hash_key=hash_key).to_numpy()[order]
+        digests[field] = np.add.reduceat(row_hashes, starts) if len(starts) else np.zeros(0, dtype=np.uint64)
+    return pd.DataFrame(digests)
+
+
+def _digest_index(df):
+    return pd.MultiIndex.from_arrays([df[field].to_numpy() for field in DIGEST_FIELDS])
+
+
+class SummaryMemo:
+    """On-disk memo of the per-survey summaries
+    : param memo_dir: Folder of the memo; created if it does not exist
+    : param max_bytes: Size bound of the folder; least recently used files are deleted past it
+    """
+
+    def __init__(self, memo_dir, max_bytes=MAX_BYTES):
+        self.memo_dir = memo_dir
+        self.max_bytes = max_bytes
+        os.makedirs(memo_dir, exist_ok=True)
+        # Surveys reused and recomputed by the last summarize call of each sheet
+        self.stats = {}
+
+    def _folder(self, season, sheet):
+        folder = os.path.join(self.memo_dir, str(season), sheet.replace(" ", ""))
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def _read_index(self, folder):
+        path = os.path.join(folder, INDEX_FILE)
+        if not os.path.exists(path):
+            return pd.DataFrame({field: pd.Series(dtype=np.uint64 if field != "intRecords" else np.int64) for field in DIGEST_FIELDS} | {"strFile": pd.Series(dtype=object)})
+        return pd.read_parquet(path)
+
+    def _write_index(self, folder, dfIndex):
+        # Written to a temporary file and renamed, so a reader never sees half an index; entries of evicted files are dropped
+        stored = set(os.listdir(folder))
+        dfIndex = dfIndex[dfIndex["strFile"].isin(stored)]
+        path = os.path.join(folder, INDEX_FILE)
+        dfIndex.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+    def _read_rows(self, folder, dfWanted):
+        # Returns (rows, read): the stored rows of the digests of *dfWanted* from the file the index gives for each, and the files that could be read
+        rows = []
+        read = []
+        for name, dfFile in dfWanted.groupby("strFile", sort=False):
+            path = os.path.join(folder, name)
+            try:
+                dfStored = pd.read_parquet(path)
+                os.utime(path)
+            except OSError:
+                # Evicted, for example by the run of another season
+                continue
+            ## A file holds one digest of each of its surveys, in consecutive rows; when every survey of the file is wanted, no rows are filtered out
+            hi, lo = (dfStored[key].to_numpy() for key in key_columns("globalid"))
+            if len(dfFile) != np.count_nonzero((hi[1:] != hi[:-1]) | (lo[1:] != lo[:-1])) + min(len(hi), 1):
+                dfStored = dfStored[_digest_index(dfStored).isin(_digest_index(dfFile))]
+            rows.append(dfStored)
+            read.append(name)
+        return rows, read
+
+    def _write_rows(self, folder, dfRows):
+        name = uuid.uuid4().hex + ".parquet"
+        dfRows.to_parquet(os.path.join(folder, name), index=False)
+        return name
+
+    def evict(self, keep=()):
+        """Deletes the least recently used files of the memo folder until it is within max_bytes. Returns the number of files deleted.
+        : param keep: Paths of files that are not deleted
+        """
+        files = []
+        for root, dirs, names in os.walk(self.memo_dir):
+            for name in names:
+                if name.endswith(".parquet") and name != INDEX_FILE:
+                    path = os.path.join(root, name)
+                    status = os.stat(path)
+                    files.append((status.st_mtime, status.st_size, path))
+        total = sum(size for mtime, size, path in files)
+        deleted = 0
+        for mtime, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+        return deleted
+
+    def summarize(self, season, sheet, dfRecords, derive, group):
+        """Returns the summary of *dfRecords* as group(derive(dfRecords)) would, deriving and grouping only the records of surveys without stored rows
+        : param season: The year of the summary
+        : param sheet: "Live Fish" or "Carcasses"
+        : param dfRecords: Joined child records from summary.join_live_fish or summary.join_carcasses
+        : param derive: summary.derive_live_fish or summary.derive_carcasses
+        : param group: summary.group_live_fish or summary.group_carcasses
+        """
+        keys = key_columns("globalid")
+        species = SPECIES_FIELDS[sheet]
+        folder = self._folder(season, sheet)
+        dfIndex = self._read_index(folder)
+        dfDigests = survey_digests(dfRecords, INPUT_FIELDS[sheet])
+        ## Read the stored rows of the surveys whose digest is in the index
+        position = _digest_index(dfIndex).get_indexer(_digest_index(dfDigests))
+        dfDigests["strFile"] = pd.Series(dfIndex["strFile"].to_numpy(), dtype=object).reindex(position).to_numpy()
+        rows, read = self._read_rows(folder, dfDigests[position >= 0])
+        found = dfDigests["strFile"].isin(read).to_numpy()
+        dfDigests = dfDigests.drop(columns="strFile")
+
+        ## Derive and group only the records of the other surveys, and tag their rows with the survey digest
+        if found.all() and rows:
+            dfNew = rows[0].iloc[:0]
+        else:
+            missing = pd.MultiIndex.from_arrays([dfDigests.loc[~found, key].to_numpy() for key in keys])
+            dfNew = group(derive(dfRecords[dfRecords.index.isin(missing)]))
+            dfNew = dfNew.merge(dfDigests[~found], on=keys, how="left")
+
+        ## Store the new rows; a season spread over many files is rewritten into one
+        written = None
+        if len(read) > COMPACT_FILES:
+            written = self._write_rows(folder, pd.concat(rows + [dfNew], ignore_index=True))
+            dfIndex = pd.concat([dfIndex, dfDigests.assign(strFile=written)], ignore_index=True)
+        elif len(dfNew):
+            written = self._write_rows(folder, dfNew)
+            dfIndex = pd.concat([dfIndex, dfDigests[~found].assign(strFile=written)], ignore_index=True)
+        if written:
+            ## The most recent entry of a digest wins
+            dfIndex = dfIndex.drop_duplicates(DIGEST_FIELDS, keep="last")
+            self.evict(keep={os.path.join(folder, written)})
+            self._write_index(folder, dfIndex)
+        self.stats[sheet] = {"intSurveysReused": int(found.sum()), "intSurveysComputed": int((~found).sum())}
+
+        ## Stored rows come back in the order of the groupby: survey key, then species with nulls last
+        dfSummary = pd.concat(rows + [dfNew], ignore_index=True).drop(columns=DIGEST_FIELDS[2:])
+        if isinstance(dfRecords[species].dtype, pd.CategoricalDtype):
+            dfSummary[species] = pd.Categorical(dfSummary[species].astype(object), categories=dfRecords[species].cat.categories)
+        return dfSummary.sort_values(keys + [species], na_position="last", kind="stable", ignore_index=True)
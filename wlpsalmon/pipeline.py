@@ -0,0 +1,221 @@
+### Acquisition, join and summary, and export wired together for one year, or for a range of years from a single download.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import export, summary
+from .geometry import set_geometry
+from .instrument import RunReport, count_rows, report_path
+from .keys import guid_keys, null_keys
+from .spec import layer_fields
+
+
+def _load(source, year, backup, snapshot_dir, out_workspace, timestamp, datetime_mode, report, geometry="esri"):
+    # Loads the raw data and keeps the raw snapshot and backup when asked; returns (frames, result)
+    result = {}
+    with report.stage("load") as record:
+        ## Request only the fields of the summary sheets unless the raw layers are kept as well
+        frames = source.load(year, layer_fields(backup=backup or bool(snapshot_dir), geometry=geometry != "skip"))
+        record["intRowsOut"] = count_rows(frames)
+    report.add_transfer(getattr(source, "transfer", {}))
+    if snapshot_dir:
+        from .snapshot import write_snapshot
+        with report.stage("snapshot", count_rows(frames)):
+            result["snapshot"] = write_snapshot(frames, snapshot_dir, timestamp)
+    if backup:
+        with report.stage("backup", count_rows(frames)) as record:
+            record["sheets"] = []
+            result["backup"] = export.write_backup(frames, out_workspace, timestamp, datetime_mode, record["sheets"])
+    ## The snapshot and backup keep the geometry as pulled; the summary carries it in the requested mode
+    with report.stage("geometry", count_rows(frames)) as record:
+        frames = set_geometry(frames, geometry)
+        record["intRowsOut"] = count_rows(frames)
+    return frames, result
+
+
+def _summary_store(memo_dir, aggregate_dir):
+    # Returns the memo.SummaryMemo or aggregate.SurveyAggregates of the run, or None
+    if memo_dir and aggregate_dir:
+        raise ValueError("memo_dir and aggregate_dir cannot be used together")
+    if memo_dir:
+        from .memo import SummaryMemo
+        return SummaryMemo(memo_dir)
+    if aggregate_dir:
+        from .aggregate import SurveyAggregates
+        return SurveyAggregates(aggregate_dir)
+    return None
+
+
+def _check_spatial(spatial, geometry):
+    # The spatial outputs need the geometry the "skip" mode leaves out, and the spatial reference the "wkb" mode drops
+    if spatial and geometry in ("skip", "wkb"):
+        raise ValueError("spatial outputs need the 'esri' or 'xy' geometry mode")
+
+
+def _summarize(frames, year, out_workspace, timestamp, datetime_mode, report, memo=None, spatial=()):
+    # Builds and writes the summary workbook of one year, and its spatial outputs when asked; returns (sheets, path, spatial paths)
+    sheets = summary.build_summary(frames, year, report=report, memo=memo)
+    with report.stage("export", count_rows(sheets)) as record:
+        ## Rows, seconds and RSS change of each sheet, see export.write_workbook_streaming
+        record["sheets"] = []
+        path = export.write_workbook(sheets, export.summary_path(out_workspace, year, timestamp), datetime_mode, record["sheets"])
+        record["intRowsOut"] = count_rows(sheets)
+    spatial_paths = None
+    if spatial:
+        from .spatial import write_spatial
+        with report.stage("spatial", count_rows([sheets["Live Fish"], sheets["Carcasses"]])):
+            spatial_paths = write_spatial(sheets, path, spatial)
+    return sheets, path, spatial_paths
+
+
+def run(source, year, out_workspace, timestamp=None, backup=False, snapshot_dir=None, datetime_mode="text", message=None, profile_stage=None, profiler="cprofile", memo_dir=None, aggregate_dir=None, geometry="esri", spatial=(), escapement=None):
+    """Loads the raw data from *source*, builds the summary sheets of *year* and writes the summary workbook with its run report next to it. Returns a dictionary with the sheets and the paths written.
+    : param source: A sources.Source instance
+    : param year: The year of interest
+    : param out_workspace: Folder for local file saving
+    : param timestamp: Timestamp for file naming, '%Y-%m-%d_%H%M'; defaults to now
+    : param backup: When True, also write the raw BKUP workbook
+    : param snapshot_dir: Optional folder; when given, the raw pull is also saved as a snapshot
+    : param datetime_mode: How timezone aware datetime fields are written, see export.DATETIME_MODES
+    : param message: Function called with a line of text after each stage; defaults to instrument.default_message()
+    : param profile_stage: Optional name of a stage to profile, for example "joins"
+    : param profiler: "cprofile" or "pyinstrument"
+    : param memo_dir: Optional folder of a memo.SummaryMemo; when given, only the surveys changed since an earlier run are summarized again
+    : param aggregate_dir: Optional folder of an aggregate.SurveyAggregates store; when given, only the records new or edited since the last run of the year are derived again
+    : param geometry: How SHAPE is carried through the summary, see geometry.GEOMETRY_MODES; "skip" does not request it
+    : param spatial: Spatial outputs written next to the workbook, see spatial.SPATIAL_FORMATS
+    : param escapement: Optional residence time in days, one number or a dictionary keyed by species; when given, the escapement workbook of the year is also written, see escapement.estimate_escapement
+    """
+    _check_spatial(spatial, geometry)
+    timestamp = timestamp or time.strftime('%Y-%m-%d_%H%M', time.localtime())
+    report = RunReport(message, profile_stage, profiler)
+    frames, result = _load(source, year, backup, snapshot_dir, out_workspace, timestamp, datetime_mode, report, geometry)
+    memo = _summary_store(memo_dir, aggregate_dir)
+    result["sheets"], result["summary"], spatial_paths = _summarize(frames, year, out_workspace, timestamp, datetime_mode, report, memo, spatial)
+    if spatial_paths:
+        result["spatial"] = spatial_paths
+    if escapement is not None:
+        result["escapement"] = _write_escapement([result["sheets"]], [year], out_workspace, timestamp, datetime_mode, report, escapement)
+    result["report"] = report.write(report_path(result["summary"]))
+    return result
+
+
+def partition_seasons(frames, years):
+    """Returns a dictionary keyed by year of the raw DataFrames holding only the surveys of that year, selected on dtmDate as summary.filter_year does, and their child records
+    : param frames: Dictionary of raw DataFrames keyed by layer name, with naive UTC datetime fields
+    : param years: The years of interest
+    """
+    dfMetadata = frames["Metadata"]
+    survey_years = dfMetadata["dtmDate"].dt.year.to_numpy()
+    survey_hi, survey_lo = guid_keys(dfMetadata["globalid"])
+    ## Surveys with a null or malformed globalid take no child records
+    lookup = np.flatnonzero(~null_keys(survey_hi, survey_lo))
+    surveys = pd.MultiIndex.from_arrays([survey_hi[lookup], survey_lo[lookup]])
+    ## Match each child record to its survey once, on the 128-bit keys so bracket and case differences do not matter
+    ## Position -1, a record without a survey, takes the trailing -1
+    lookup_years = np.append(survey_years[lookup], -1)
+    parent_years = {}
+    for layer, df in frames.items():
+        if layer != "Metadata":
+            parent_years[layer] = lookup_years[surveys.get_indexer(pd.MultiIndex.from_arrays(guid_keys(df["parentglobalid"])))]
+    seasons = {}
+    for year in years:
+        season = {"Metadata": dfMetadata[survey_years == int(year)]}
+        for layer, df_years in parent_years.items():
+            season[layer] = frames[layer][df_years == int(year)]
+        seasons[year] = season
+    return seasons
+
+
+def _write_escapement(summaries, years, out_workspace, timestamp, datetime_mode, report, residence_days):
+    # Estimates the escapement of every stream, species and year from the Live Fish Summary and Carcass Summary sheets of *summaries* and writes the escapement workbook; returns its path
+    from .escapement import escapement_path, estimate_escapement
+    dfLiveFishSummary = pd.concat([sheets["Live Fish Summary"] for sheets in summaries], ignore_index=True)
+    dfCarcassSummary = pd.concat([sheets["Carcass Summary"] for sheets in summaries], ignore_index=True)
+    with report.stage("escapement", count_rows([dfLiveFishSummary, dfCarcassSummary])) as record:
+        sheets = estimate_escapement(dfLiveFishSummary, dfCarcassSummary, residence_days)
+        record["sheets"] = []
+        path = export.write_workbook(sheets, escapement_path(out_workspace, years, timestamp), datetime_mode, record["sheets"])
+        record["intRowsOut"] = count_rows(sheets)
+    return path
+
+
+def _run_season(frames, year, out_workspace, timestamp, datetime_mode, profile_stage, profiler, memo=None, spatial=(), escapement=False):
+    # Builds and writes the summary workbook and run report of one season; runs in a worker process. Each season has its own folder in the memo or aggregate store, so workers do not share files.
+    # The stage lines are collected rather than printed, and come back with the result for the parent to relay
+    lines = []
+    report = RunReport(lines.append, profile_stage, profiler)
+    sheets, path, spatial_paths = _summarize(frames, year, out_workspace, timestamp, datetime_mode, report, memo, spatial)
+    written = {"export", "spatial"}
+    seconds = {"dblSummarySeconds": sum(record["dblSeconds"] for record in report.stages if record["strStage"] not in written)}
+    seconds["dblWriteSeconds"] = sum(record["dblSeconds"] for record in report.stages if record["strStage"] in written)
+    season = {"summary": path, "report": report.write(report_path(path)), "intSurveys": len(sheets["Metadata"]), **seconds, "messages": lines}
+    if spatial_paths:
+        season["spatial"] = spatial_paths
+    if escapement:
+        ## The summary sheets come back to the parent process, which estimates every year at once
+        season["summaries"] = {sheet: sheets[sheet] for sheet in ("Live Fish Summary", "Carcass Summary")}
+    return season
+
+
+def _relay(report, year, season):
+    # Passes the stage lines of a season to the message function of the parent, each prefixed with its year
+    for line in season.pop("messages"):
+        report.message(f"{year}: {line}")
+
+
+def run_batch(source, years, out_workspace, timestamp=None, backup=False, snapshot_dir=None, datetime_mode="text", processes=None, message=None, profile_stage=None, profiler="cprofile", memo_dir=None, aggregate_dir=None, geometry="esri", spatial=(), escapement=None):
+    """Loads the raw data from *source* once, partitions it by season and writes the summary workbook of each year from a process pool. Each workbook is the one run would write for that year, with its run report next to it; the load is reported next to the workbooks as the run report of the range of years. Returns a dictionary with the paths written and the seconds taken by the download and by each year.
+    : param source: A sources.Source instance
+    : param years: The years of interest, for example range(2015, 2026)
+    : param out_workspace: Folder for local file saving
+    : param timestamp: Timestamp for file naming, '%Y-%m-%d_%H%M'; defaults to now
+    : param backup: When True, also write the raw BKUP workbook
+    : param snapshot_dir: Optional folder; when given, the raw pull is also saved as a snapshot
+    : param datetime_mode: How timezone aware datetime fields are written, see export.DATETIME_MODES
+    : param processes: Maximum number of worker processes; defaults to the number of CPUs, and 1 builds every year in this process
+    : param message: Function called with a line of text after each stage of the load, and with the stage lines of each year, prefixed with the year, in year order; defaults to instrument.default_message()
+    : param profile_stage: Optional name of a stage to profile in every year, for example "joins"
+    : param profiler: "cprofile" or "pyinstrument"
+    : param memo_dir: Optional folder of a memo.SummaryMemo shared by every year
+    : param aggregate_dir: Optional folder of an aggregate.SurveyAggregates store shared by every year
+    : param geometry: How SHAPE is carried through the summary, see geometry.GEOMETRY_MODES; "skip" does not request it
+    : param spatial: Spatial outputs written next to each workbook, see spatial.SPATIAL_FORMATS
+    : param escapement: Optional residence time in days, one number or a dictionary keyed by species; when given, one escapement workbook of every year is also written, see escapement.estimate_escapement
+    """
+    _check_spatial(spatial, geometry)
+    start = time.perf_counter()
+    timestamp = timestamp or time.strftime('%Y-%m-%d_%H%M', time.localtime())
+    years = [str(year) for year in years]
+    report = RunReport(message, profile_stage, profiler)
+    frames, result = _load(source, None, backup, snapshot_dir, out_workspace, timestamp, datetime_mode, report, geometry)
+    result.update({"timings": {"Download": report.stages[0]["dblSeconds"]}, "years": {}})
+    with report.stage("partition", count_rows(frames)) as record:
+        seasons = partition_seasons(frames, years)
+        record["intRowsOut"] = count_rows(seasons)
+    memo = _summary_store(memo_dir, aggregate_dir)
+    processes = min(processes or os.cpu_count() or 1, len(years))
+    with report.stage("seasons", count_rows(seasons)):
+        if processes <= 1:
+            for year in years:
+                result["years"][year] = _run_season(seasons[year], year, out_workspace, timestamp, datetime_mode, profile_stage, profiler, memo, spatial, escapement is not None)
+                _relay(report, year, result["years"][year])
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = {year: executor.submit(_run_season, seasons[year], year, out_workspace, timestamp, datetime_mode, profile_stage, profiler, memo, spatial, escapement is not None) for year in years}
+                ## Each year is relayed once it and every earlier year are done, so the lines keep year order whatever order the workers finish in
+                for year, future in futures.items():
+                    result["years"][year] = future.result()
+                    _relay(report, year, result["years"][year])
+    for year, season in result["years"].items():
+        result["timings"][year] = season["dblSummarySeconds"] + season["dblWriteSeconds"]
+    if escapement is not None:
+        summaries = [season.pop("summaries") for season in result["years"].values()]
+        result["escapement"] = _write_escapement(summaries, years, out_workspace, timestamp, datetime_mode, report, escapement)
+    result["timings"]["Total"] = time.perf_counter() - start
+    result["report"] = report.write(report_path(export.summary_path(out_workspace, f"{years[0]}-{years[-1]}", timestamp)))
+    return result
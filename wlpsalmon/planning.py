@@ -0,0 +1,73 @@
+### Query planning for single season pulls.
+### The Metadata layer is filtered on the server with a dtmDate range, and the LiveFish, Carcass and Observer child tables are then requested only for the parentglobalid values of the selected surveys, batched into IN (...) chunks.
+
+import pandas as pd
+
+from . import rest
+
+### Child tables and the field linking them to the Metadata layer
+CHILD_LAYERS = ["LiveFish", "Carcass", "Observer"]
+
+### Number of GUIDs per IN (...) clause; keeps each request well under service where clause limits
+IN_CHUNK_SIZE = 250
+
+
+def season_where(year, date_field="dtmDate"):
+    """Returns a where clause selecting the records of a single year. dtmDate is stored in UTC, so the range matches the script's sedfMetadata["dtmDate"].dt.strftime('%Y') == year filter.
+    : param year: The year of interest, as text or integer
+    : param date_field: The name of the survey date field
+    """
+    start = pd.Timestamp(year=int(year), month=1, day=1)
+    end = pd.Timestamp(year=int(year) + 1, month=1, day=1)
+    return f"{date_field} >= TIMESTAMP '{start:%Y-%m-%d %H:%M:%S}' AND {date_field} < TIMESTAMP '{end:%Y-%m-%d %H:%M:%S}'"
+
+
+def in_clauses(field, values, chunk_size=IN_CHUNK_SIZE):
+    """Returns a list of "field IN (...)" where clauses covering *values* in chunks of *chunk_size*
+    : param field: The name of the field to filter
+    : param values: Values to select; duplicates and nulls are dropped
+    : param chunk_size: Maximum number of values per clause
+    """
+    values = sorted({value for value in values if pd.notna(value)})
+    clauses = []
+    for i in range(0, len(values), chunk_size):
+        quoted = ", ".join("'" + str(value).replace("'", "''") + "'" for value in values[i:i + chunk_size])
+        clauses.append(f"{field} IN ({quoted})")
+    return clauses
+
+
+def fetch_children(service_url, layer, parent_globalids, chunk_size=IN_CHUNK_SIZE, token=None, **kwargs):
+    """Returns a DataFrame of the child records of *layer* whose parentglobalid is in *parent_globalids*
+    : param service_url: The url of the FeatureServer
+    : param layer: The name of the child layer as found in rest.LAYERS
+    : param parent_globalids: globalid values of the selected Metadata records
+    : param chunk_size: Maximum number of GUIDs per request
+    : param token: Optional ArcGIS token
+    : param kwargs: Further arguments passed to rest.fetch_layer
+    """
+    if layer == "Observer":
+        kwargs.setdefault("out_fields", rest.OBSERVER_FIELDS)
+    clauses = in_clauses("parentglobalid", parent_globalids, chunk_size) or ["1=0"]
+    frames = [rest.fetch_layer(service_url, layer, where=where, token=token, **kwargs) for where in clauses]
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def fetch_season(service_url, year, chunk_size=IN_CHUNK_SIZE, token=None, fields=None, transfer=None):
+    """Returns a dictionary of DataFrames keyed by layer name holding only the surveys of *year* and their child records
+    : param service_url: The url of the FeatureServer
+    : param year: The year of interest
+    : param chunk_size: Maximum number of GUIDs per child request
+    : param token: Optional ArcGIS token
+    : param fields: Optional dictionary of (out_fields, return_geometry) keyed by layer name, see spec.layer_fields
+    : param transfer: Optional dictionary; when given, the rest.TransferStats of each layer are added to it keyed by layer name
+    """
+    kwargs = {layer: dict(zip(["out_fields", "return_geometry"], layer_fields)) for layer, layer_fields in (fields or {}).items()}
+    transfer = {} if transfer is None else transfer
+    for layer in rest.LAYERS:
+        transfer[layer] = rest.TransferStats()
+        kwargs.setdefault(layer, {})["stats"] = transfer[layer]
+    frames = {"Metadata": rest.fetch_layer(service_url, "Metadata", where=season_where(year), token=token, **kwargs.get("Metadata", {}))}
+    parent_globalids = frames["Metadata"]["globalid"] if "globalid" in frames["Metadata"] else []
+    for layer in CHILD_LAYERS:
+        frames[layer] = fetch_children(service_url, layer, parent_globalids, chunk_size=chunk_size, token=token, **kwargs.get(layer, {}))
+    return frames
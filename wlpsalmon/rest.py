@@ -0,0 +1,218 @@
+### Minimal client for the ArcGIS REST API query endpoint of the salmon spawning survey feature service.
+### This uses only the Python standard library plus pandas, so it can be pointed at ArcGIS Online or at a local stand-in server that serves the same paged JSON.
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .schema import CATEGORY_FIELDS, categorize, domain_codes
+
+### Current Feature Service webpage: https://fws.maps.arcgis.com/home/item.html?id=758626eec0fc4bc1a72b4e4c9bd1023c
+SERVICE_URL = "https://services.arcgis.com/QVENGdaPbd4LUkLV/arcgis/rest/services/service_c555c76424ca452d8dab8de4f8c25000/FeatureServer"
+
+### Layer and table ids within the feature service
+LAYERS = {"Metadata": 0, "LiveFish": 1, "Carcass": 2, "Observer": 3}
+
+### Fields pulled from the Observer table (same list as arcpy.da.TableToNumPyArray in the script)
+OBSERVER_FIELDS = ["objectid", "globalid", "strFirstName", "strLastName", "parentglobalid", "CreationDate", "Creator", "EditDate", "Editor"]
+
+### Retry settings for transient network and server errors; the wait doubles after each failed attempt
+RETRIES = 4
+BACKOFF = 1.0
+
+
+def layer_url(service_url, layer):
+    """Returns the REST url of a layer or table within the feature service
+    : param service_url: The url of the FeatureServer
+    : param layer: The name of the layer as found in LAYERS, or its numeric id
+    """
+    layer_id = LAYERS[layer] if layer in LAYERS else layer
+    return f"{service_url.rstrip('/')}/{layer_id}"
+
+
+class TransferStats:
+    """Requests, result pages and response bytes of the REST requests made for one layer; the page threads of a layer can update it at the same time"""
+
+    def __init__(self):
+        self.requests = 0
+        self.pages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, size, pages=0):
+        """Counts one request
+        : param size: Bytes of the response body
+        : param pages: Number of result pages the response holds
+        """
+        with self._lock:
+            self.requests += 1
+            self.pages += pages
+            self.bytes += size
+
+    def as_dict(self):
+        """Returns the counts as a dictionary"""
+        return {"intRequests": self.requests, "intPages": self.pages, "intBytes": self.bytes}
+
+
+def request_json(url, params=None, token=None, timeout=120, retries=RETRIES, backoff=BACKOFF, stats=None, pages=0):
+    """Returns the decoded JSON response of a REST request. Parameters are sent as a POST body so long where clauses do not hit URL length limits. Connection errors, timeouts and HTTP 429/5xx responses are retried with exponential backoff.
+    : param url: The REST endpoint url
+    : param params: Dictionary of request parameters; f=json is always added
+    : param token: Optional ArcGIS token, for example GIS("pro")._con.token
+    : param timeout: Socket timeout in seconds
+    : param retries: Number of retries after the first attempt
+    : param backoff: Seconds to wait before the first retry
+    : param stats: Optional TransferStats counting the request and its response bytes
+    : param pages: Number of result pages counted in *stats* for the response
+    """
+    params = dict(params or {})
+    params["f"] = "json"
+    if token:
+        params["token"] = token
+    data = urllib.parse.urlencode(params).encode("utf-8")
+    for attempt in range(retries + 1):
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=timeout) as response:
+                body = response.read()
+            result = json.loads(body.decode("utf-8"))
+            if stats is not None:
+                stats.add(len(body), pages)
+            break
+        except urllib.error.HTTPError as e:
+            if attempt == retries or not (e.code == 429 or e.code >= 500):
+                raise
+        except OSError:
+            if attempt == retries:
+                raise
+        time.sleep(backoff * 2 ** attempt)
+    # The REST API reports errors with HTTP 200 and an "error" object
+    if "error" in result:
+        raise RuntimeError(f"{url}: {result['error'].get('message', result['error'])}")
+    return result
+
+
+def layer_info(url, token=None, stats=None):
+    """Returns the layer description (fields, maxRecordCount, etc.) of a layer or table
+    : param url: The REST url of the layer
+    : param token: Optional ArcGIS token
+    : param stats: Optional TransferStats of the layer
+    """
+    return request_json(url, token=token, stats=stats)
+
+
+def _query_page(url, where, out_fields, return_geometry, offset, page_size, token, stats=None):
+    return request_json(url + "/query", {
+        "where": where,
+        "outFields": out_fields,
+        "returnGeometry": "true" if return_geometry else "false",
+        "orderByFields": "objectid",
+        "resultOffset": offset,
+        "resultRecordCount": page_size,
+    }, token=token, stats=stats, pages=1)
+
+
+def query_count(url, where="1=1", token=None, stats=None):
+    """Returns the number of records of a layer matching *where*
+    : param url: The REST url of the layer
+    : param where: SQL where clause
+    : param token: Optional ArcGIS token
+    : param stats: Optional TransferStats of the layer
+    """
+    return request_json(url + "/query", {"where": where, "returnCountOnly": "true"}, token=token, stats=stats)["count"]
+
+
+def query_ids(url, where="1=1", token=None, stats=None):
+    """Returns the object ids of the records of a layer matching *where*, in one request whatever the maxRecordCount
+    : param url: The REST url of the layer
+    : param where: SQL where clause
+    : param token: Optional ArcGIS token
+    : param stats: Optional TransferStats of the layer
+    """
+    return request_json(url + "/query", {"where": where, "returnIdsOnly": "true"}, token=token, stats=stats).get("objectIds") or []
+
+
+def query_features(url, where="1=1", out_fields="*", return_geometry=True, page_size=None, token=None, max_workers=1, stats=None):
+    """Returns (features, fields, spatial_reference) for all records of a layer matching *where*; spatial_reference is the spatialReference of the first page, which the service gives for the whole response instead of on each geometry, or None. With one worker, pages are requested one after another following resultOffset until the server stops reporting exceededTransferLimit. With more workers, the record count is requested first and the pages are fetched concurrently.
+    : param url: The REST url of the layer
+    : param where: SQL where clause
+    : param out_fields: Comma separated field names, a list of field names, or "*"
+    : param return_geometry: Whether geometry is requested
+    : param page_size: Records per request; defaults to, and is capped at, the layer's maxRecordCount
+    : param token: Optional ArcGIS token
+    : param max_workers: Maximum number of pages requested at the same time
+    : param stats: Optional TransferStats counting the requests, pages and bytes
+    """
+    if not isinstance(out_fields, str):
+        out_fields = ",".join(out_fields)
+    max_record_count = layer_info(url, token=token, stats=stats).get("maxRecordCount", 1000)
+    page_size = min(page_size or max_record_count, max_record_count)
+
+    if max_workers > 1:
+        count = query_count(url, where=where, token=token, stats=stats)
+        offsets = list(range(0, count, page_size)) or [0]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(offsets))) as executor:
+            pages = list(executor.map(lambda offset: _query_page(url, where, out_fields, return_geometry, offset, page_size, token, stats), offsets))
+        features = [feature for page in pages for feature in page.get("features", [])]
+        return features, pages[0].get("fields", []), pages[0].get("spatialReference")
+
+    features = []
+    fields = None
+    spatial_reference = None
+    offset = 0
+    while True:
+        page = _query_page(url, where, out_fields, return_geometry, offset, page_size, token, stats)
+        if fields is None:
+            fields = page.get("fields", [])
+            spatial_reference = page.get("spatialReference")
+        features.extend(page.get("features", []))
+        if not page.get("exceededTransferLimit") or not page.get("features"):
+            break
+        offset += len(page["features"])
+    return features, fields or [], spatial_reference
+
+
+def features_to_dataframe(features, fields, spatial_reference=None):
+    """Returns a pandas DataFrame built from REST query features. Date fields are converted from epoch milliseconds to naive UTC datetime64[ns], as pd.DataFrame.spatial.from_layer does. Coded fields listed in schema.CATEGORY_FIELDS become categoricals holding the codes of their coded value domain. Geometry, when present, is kept in a SHAPE column as the Esri JSON geometry, with the spatial reference of the response, as arcgis geometries carry it.
+    : param features: List of features from query_features
+    : param fields: List of field descriptions from query_features
+    : param spatial_reference: Optional spatialReference of the response from query_features, added to every geometry without one
+    """
+    df = pd.DataFrame.from_records([feature.get("attributes", {}) for feature in features], columns=[field["name"] for field in fields] or None)
+    for field in fields:
+        if field.get("type") == "esriFieldTypeDate" and field["name"] in df.columns:
+            df[field["name"]] = pd.to_datetime(df[field["name"]], unit="ms").astype("datetime64[ns]")
+    coded = {name for names in CATEGORY_FIELDS.values() for name in names}
+    for name, codes in domain_codes(fields).items():
+        if name in coded and name in df.columns:
+            df[name] = categorize(df[name], codes)
+    if any("geometry" in feature for feature in features):
+        geometries = [feature.get("geometry") for feature in features]
+        if spatial_reference:
+            ## The geometries are the decoded response, so they are completed in place; they share one dictionary
+            for geometry in geometries:
+                if geometry and "spatialReference" not in geometry:
+                    geometry["spatialReference"] = spatial_reference
+        df["SHAPE"] = geometries
+    return df
+
+
+def fetch_layer(service_url, layer, where="1=1", out_fields="*", return_geometry=True, page_size=None, token=None, max_workers=1, stats=None):
+    """Returns a DataFrame of the records of one layer or table of the feature service
+    : param service_url: The url of the FeatureServer
+    : param layer: The name of the layer as found in LAYERS
+    : param where: SQL where clause
+    : param out_fields: Field names to request
+    : param return_geometry: Whether geometry is requested
+    : param page_size: Records per request; defaults to the layer's maxRecordCount
+    : param token: Optional ArcGIS token
+    : param max_workers: Maximum number of pages requested at the same time
+    : param stats: Optional TransferStats counting the requests, pages and bytes
+    """
+    features, fields, spatial_reference = query_features(layer_url(service_url, layer), where=where, out_fields=out_fields, return_geometry=return_geometry, page_size=page_size, token=token, max_workers=max_workers, stats=stats)
+    return features_to_dataframe(features, fields, spatial_reference)
@@ -0,0 +1,115 @@
+### Observer rosters: the concatenated surveyor names of each survey.
+### Surveyor names are stripped and joined once per distinct first and last name, and interned as integer codes. The rosters come from one stable sort of the Observer records on the parentglobalid key and a split wherever the key changes, instead of a Python ', '.join per groupby group. Each distinct roster is joined into text once, however many surveys share it, and strFullName is a categorical field whose codes point at those texts; the text of each cell is only produced when a sheet is exported. season_roster caches the rosters keyed by season and by a digest of the Observer records, in their order, and of the survey keys, so an edit, a reordering or another frame of the same content is told apart by content rather than by season.
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .keys import key_columns, null_keys
+
+ROSTER_SEPARATOR = ", "
+
+# Cached ObserverRoster objects keyed by (season, observer_digest), oldest first
+_ROSTERS = {}
+
+### Number of rosters kept in the cache; the oldest is dropped first
+ROSTER_CACHE_SIZE = 16
+
+
+def _intern_names(dfObserver):
+    # Returns (codes, names): the interned full name code of each record, -1 where a name part is null, and the distinct full names
+    first = pd.Categorical(dfObserver["strFirstName"])
+    last = pd.Categorical(dfObserver["strLastName"])
+    width = len(last.categories) + 1
+    ## Null name parts have code -1; shift by one so every (first, last) pair packs into one integer
+    codes, pairs = pd.factorize((first.codes.astype(np.int64) + 1) * width + (last.codes + 1))
+    first_codes = pairs // width - 1
+    last_codes = pairs % width - 1
+    ## Clean up names; stripping and concatenation run once per distinct name
+    first_names = pd.Series(first.categories, dtype=object).str.strip().tolist()
+    last_names = pd.Series(last.categories, dtype=object).str.strip().tolist()
+    complete = (first_codes >= 0) & (last_codes >= 0)
+    names = np.array([first_names[f] + " " + last_names[l] if ok else None for f, l, ok in zip(first_codes.tolist(), last_codes.tolist(), complete.tolist())], dtype=object)
+    codes = np.where(complete[codes], codes, -1)
+    return codes, names
+
+
+class ObserverRoster:
+    """Surveyor names of each survey, built from the Observer records
+    : param dfObserver: The Observer DataFrame with GUID keys from keys.add_guid_keys
+    : param survey_hi: Optional high halves of the globalid keys of the surveys to keep, for example those of one season
+    : param survey_lo: Optional low halves of the same keys
+    """
+
+    def __init__(self, dfObserver, survey_hi=None, survey_lo=None):
+        hi, lo = (dfObserver[col].to_numpy(dtype=np.uint64) for col in key_columns("parentglobalid"))
+        name_codes, self.names = _intern_names(dfObserver)
+        keep = ~null_keys(hi, lo) & (name_codes >= 0)
+        if survey_hi is not None:
+            keep &= pd.MultiIndex.from_arrays([hi, lo]).isin(pd.MultiIndex.from_arrays([survey_hi, survey_lo]))
+        hi, lo, name_codes = hi[keep], lo[keep], name_codes[keep]
+        ## Sort once on the survey key; lexsort is stable, so the names of a survey keep the order of the Observer records
+        order = np.lexsort((lo, hi))
+        hi, lo, name_codes = hi[order], lo[order], name_codes[order]
+        starts = np.flatnonzero(np.r_[True, (hi[1:] != hi[:-1]) | (lo[1:] != lo[:-1])]) if len(hi) else np.zeros(0, dtype=np.intp)
+        self.survey_hi = hi[starts]
+        self.survey_lo = lo[starts]
+        ## Split the name codes at each change of survey and intern the distinct rosters
+        self.roster_codes, self.rosters = pd.factorize(pd.Series([tuple(roster) for roster in np.split(name_codes, starts[1:])] if len(starts) else [], dtype=object))
+        self._index = pd.MultiIndex.from_arrays([self.survey_hi, self.survey_lo])
+        self._categories = None
+
+    def categories(self):
+        """Returns (codes, texts): the text code of each distinct roster and the distinct roster texts, joined on first use. Distinct rosters can still read the same, for example when a name contains the separator."""
+        if self._categories is None:
+            texts = pd.Series([ROSTER_SEPARATOR.join(self.names[list(roster)]) for roster in self.rosters], dtype=object)
+            codes, categories = pd.factorize(texts)
+            self._categories = codes, pd.Index(categories, dtype=object)
+        return self._categories
+
+    def full_names(self, hi, lo):
+        """Returns the roster of each survey as a categorical of surveyor names, null for surveys without observers
+        : param hi: High halves of the globalid keys of the surveys
+        : param lo: Low halves of the same keys
+        """
+        position = self._index.get_indexer(pd.MultiIndex.from_arrays([hi, lo]))
+        found = position >= 0
+        text_codes, categories = self.categories()
+        codes = np.full(len(position), -1, dtype=np.int64)
+        codes[found] = text_codes[self.roster_codes[position[found]]]
+        return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def observer_digest(dfObserver, survey_hi, survey_lo):
+    """Returns a hex digest of the parentglobalid and name fields of the Observer records, in their order, and of the survey keys. It changes with any add, edit, delete or reordering of a surveyor, since the names of a roster follow the order of the records, and with any change to the surveys.
+    : param dfObserver: The Observer DataFrame
+    : param survey_hi: High halves of the globalid keys of the surveys, as uint64
+    : param survey_lo: Low halves of the same keys
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(pd.util.hash_pandas_object(dfObserver[["parentglobalid", "strFirstName", "strLastName"]], index=False).to_numpy().tobytes())
+    ## The record count separates the row hashes from the survey keys
+    digest.update(np.array([len(dfObserver), len(survey_hi)], dtype=np.uint64).tobytes())
+    digest.update(survey_hi.tobytes())
+    digest.update(survey_lo.tobytes())
+    return digest.hexdigest()
+
+
+def season_roster(dfObserver, year, survey_hi, survey_lo):
+    """Returns the ObserverRoster of the surveys of *year*, from the cache when one was built for the same season from the same Observer records and surveys, see observer_digest
+    : param dfObserver: The Observer DataFrame with GUID keys from keys.add_guid_keys
+    : param year: The season
+    : param survey_hi: High halves of the globalid keys of the surveys of the season
+    : param survey_lo: Low halves of the same keys
+    """
+    survey_hi = np.asarray(survey_hi, dtype=np.uint64)
+    survey_lo = np.asarray(survey_lo, dtype=np.uint64)
+    key = (str(year), observer_digest(dfObserver, survey_hi, survey_lo))
+    roster = _ROSTERS.get(key)
+    if roster is None:
+        roster = ObserverRoster(dfObserver, survey_hi, survey_lo)
+        while len(_ROSTERS) >= ROSTER_CACHE_SIZE:
+            del _ROSTERS[next(iter(_ROSTERS))]
+        _ROSTERS[key] = roster
+    return roster
@@ -0,0 +1,118 @@
+### Declarative rule tables for the live fish and carcass count fields.
+### Each rule reads "set *target* to *value* where all of *masks* are true". Rules are applied in order, so a later rule overrides an earlier one for the same target, as the original chain of .loc statements did. apply_rules evaluates every named mask once and then fills each target with a single np.select pass, so the cost is one scan per mask and per target rather than one scan per rule.
+
+import numpy as np
+import pandas as pd
+
+from .schema import equals, isin
+
+### Named boolean masks shared by the rules; each is evaluated at most once per apply_rules call. Coded fields are compared with schema.equals and schema.isin, which match integer codes when the field is categorical
+MASKS = {
+    # Live fish
+    "redd_building": lambda df: equals(df["ysnReddBuilding"], "yes"),
+    "pairs": lambda df: equals(df["ysnPairs"], "yes"),
+    "live_male": lambda df: equals(df["strLiveSex"], "M"),
+    "live_female": lambda df: equals(df["strLiveSex"], "F"),
+    "live_unknown": lambda df: equals(df["strLiveSex"], "Unk"),
+    "redd": lambda df: isin(df["strLiveFishRedd"], ["Live Fish and Redd", "Redd"]),
+    "live_fish_form_0": lambda df: df["intLiveFishForm"] == 0,
+    "live_fish_form_1": lambda df: df["intLiveFishForm"] == 1,
+    # Carcasses
+    ## Assume that null ysnCountedLast is 'yes' if strDecomposedFresh is 'Decomposed'
+    ## Assume that null ysnCountedLast is 'no' if strDecomposedFresh is 'Fresh'
+    "counted_last_yes": lambda df: equals(df["ysnCountedLast"], "yes"),
+    "counted_last_null_decomposed": lambda df: np.asarray(df["ysnCountedLast"].isna()) & equals(df["strDecomposedFresh"], "Decomposed"),
+    "new_carcass": lambda df: equals(df["ysnCountedLast"], "no") | (np.asarray(df["ysnCountedLast"].isna()) & equals(df["strDecomposedFresh"], "Fresh")),
+    "carcass_male": lambda df: equals(df["strCarcassSex"], "M"),
+    "carcass_female": lambda df: equals(df["strCarcassSex"], "F"),
+    "carcass_juvenile": lambda df: equals(df["strCarcassSex"], "J"),
+    "carcass_unknown": lambda df: equals(df["strCarcassSex"], "Unk"),
+}
+
+### Live fish form versions. Records created before the first cutover (Pacific time) are form 0, records created on or after it are form 1, and so on; add a date here and a live_fish_form_<n> mask to MASKS for each new form
+LIVE_FISH_FORM_CUTOVERS = ["2021-11-05"]
+LIVE_FISH_FORM_TIMEZONE = "US/Pacific"
+
+### Live fish rules for every form version. Form 0 (entered prior to 11/5/2021) counts a pair as half a fish; form 1 counts a pair as one male and one female and flags redds by strLiveFishRedd
+LIVE_FISH_RULES = [
+    ("intReddBuilding", ("redd_building",), 1),
+    ("dblPairs", ("pairs", "live_fish_form_0"), 0.5),
+    ("dblPairs", ("pairs", "live_fish_form_1"), 1),
+    ("intMales", ("pairs", "live_fish_form_1"), 1),
+    ("intFemales", ("pairs", "live_fish_form_1"), 1),
+    ("intMales", ("live_male",), 1),
+    ("intFemales", ("live_female",), 1),
+    ("intUnknown", ("live_unknown",), 1),
+    ("intNumRedds", ("redd", "live_fish_form_1"), 1),
+]
+
+### Carcasses: a string value copies that field
+CARCASS_RULES = [
+    # yes OR null and decomposed
+    ("intCountedLast", ("counted_last_yes",), "intNumCarcasses"),
+    ("intCountedLast", ("counted_last_null_decomposed",), "intNumCarcasses"),
+    # no OR null and fresh
+    ("intNewMales", ("carcass_male", "new_carcass"), "intNumCarcasses"),
+    ("intNewFemales", ("carcass_female", "new_carcass"), "intNumCarcasses"),
+    ("intNewJuveniles", ("carcass_juvenile", "new_carcass"), "intNumCarcasses"),
+    ("intNewUnknown", ("carcass_unknown", "new_carcass"), "intNumCarcasses"),
+]
+
+
+def live_fish_form(created, cutovers=LIVE_FISH_FORM_CUTOVERS, timezone=LIVE_FISH_FORM_TIMEZONE):
+    """Returns the form version of each live fish record as an int8 array, from a datetime comparison of its creation date with the cutover dates. Records without a creation date get -1.
+    : param created: Creation dates, timezone aware or naive local time in *timezone*
+    : param cutovers: Cutover dates in ascending order, as local time in *timezone*
+    : param timezone: The name of the timezone of the cutover dates
+    """
+    created = pd.Series(created)
+    if isinstance(created.dtype, pd.DatetimeTZDtype):
+        created = created.dt.tz_convert("UTC").dt.tz_localize(None)
+    else:
+        created = created.dt.tz_localize(timezone).dt.tz_convert("UTC").dt.tz_localize(None)
+    values = created.to_numpy(dtype="datetime64[ns]")
+    edges = np.array([pd.Timestamp(cutover, tz=timezone).tz_convert("UTC").tz_localize(None).to_datetime64() for cutover in cutovers], dtype="datetime64[ns]")
+    form = np.searchsorted(edges, values, side="right").astype(np.int8)
+    form[np.isnat(values)] = -1
+    return form
+
+
+def compile_rules(rules):
+    """Returns (masks, targets) for a rule table: the mask names it needs, and for each target field the (masks, value) pairs in np.select priority order, last rule first
+    : param rules: List of (target, masks, value) tuples
+    """
+    masks = sorted({mask for target, rule_masks, value in rules for mask in rule_masks})
+    targets = {}
+    for target, rule_masks, value in rules:
+        targets.setdefault(target, []).insert(0, (tuple(rule_masks), value))
+    return masks, targets
+
+
+def apply_rules(df, rules, masks=None):
+    """Sets the target fields of a rule table on *df* in place. Rows matched by no rule keep the existing value of the field, or NaN for new fields, as with .loc assignment.
+    : param df: Live fish or carcass records
+    : param rules: List of (target, masks, value) tuples, or the result of compile_rules
+    : param masks: Optional dictionary of named masks already evaluated on *df*; missing ones are evaluated from MASKS and added
+    """
+    mask_names, targets = compile_rules(rules) if isinstance(rules, list) else rules
+    masks = {} if masks is None else masks
+    for name in mask_names:
+        if name not in masks:
+            masks[name] = np.asarray(MASKS[name](df), dtype=bool)
+    conditions = {}
+    for target, entries in targets.items():
+        condlist = []
+        choicelist = []
+        for rule_masks, value in entries:
+            if rule_masks not in conditions:
+                conditions[rule_masks] = np.logical_and.reduce([masks[name] for name in rule_masks])
+            condlist.append(conditions[rule_masks])
+            choicelist.append(df[value].to_numpy(dtype=float, na_value=np.nan) if isinstance(value, str) else value)
+        existing = df[target] if target in df.columns else None
+        default = np.nan if existing is None else existing.to_numpy(dtype=float, na_value=np.nan)
+        result = np.select(condlist, choicelist, default)
+        # Keep integer fields integer when every row still has a value
+        if existing is not None and pd.api.types.is_integer_dtype(existing) and not np.isnan(result).any():
+            result = result.astype(existing.dtype)
+        df[target] = result
+    return df
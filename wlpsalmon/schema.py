@@ -0,0 +1,90 @@
+### Compact dtypes for the coded survey fields.
+### Fields such as strStream, strLiveSex or ysnPairs hold a handful of coded values. They are stored as pandas categoricals, whose categories are the codes of the feature service's coded value domain plus any other value found in the data, so each cell is a small integer code. The derivation masks compare these codes with the position of one category instead of comparing Python strings, and groupbys on them factorize integers.
+
+import numpy as np
+import pandas as pd
+
+### Coded fields stored as categoricals, keyed by layer name
+CATEGORY_FIELDS = {
+    "Metadata": ["strStream", "strTideStart", "strWeather", "strStreamFlow", "strViewingConditions", "ysnLiveFish", "ysnCarcasses"],
+    "LiveFish": ["strLiveSpecies", "strLiveSex", "ysnPairs", "ysnReddBuilding", "strLiveFishRedd"],
+    "Carcass": ["strCarcassSpecies", "strCarcassSex", "strDecomposedFresh", "ysnCountedLast"],
+}
+
+
+def domain_codes(fields):
+    """Returns a dictionary of the coded value domain codes of each field that has one, keyed by field name
+    : param fields: List of field descriptions from a REST query or layer description
+    """
+    domains = {}
+    for field in fields:
+        domain = field.get("domain") or {}
+        if domain.get("type") == "codedValue":
+            domains[field["name"]] = [value["code"] for value in domain.get("codedValues", [])]
+    return domains
+
+
+def categorize(series, codes=None):
+    """Returns *series* as an unordered categorical whose categories are *codes* and every other value of *series*, in sorted order; nulls stay null. Categorical series are returned unchanged.
+    : param series: Values of a coded field
+    : param codes: Optional domain codes of the field
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    ## One hash pass over the cells; only the distinct values are merged with the domain codes and sorted
+    cell_codes, values = pd.factorize(series)
+    categories = pd.Index(values, dtype=object)
+    if codes is not None:
+        categories = categories.append(pd.Index(codes, dtype=object)).unique()
+    ## Sorted categories keep sorts and groupbys on the field in text order
+    try:
+        categories = categories.sort_values()
+    except TypeError:
+        pass
+    remap = np.append(categories.get_indexer(values), -1)
+    # Code -1 (null) indexes the trailing -1
+    return pd.Series(pd.Categorical.from_codes(remap[cell_codes], categories=categories), index=series.index, name=series.name)
+
+
+def apply_categories(frames, domains=None, fields=CATEGORY_FIELDS):
+    """Returns shallow copies of *frames* in which the coded fields present are categoricals
+    : param frames: Dictionary of raw DataFrames keyed by layer name
+    : param domains: Optional dictionary keyed by layer name of the domain codes from domain_codes
+    : param fields: Dictionary of the coded fields keyed by layer name
+    """
+    domains = domains or {}
+    converted = {}
+    for layer, df in frames.items():
+        df = df.copy(deep=False)
+        for col in fields.get(layer, []):
+            if col in df.columns:
+                df[col] = categorize(df[col], domains.get(layer, {}).get(col))
+        converted[layer] = df
+    return converted
+
+
+def equals(series, value):
+    """Returns a boolean array of the cells of *series* equal to *value*; for categoricals the integer codes are compared
+    : param series: Values of a field
+    : param value: The value to match
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if value not in categories:
+            return np.zeros(len(series), dtype=bool)
+        return series.cat.codes.to_numpy() == categories.get_loc(value)
+    return np.asarray(series == value, dtype=bool)
+
+
+def isin(series, values):
+    """Returns a boolean array of the cells of *series* equal to any of *values*; for categoricals the integer codes are looked up. Null cells match nothing, as with equals, even when *values* holds a null.
+    : param series: Values of a field
+    : param values: The values to match
+    """
+    ## Series.isin matches null cells to a null value, and the codes of a categorical cannot; both leave nulls unmatched
+    values = [value for value in values if not pd.isna(value)]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        matched = np.append(series.cat.categories.isin(values), False)
+        # Code -1 (null) indexes the trailing False
+        return matched[series.cat.codes.to_numpy()]
+    return np.asarray(series.isin(values), dtype=bool)
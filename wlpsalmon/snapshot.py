@@ -0,0 +1,137 @@
+### Columnar on-disk snapshots of raw survey pulls.
+### Each pull is written as one compressed Parquet file per layer in a folder named by the pull timestamp. Column dtypes, including naive UTC datetimes, are kept as they were pulled, and the SHAPE geometry is stored as WKB.
+
+import json
+import os
+import struct
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+### Parquet compression codec for snapshots
+SNAPSHOT_COMPRESSION = "zstd"
+
+### Key of the Parquet schema metadata holding the spatial reference of the SHAPE column
+SPATIAL_REFERENCE_KEY = b"wlpsalmon:spatialReference"
+
+### WKB header of a little-endian 2D point
+_WKB_POINT = struct.Struct("<BIdd")
+
+
+def geometry_to_wkb(geometry):
+    """Returns the WKB bytes of a geometry. Esri JSON points are encoded directly; other geometries use their own WKB property (arcgis Geometry.WKB or shapely .wkb).
+    : param geometry: Esri JSON geometry dictionary, arcgis or shapely geometry, WKB bytes, or None or NaN
+    """
+    if geometry is None or isinstance(geometry, bytes):
+        return geometry
+    ## An empty object column, such as SHAPE in the "skip" geometry mode, holds NaN
+    if isinstance(geometry, float) and geometry != geometry:
+        return None
+    if isinstance(geometry, dict):
+        if "x" in geometry and "y" in geometry:
+            if geometry["x"] is None or geometry["y"] is None:
+                return None
+            return _WKB_POINT.pack(1, 1, geometry["x"], geometry["y"])
+        from arcgis.geometry import Geometry
+        geometry = Geometry(geometry)
+    if hasattr(geometry, "WKB"):
+        return bytes(geometry.WKB)
+    return bytes(geometry.wkb)
+
+
+def wkb_to_esri_point(wkb, spatial_reference=None):
+    """Returns the Esri JSON point dictionary of WKB point bytes, or the bytes unchanged if they hold another geometry type
+    : param wkb: WKB bytes or None
+    : param spatial_reference: Optional spatial reference dictionary added to the point
+    """
+    if wkb is None or len(wkb) != _WKB_POINT.size or wkb[0] != 1:
+        return wkb
+    _, geometry_type, x, y = _WKB_POINT.unpack(wkb)
+    if geometry_type != 1:
+        return wkb
+    point = {"x": x, "y": y}
+    if spatial_reference:
+        point["spatialReference"] = spatial_reference
+    return point
+
+
+def _spatial_reference(shapes):
+    if hasattr(shapes.array, "spatial_reference"):
+        return shapes.array.spatial_reference
+    for geometry in shapes:
+        if isinstance(geometry, dict) and geometry.get("spatialReference"):
+            return geometry["spatialReference"]
+        if hasattr(geometry, "spatial_reference") and geometry.spatial_reference:
+            return dict(geometry.spatial_reference)
+    return None
+
+
+def write_snapshot(frames, snapshot_dir, timestamp=None):
+    """Writes the raw DataFrames of a pull as a snapshot and returns the snapshot folder. The DataFrames are not modified.
+    : param frames: Dictionary of raw DataFrames keyed by layer name
+    : param snapshot_dir: Folder holding all snapshots
+    : param timestamp: Pull timestamp naming the snapshot, '%Y-%m-%d_%H%M'; defaults to now
+    """
+    timestamp = timestamp or time.strftime('%Y-%m-%d_%H%M', time.localtime())
+    folder = os.path.join(snapshot_dir, timestamp)
+    os.makedirs(folder, exist_ok=True)
+    for layer, df in frames.items():
+        metadata = {}
+        if "SHAPE" in df.columns:
+            spatial_reference = _spatial_reference(df["SHAPE"])
+            df = df.copy(deep=False)
+            ## geometry.PointArray encodes every point at once
+            df["SHAPE"] = df["SHAPE"].array.to_wkb() if hasattr(df["SHAPE"].array, "to_wkb") else [geometry_to_wkb(geometry) for geometry in df["SHAPE"]]
+            if spatial_reference:
+                metadata[SPATIAL_REFERENCE_KEY] = json.dumps(spatial_reference).encode("utf-8")
+        table = pa.Table.from_pandas(pd.DataFrame(df), preserve_index=False)
+        if metadata:
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        pq.write_table(table, os.path.join(folder, layer + ".parquet"), compression=SNAPSHOT_COMPRESSION)
+    return folder
+
+
+def list_snapshots(snapshot_dir):
+    """Returns the timestamps of the snapshots in *snapshot_dir*, oldest first
+    : param snapshot_dir: Folder holding all snapshots
+    """
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(name for name in os.listdir(snapshot_dir) if os.path.isdir(os.path.join(snapshot_dir, name)))
+
+
+def read_snapshot(snapshot_dir, timestamp=None, layers=None, geometry="esri"):
+    """Returns a dictionary of the raw DataFrames of a snapshot keyed by layer name
+    : param snapshot_dir: Folder holding all snapshots
+    : param timestamp: Pull timestamp of the snapshot; defaults to the most recent one
+    : param layers: Names of the layers to read; defaults to all layers in the snapshot
+    : param geometry: "esri" to decode SHAPE points back to Esri JSON dictionaries, "xy" to decode them into a geometry.PointArray at once, or "wkb" to keep the WKB bytes
+    """
+    if timestamp is None:
+        snapshots = list_snapshots(snapshot_dir)
+        if not snapshots:
+            raise FileNotFoundError(f"No snapshots found in {snapshot_dir}")
+        timestamp = snapshots[-1]
+    folder = os.path.join(snapshot_dir, timestamp)
+    if layers is None:
+        layers = sorted(os.path.splitext(name)[0] for name in os.listdir(folder) if name.endswith(".parquet"))
+    frames = {}
+    for layer in layers:
+        table = pq.read_table(os.path.join(folder, layer + ".parquet"))
+        df = table.to_pandas()
+        if "SHAPE" in df.columns and geometry in ("esri", "xy"):
+            metadata = table.schema.metadata or {}
+            spatial_reference = json.loads(metadata[SPATIAL_REFERENCE_KEY]) if SPATIAL_REFERENCE_KEY in metadata else None
+            points = None
+            if geometry == "xy":
+                from .geometry import points_from_wkb
+                points = points_from_wkb(df["SHAPE"], spatial_reference)
+            # Other geometry types stay WKB in the "xy" mode
+            if points is not None:
+                df["SHAPE"] = pd.Series(points, index=df.index)
+            elif geometry == "esri":
+                df["SHAPE"] = [wkb_to_esri_point(wkb, spatial_reference) for wkb in df["SHAPE"]]
+        frames[layer] = df
+    return frames
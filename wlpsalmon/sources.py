@@ -0,0 +1,144 @@
+### Interchangeable data sources for the join and summary pipeline.
+### Every source returns the same dictionary of raw DataFrames keyed by layer name ("Metadata", "LiveFish", "Carcass", "Observer"), with naive UTC datetime fields, so summary.build_summary runs unchanged on top of the live service, a file geodatabase export, a prior BKUP workbook, a snapshot or in-memory fixtures.
+
+import os
+
+import pandas as pd
+
+from . import rest
+from .export import BACKUP_SHEETS
+
+### Feature class and table names within the file geodatabase export of the feature service
+FGDB_LAYERS = {"Metadata": "WLP_Salmon_Spawning_v1", "LiveFish": "tblLiveFish", "Carcass": "tblCarcasses", "Observer": "lkupObserver"}
+
+
+def normalize_datetimes(df):
+    """Converts epoch millisecond edit tracking fields and timezone aware fields of a DataFrame to naive UTC datetime64[ns], in place
+    : param df: Raw DataFrame of one layer
+    """
+    for col in ["CreationDate", "EditDate"]:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], unit="ms")
+    for col in df.select_dtypes(include=['datetimetz']).columns:
+        df[col] = df[col].dt.tz_convert("UTC").dt.tz_localize(None)
+    for col in df.select_dtypes(include=['datetime64']).columns:
+        df[col] = df[col].astype("datetime64[ns]")
+
+
+class Source:
+    """Base class of the data sources. Subclasses implement load."""
+
+    def load(self, year=None, fields=None):
+        """Returns a dictionary of raw DataFrames keyed by layer name
+        : param year: Optional year of interest; sources that can filter before loading may use it, others return every year
+        : param fields: Optional dictionary of (out_fields, return_geometry) keyed by layer name, see spec.layer_fields; sources that query the service request only these, others return every field
+        """
+        raise NotImplementedError
+
+
+class ServiceSource(Source):
+    """The ArcGIS Online feature service, pulled concurrently, through a local sync cache, or one season at a time. After each load, transfer holds the rest.TransferStats of each layer pulled, and changes holds the globalids pulled and deleted by the sync cache (see sync.SyncCache.changes), or None when every record was pulled.
+    : param service_url: The url of the FeatureServer
+    : param token: Optional ArcGIS token, for example GIS("pro")._con.token
+    : param cache_dir: Optional sync cache folder; when given, only records edited since the last run are pulled
+    : param plan_year: When True and a year is requested, push the year filter into the layer queries
+    """
+
+    def __init__(self, service_url=rest.SERVICE_URL, token=None, cache_dir=None, plan_year=False):
+        self.service_url = service_url
+        self.token = token
+        self.cache_dir = cache_dir
+        self.plan_year = plan_year
+        self.transfer = {}
+        self.changes = None
+
+    def load(self, year=None, fields=None):
+        self.transfer = {}
+        self.changes = None
+        if self.plan_year and year is not None:
+            from .planning import fetch_season
+            return fetch_season(self.service_url, year, token=self.token, fields=fields, transfer=self.transfer)
+        if self.cache_dir:
+            ## The sync cache always holds every field, so later runs can write a backup from it
+            from .sync import SyncCache
+            cache = SyncCache(self.cache_dir, self.service_url, token=self.token)
+            frames = cache.sync(transfer=self.transfer)
+            self.changes = cache.changes
+            return frames
+        from .fetch import fetch_layers
+        frames, timings = fetch_layers(self.service_url, token=self.token, fields=fields, transfer=self.transfer)
+        return frames
+
+
+class FileGeodatabaseSource(Source):
+    """A file geodatabase export of the feature service, read with the ArcGIS API for Python
+    : param fgdb: Path to the .gdb folder
+    """
+
+    def __init__(self, fgdb):
+        self.fgdb = fgdb
+
+    def load(self, year=None, fields=None):
+        from arcgis.features import GeoAccessor
+        frames = {
+            "Metadata": pd.DataFrame.spatial.from_featureclass(os.path.join(self.fgdb, FGDB_LAYERS["Metadata"])),
+            "LiveFish": pd.DataFrame.spatial.from_featureclass(os.path.join(self.fgdb, FGDB_LAYERS["LiveFish"])),
+            "Carcass": pd.DataFrame.spatial.from_featureclass(os.path.join(self.fgdb, FGDB_LAYERS["Carcass"])),
+            "Observer": pd.DataFrame(GeoAccessor.from_table(os.path.join(self.fgdb, FGDB_LAYERS["Observer"]))),
+        }
+        for df in frames.values():
+            normalize_datetimes(df)
+        return frames
+
+
+class BackupWorkbookSource(Source):
+    """A WLP_Salmon_Spawning_Survey_BKUP_*.xlsx workbook written by a previous run. Datetime fields were archived as '%m/%d/%Y %H:%M:%S %Z%z' text, or as native Excel dates with datetime_mode="native"; the UTC fields are read back and the _Pacific copies are dropped because the pipeline recreates them.
+    : param path: Path to the backup workbook
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, year=None, fields=None):
+        sheets = pd.read_excel(self.path, sheet_name=list(BACKUP_SHEETS.values()))
+        frames = {}
+        for layer, sheet_name in BACKUP_SHEETS.items():
+            df = sheets[sheet_name]
+            for col in [col for col in df.columns if col + "_Pacific" in df.columns]:
+                if pd.api.types.is_datetime64_dtype(df[col]):
+                    # Written with datetime_mode="native": the cells already hold the UTC wall time
+                    df[col] = df[col].astype("datetime64[ns]")
+                else:
+                    # The first 19 characters hold the UTC wall time; the %Z%z suffix is empty for naive fields
+                    df[col] = pd.to_datetime(df[col].astype(str).str.slice(0, 19), format="%m/%d/%Y %H:%M:%S", errors="coerce").astype("datetime64[ns]")
+            frames[layer] = df.drop(columns=[col for col in df.columns if col.endswith("_Pacific")])
+        return frames
+
+
+class SnapshotSource(Source):
+    """A columnar snapshot written by snapshot.write_snapshot
+    : param snapshot_dir: Folder holding all snapshots
+    : param timestamp: Pull timestamp of the snapshot; defaults to the most recent one
+    : param geometry: How SHAPE is read, see snapshot.read_snapshot; "xy" decodes the stored points without creating a dictionary per record
+    """
+
+    def __init__(self, snapshot_dir, timestamp=None, geometry="esri"):
+        self.snapshot_dir = snapshot_dir
+        self.timestamp = timestamp
+        self.geometry = geometry
+
+    def load(self, year=None, fields=None):
+        from .snapshot import read_snapshot
+        return read_snapshot(self.snapshot_dir, self.timestamp, geometry=self.geometry)
+
+
+class FrameSource(Source):
+    """In-memory DataFrames, for example test fixtures or frames already pulled in a notebook
+    : param frames: Dictionary of raw DataFrames keyed by layer name
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def load(self, year=None, fields=None):
+        return dict(self.frames)
@@ -0,0 +1,323 @@
+### Spatial outputs of the joined live fish and carcass records, written without ArcGIS.
+### write_spatial takes the Live Fish and Carcasses sheets of a summary, attaches the survey attributes of the Metadata sheet to each record, and writes them as point layers of a GeoPackage and as GeoParquet files. It also writes per-stream redd and carcass density rasters as ESRI ASCII grids. The GeoPackage is written with sqlite3 from the standard library in batched inserts, and the GeoParquet files with pyarrow, so no GIS package is needed. The rasters bin the points of every stream in one np.bincount pass.
+
+import json
+import os
+import re
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from .geometry import PointArray, convert_shape
+from .summary import derive_carcasses, derive_live_fish
+
+### Outputs written by write_spatial
+SPATIAL_FORMATS = ("gpkg", "geoparquet", "raster")
+
+### Layer name of each sheet in the GeoPackage and GeoParquet outputs
+SPATIAL_LAYERS = {"Live Fish": "LiveFish", "Carcasses": "Carcasses"}
+
+### Fields of the Metadata sheet attached to each record, besides the survey fields the sheets already hold
+SURVEY_ATTRIBUTES = ["strFullName", "strTideStart", "strWeather", "dtmManualTimeTotal", "strStreamFlow", "strViewingConditions"]
+
+### Density rasters: the sheet, the derivation giving the count fields, and the count field summed in each cell
+DENSITY_RASTERS = {
+    "Redds": ("Live Fish", derive_live_fish, "intNumRedds"),
+    "Carcasses": ("Carcasses", derive_carcasses, "intNumCarcasses"),
+}
+
+### Rows inserted into the GeoPackage, or written as one Parquet row group, at a time
+BATCH_ROWS = 10000
+
+### Default number of cells along the longer side of the largest stream extent
+RASTER_CELLS = 100
+
+### Well-known text of the WGS 84 spatial reference, written for wkid 4326
+WGS84_WKT = 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]'
+
+### Well-known text of the WGS 84 / Pseudo-Mercator spatial reference, written for wkid 102100 and 3857
+WEB_MERCATOR_WKT = 'PROJCS["WGS 84 / Pseudo-Mercator",' + WGS84_WKT + ',PROJECTION["Mercator_1SP"],PARAMETER["central_meridian",0],PARAMETER["scale_factor",1],PARAMETER["false_easting",0],PARAMETER["false_northing",0],UNIT["metre",1,AUTHORITY["EPSG","9001"]],AXIS["Easting",EAST],AXIS["Northing",NORTH],EXTENSION["PROJ4","+proj=merc +a=6378137 +b=6378137 +lat_ts=0 +lon_0=0 +x_0=0 +y_0=0 +k=1 +units=m +nadgrids=@null +wktext +no_defs"],AUTHORITY["EPSG","3857"]]'
+
+### PROJJSON of WGS 84 / Pseudo-Mercator, the crs member of GeoParquet files
+WEB_MERCATOR_PROJJSON = {
+    "$schema": "https://proj.org/schemas/v0.7/projjson.schema.json",
+    "type": "ProjectedCRS",
+    "name": "WGS 84 / Pseudo-Mercator",
+    "base_crs": {
+        "name": "WGS 84",
+        "datum": {"type": "GeodeticReferenceFrame", "name": "World Geodetic System 1984", "ellipsoid": {"name": "WGS 84", "semi_major_axis": 6378137, "inverse_flattening": 298.257223563}},
+        "coordinate_system": {"subtype": "ellipsoidal", "axis": [
+            {"name": "Geodetic latitude", "abbreviation": "Lat", "direction": "north", "unit": "degree"},
+            {"name": "Geodetic longitude", "abbreviation": "Lon", "direction": "east", "unit": "degree"},
+        ]},
+        "id": {"authority": "EPSG", "code": 4326},
+    },
+    "conversion": {
+        "name": "Popular Visualisation Pseudo-Mercator",
+        "method": {"name": "Popular Visualisation Pseudo Mercator", "id": {"authority": "EPSG", "code": 1024}},
+        "parameters": [
+            {"name": "Latitude of natural origin", "value": 0, "unit": "degree", "id": {"authority": "EPSG", "code": 8801}},
+            {"name": "Longitude of natural origin", "value": 0, "unit": "degree", "id": {"authority": "EPSG", "code": 8802}},
+            {"name": "False easting", "value": 0, "unit": "metre", "id": {"authority": "EPSG", "code": 8806}},
+            {"name": "False northing", "value": 0, "unit": "metre", "id": {"authority": "EPSG", "code": 8807}},
+        ],
+    },
+    "coordinate_system": {"subtype": "Cartesian", "axis": [
+        {"name": "Easting", "abbreviation": "X", "direction": "east", "unit": "metre"},
+        {"name": "Northing", "abbreviation": "Y", "direction": "north", "unit": "metre"},
+    ]},
+    "id": {"authority": "EPSG", "code": 3857},
+}
+
+### Spatial references the outputs can describe, keyed by EPSG code: the GeoPackage srs name, well-known text and description, and the GeoParquet crs; None is OGC:CRS84, the GeoParquet default, which has the x/y order of wkid 4326 points
+SPATIAL_REFERENCES = {
+    4326: ("WGS 84 geodetic", WGS84_WKT, "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid", None),
+    3857: ("WGS 84 / Pseudo-Mercator", WEB_MERCATOR_WKT, "spherical Mercator coordinates in metres, as ArcGIS Online stores hosted layers", WEB_MERCATOR_PROJJSON),
+}
+
+### Esri wkids of the EPSG codes of SPATIAL_REFERENCES
+ESRI_WKIDS = {102100: 3857, 102113: 3857}
+
+### GeoPackage application id ("GPKG") and version 1.4
+GPKG_APPLICATION_ID = 0x47504B47
+GPKG_USER_VERSION = 10400
+
+
+def spatial_paths(summary_path):
+    """Returns a dictionary keyed by output of the paths written next to a summary workbook: the GeoPackage, the GeoParquet file of each sheet, and the folder of the density rasters
+    : param summary_path: Path of the summary workbook, see export.summary_path
+    """
+    stem = os.path.splitext(summary_path)[0]
+    paths = {"gpkg": stem + ".gpkg", "raster": stem + "_density"}
+    paths.update({sheet: f"{stem}_{layer}.parquet" for sheet, layer in SPATIAL_LAYERS.items()})
+    return paths
+
+
+def _srs_id(spatial_reference):
+    # EPSG code of an Esri spatial reference dictionary among SPATIAL_REFERENCES; the outputs are not written with an undefined or unknown spatial reference
+    for key in ("latestWkid", "wkid"):
+        wkid = (spatial_reference or {}).get(key)
+        if ESRI_WKIDS.get(wkid, wkid) in SPATIAL_REFERENCES:
+            return ESRI_WKIDS.get(wkid, wkid)
+    raise ValueError(f"Spatial outputs are written for the EPSG spatial references {sorted(SPATIAL_REFERENCES)} and the Esri wkids {sorted(ESRI_WKIDS)}, not {spatial_reference!r}")
+
+
+def _features(sheets, sheet):
+    # Returns (dfFeatures, wkb, points): the records of *sheet* with the survey attributes and without SHAPE, the WKB of each record, and its geometry.PointArray, or None if SHAPE holds other geometry types
+    df = sheets[sheet]
+    if "SHAPE" not in df.columns or (len(df) and df["SHAPE"].isna().all()):
+        raise ValueError(f"The {sheet} sheet has no geometry; run the summary with a geometry mode other than 'skip'")
+    ## The sheets share the globalid key index of the Metadata sheet; every record has its survey there
+    dfSurveys = sheets["Metadata"][SURVEY_ATTRIBUTES]
+    dfSurveys = dfSurveys.iloc[dfSurveys.index.get_indexer(df.index)].reset_index(drop=True)
+    dfFeatures = pd.concat([df.drop(columns="SHAPE").reset_index(drop=True), dfSurveys], axis=1)
+    shapes = convert_shape(df["SHAPE"], "xy")
+    points = shapes.array if isinstance(shapes.array, PointArray) else None
+    wkb = points.to_wkb() if points is not None else convert_shape(df["SHAPE"], "wkb").to_numpy()
+    return dfFeatures, wkb, points
+
+
+def _bounds(points):
+    # (min_x, min_y, max_x, max_y) of the points, or None
+    if points is None or points.isna().all():
+        return None
+    return float(np.nanmin(points.x)), float(np.nanmin(points.y)), float(np.nanmax(points.x)), float(np.nanmax(points.y))
+
+
+def _sql_values(series):
+    # Returns (sqlite type, list of Python values with None for nulls) of one column; timezone aware datetimes are written as ISO 8601 UTC text, as GeoPackage DATETIME fields are
+    if pd.api.types.is_bool_dtype(series):
+        return "BOOLEAN", [None if value is None else int(value) for value in series.astype(object).tolist()]
+    if pd.api.types.is_integer_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        return "INTEGER", series.astype(object).where(series.notna(), None).tolist()
+    if pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        return "REAL", [None if value != value else value for value in values.tolist()]
+    if isinstance(series.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_dtype(series):
+        values = series.dt.tz_convert("UTC").dt.tz_localize(None) if isinstance(series.dtype, pd.DatetimeTZDtype) else series
+        return "DATETIME", [None if value == "NaT" else value + "Z" for value in np.datetime_as_string(values.to_numpy(dtype="datetime64[ms]"), unit="ms").tolist()]
+    return "TEXT", [None if value is None or value != value else str(value) for value in series.astype(object).tolist()]
+
+
+def _create_geopackage(connection):
+    # Creates the GeoPackage metadata tables, with the spatial reference rows GeoPackage requires and one for each of SPATIAL_REFERENCES
+    connection.execute(f"PRAGMA application_id = {GPKG_APPLICATION_ID}")
+    connection.execute(f"PRAGMA user_version = {GPKG_USER_VERSION}")
+    connection.execute("CREATE TABLE gpkg_spatial_ref_sys (srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL, organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT)")
+    connection.execute("CREATE TABLE gpkg_contents (table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE, description TEXT DEFAULT '', last_change DATETIME NOT NULL, min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id))")
+    connection.execute("CREATE TABLE gpkg_geometry_columns (table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL REFERENCES gpkg_spatial_ref_sys(srs_id), z TINYINT NOT NULL, m TINYINT NOT NULL, CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name))")
+    rows = [
+        ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", "undefined cartesian coordinate reference system"),
+        ("Undefined geographic SRS", 0, "NONE", 0, "undefined", "undefined geographic coordinate reference system"),
+    ]
+    rows += [(name, srs_id, "EPSG", srs_id, wkt, description) for srs_id, (name, wkt, description, projjson) in SPATIAL_REFERENCES.items()]
+    connection.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+def write_geopackage(sheets, path, batch_rows=BATCH_ROWS):
+    """Writes the live fish and carcass records, with their survey attributes, as point layers of a GeoPackage and returns its path. An existing file is replaced. Raises ValueError for points without a spatial reference of SPATIAL_REFERENCES.
+    : param sheets: Dictionary of the summary sheets from summary.build_summary
+    : param path: Path of the .gpkg file
+    : param batch_rows: Rows inserted at a time
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    try:
+        created = False
+        layers = {layer: _features(sheets, sheet) for sheet, layer in SPATIAL_LAYERS.items()}
+        ## A layer without records has no points to give its spatial reference; it takes that of the other layer
+        srs_ids = {layer: _srs_id(points.spatial_reference if points is not None else None) for layer, (dfFeatures, wkb, points) in layers.items() if len(dfFeatures)}
+        for layer, (dfFeatures, wkb, points) in layers.items():
+            srs_id = srs_ids.get(layer) or next(iter(srs_ids.values()), None) or _srs_id(None)
+            if not created:
+                _create_geopackage(connection)
+                created = True
+            ## GeoPackage geometry blob: "GP", version 0, little-endian header without envelope, the srs_id, then the WKB
+            header = b"GP\x00\x01" + int(srs_id).to_bytes(4, "little", signed=True)
+            columns = [(col,) + _sql_values(dfFeatures[col]) for col in dfFeatures.columns]
+            geometry_type = "POINT" if points is not None else "GEOMETRY"
+            definitions = ", ".join(f'"{col}" {kind}' for col, kind, values in columns)
+            names = ", ".join(f'"{col}"' for col, kind, values in columns)
+            connection.execute(f'CREATE TABLE "{layer}" (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom {geometry_type}, {definitions})')
+            insert = f'INSERT INTO "{layer}" (geom, {names}) VALUES ({", ".join("?" * (len(columns) + 1))})'
+            blobs = [None if value is None else header + value for value in wkb.tolist()]
+            for start in range(0, len(dfFeatures), batch_rows):
+                stop = start + batch_rows
+                connection.executemany(insert, zip(blobs[start:stop], *(values[start:stop] for col, kind, values in columns)))
+            bounds = _bounds(points) or (None, None, None, None)
+            connection.execute("INSERT INTO gpkg_contents VALUES (?, 'features', ?, '', ?, ?, ?, ?, ?, ?)", (layer, layer, time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()), *bounds, srs_id))
+            connection.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', ?, ?, 0, 0)", (layer, geometry_type, srs_id))
+        connection.commit()
+    finally:
+        connection.close()
+    return path
+
+
+def write_geoparquet(sheets, sheet, path, batch_rows=BATCH_ROWS):
+    """Writes the records of one sheet, with their survey attributes, as a GeoParquet file with a WKB geometry column and returns its path. Raises ValueError for points without a spatial reference of SPATIAL_REFERENCES.
+    : param sheets: Dictionary of the summary sheets from summary.build_summary
+    : param sheet: "Live Fish" or "Carcasses"
+    : param path: Path of the .parquet file
+    : param batch_rows: Rows of each row group
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from .snapshot import SPATIAL_REFERENCE_KEY
+    dfFeatures, wkb, points = _features(sheets, sheet)
+    table = pa.Table.from_pandas(dfFeatures, preserve_index=False).append_column("geometry", pa.array(wkb, type=pa.binary()))
+    column = {"encoding": "WKB", "geometry_types": ["Point"] if points is not None else []}
+    bounds = _bounds(points)
+    if bounds:
+        column["bbox"] = list(bounds)
+    ## Without a crs member GeoParquet readers assume OGC:CRS84, the x/y order of wkid 4326 points
+    spatial_reference = points.spatial_reference if points is not None else None
+    crs = SPATIAL_REFERENCES[_srs_id(spatial_reference)][3]
+    if crs is not None:
+        column["crs"] = crs
+    metadata = {b"geo": json.dumps({"version": "1.1.0", "primary_column": "geometry", "columns": {"geometry": column}}).encode("utf-8")}
+    if spatial_reference:
+        metadata[SPATIAL_REFERENCE_KEY] = json.dumps(spatial_reference).encode("utf-8")
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    pq.write_table(table, path, row_group_size=batch_rows)
+    return path
+
+
+def density_grids(streams, x, y, weights, cell_size=None, cells=RASTER_CELLS):
+    """Returns a dictionary keyed by stream of (grid, x_min, y_min, cell_size): the sum of *weights* in each cell of a grid over the extent of the stream's points, with row 0 to the north. Points of every stream are binned in one pass.
+    : param streams: Stream of each point
+    : param x: x coordinate of each point
+    : param y: y coordinate of each point
+    : param weights: Count of each point
+    : param cell_size: Cell size in map units; defaults to the longer side of the largest stream extent divided by *cells*, so every stream has the same cells
+    : param cells: Cells along the longer side of the largest stream extent when *cell_size* is not given
+    """
+    x, y, weights = (np.asarray(values, dtype=np.float64) for values in (x, y, weights))
+    valid = ~(np.isnan(x) | np.isnan(y) | np.isnan(weights)) & pd.notna(np.asarray(streams, dtype=object))
+    codes, names = pd.factorize(np.asarray(streams, dtype=object)[valid], sort=True)
+    x, y, weights = x[valid], y[valid], weights[valid]
+    if not len(names):
+        return {}
+    ## Extent of each stream
+    x_min = np.full(len(names), np.inf)
+    y_min = np.full(len(names), np.inf)
+    x_max = np.full(len(names), -np.inf)
+    y_max = np.full(len(names), -np.inf)
+    np.minimum.at(x_min, codes, x)
+    np.minimum.at(y_min, codes, y)
+    np.maximum.at(x_max, codes, x)
+    np.maximum.at(y_max, codes, y)
+    if cell_size is None:
+        cell_size = max(float(np.max(np.maximum(x_max - x_min, y_max - y_min))) / cells, np.finfo(np.float64).eps)
+    ## Cells of each stream, with a point on the upper or right edge falling in the last cell
+    ncols = np.floor((x_max - x_min) / cell_size).astype(np.int64) + 1
+    nrows = np.floor((y_max - y_min) / cell_size).astype(np.int64) + 1
+    offsets = np.r_[0, np.cumsum(nrows * ncols)]
+    col = np.floor((x - x_min[codes]) / cell_size).astype(np.int64)
+    row = nrows[codes] - 1 - np.floor((y - y_min[codes]) / cell_size).astype(np.int64)
+    sums = np.bincount(offsets[codes] + row * ncols[codes] + col, weights=weights, minlength=offsets[-1])
+    return {name: (sums[offsets[i]:offsets[i + 1]].reshape(nrows[i], ncols[i]), float(x_min[i]), float(y_min[i]), cell_size) for i, name in enumerate(names)}
+
+
+def write_ascii_grid(path, grid, x_min, y_min, cell_size, spatial_reference):
+    """Writes a grid as an ESRI ASCII raster, with the well-known text of its spatial reference in a .prj file next to it, and returns its path
+    : param path: Path of the .asc file
+    : param grid: 2D array, row 0 to the north
+    : param x_min: x of the lower left corner
+    : param y_min: y of the lower left corner
+    : param cell_size: Cell size in map units
+    : param spatial_reference: Esri spatial reference dictionary of the coordinates, one of SPATIAL_REFERENCES
+    """
+    wkt = SPATIAL_REFERENCES[_srs_id(spatial_reference)][1]
+    header = f"ncols {grid.shape[1]}\nnrows {grid.shape[0]}\nxllcorner {x_min!r}\nyllcorner {y_min!r}\ncellsize {cell_size!r}"
+    np.savetxt(path, grid, fmt="%.10g", header=header, comments="")
+    with open(os.path.splitext(path)[0] + ".prj", "w") as f:
+        f.write(wkt)
+    return path
+
+
+def write_density_rasters(sheets, folder, cell_size=None):
+    """Writes the redd and carcass density rasters of each stream to *folder* and returns their paths, keyed by raster and stream. Each cell holds the redds, or the carcasses, counted at the points in it.
+    : param sheets: Dictionary of the summary sheets from summary.build_summary
+    : param folder: Folder of the rasters; created if it does not exist
+    : param cell_size: Cell size in map units; see density_grids
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = {}
+    for raster, (sheet, derive, field) in DENSITY_RASTERS.items():
+        dfRecords = derive(sheets[sheet])
+        points = convert_shape(dfRecords["SHAPE"], "xy").array
+        if not isinstance(points, PointArray):
+            raise ValueError(f"The {sheet} sheet holds geometries other than points; density rasters need points")
+        grids = density_grids(dfRecords["strStream"], points.x, points.y, dfRecords[field].to_numpy(dtype=float, na_value=np.nan), cell_size)
+        paths[raster] = {}
+        for stream, grid in grids.items():
+            name = re.sub(r"\W+", "_", str(stream)).strip("_")
+            paths[raster][stream] = write_ascii_grid(os.path.join(folder, f"{raster}_{name}.asc"), *grid, points.spatial_reference)
+    return paths
+
+
+def write_spatial(sheets, summary_path, formats=SPATIAL_FORMATS, cell_size=None):
+    """Writes the spatial outputs of a summary next to its workbook and returns their paths keyed by output. A season without live fish or carcass records gets none, and a sheet without records no GeoParquet file.
+    : param sheets: Dictionary of the summary sheets from summary.build_summary, with SHAPE in the "esri" or "xy" geometry mode, which keep the spatial reference of the points
+    : param summary_path: Path of the summary workbook, see export.summary_path
+    : param formats: Outputs to write, see SPATIAL_FORMATS
+    : param cell_size: Cell size of the density rasters in map units; see density_grids
+    """
+    unknown = set(formats) - set(SPATIAL_FORMATS)
+    if unknown:
+        raise ValueError(f"spatial formats must be among {SPATIAL_FORMATS}, not {sorted(unknown)}")
+    paths = spatial_paths(summary_path)
+    result = {}
+    ## A season without live fish or carcass records has no points, so no spatial reference to write them in
+    if not any(len(sheets[sheet]) for sheet in SPATIAL_LAYERS):
+        return result
+    if "gpkg" in formats:
+        result["gpkg"] = write_geopackage(sheets, paths["gpkg"])
+    if "geoparquet" in formats:
+        result["geoparquet"] = {sheet: write_geoparquet(sheets, sheet, paths[sheet]) for sheet in SPATIAL_LAYERS if len(sheets[sheet])}
+    if "raster" in formats:
+        result["raster"] = write_density_rasters(sheets, paths["raster"], cell_size)
+    return result
@@ -0,0 +1,74 @@
+### Report spec: the fields each sheet of the summary workbook shows, and the source fields it reads from each layer.
+### layer_fields turns the spec into the outFields and returnGeometry of each layer query, so a summary run only downloads the fields its sheets use, and geometry only for layers whose sheets show SHAPE. Every field of every layer is only requested when a raw backup or a snapshot is written.
+
+from . import rest
+
+### Fields of each sheet of the summary workbook, in export order
+SHEET_FIELDS = {
+    "Metadata": ["globalid", "strStream", "dtmDate_Pacific", "strFullName", "strTideStart", "strWeather", "dtmManualTimeStart", "dtmManualTimeTurn", "dtmManualTimeEnd", "dtmManualTimeTotal", "strStreamFlow", "strViewingConditions", "strViewingConditionsComments", "ysnLiveFish", "ysnCarcasses", "strComments", "CreationDate_Pacific"],
+    "Live Fish": ['globalid_x', 'strStream', 'dtmDate_Pacific', 'ysnLiveFish', 'globalid_y', 'strLiveSpecies', 'strLiveSex', 'ysnPairs', 'ysnReddBuilding', 'intNumRedds', 'strLiveFishRedd', 'strReddID', 'SHAPE', 'CreationDate_Pacific_x'],
+    "Carcasses": ['globalid_x', 'strStream', 'dtmDate_Pacific', 'ysnCarcasses', 'globalid_y', 'strCarcassSpecies', 'strCarcassSex', 'strDecomposedFresh', 'intNumCarcasses', 'ysnCountedLast', 'SHAPE', 'CreationDate_Pacific_x'],
+    "Live Fish Summary": ['globalid', 'strStream', 'dtmDate_Pacific', 'strFullName', 'strTideStart', 'strWeather', 'dtmManualTimeStart', 'dtmManualTimeTurn', 'dtmManualTimeEnd', 'dtmManualTimeTotal', 'strStreamFlow', 'strViewingConditions', 'strViewingConditionsComments', 'ysnLiveFish', 'strLiveSpecies', 'intLiveFish', 'intMales', 'intFemales', 'intUnknown', 'intReddBuilding', 'dblPairs', 'intNumRedds', 'strComments'],
+    "Carcass Summary": ['globalid', 'strStream', 'dtmDate_Pacific', 'strFullName', 'strTideStart', 'strWeather', 'dtmManualTimeStart', 'dtmManualTimeTurn', 'dtmManualTimeEnd', 'dtmManualTimeTotal', 'strStreamFlow', 'strViewingConditions', 'strViewingConditionsComments', 'ysnCarcasses', 'strCarcassSpecies', 'intTotalCarcasses', 'intCountedLast', 'intNewNumCarcasses', 'intNewMales', 'intNewFemales', 'intNewJuveniles', 'intNewUnknown', 'strComments'],
+}
+
+### Survey fields attached to each child record sheet
+SURVEY_FIELDS = {
+    "Live Fish": ["globalid", "strStream", "dtmDate_Pacific", "ysnLiveFish", "CreationDate_Pacific"],
+    "Carcasses": ["globalid", "strStream", "dtmDate_Pacific", "ysnCarcasses", "CreationDate_Pacific"],
+}
+
+### Source fields read to build each sheet, keyed by sheet and then layer; SHAPE requests geometry. The child CreationDate fields keep the CreationDate_Pacific_x name of the joined sheets (see timezones.REPORT_TIMEZONE_COLUMNS).
+SOURCE_FIELDS = {
+    "Metadata": {
+        "Metadata": ["globalid", "strStream", "dtmDate", "strTideStart", "strWeather", "dtmManualTimeStart", "dtmManualTimeTurn", "dtmManualTimeEnd", "strStreamFlow", "strViewingConditions", "strViewingConditionsComments", "ysnLiveFish", "ysnCarcasses", "strComments", "CreationDate"],
+        "Observer": ["parentglobalid", "strFirstName", "strLastName"],
+    },
+    "Live Fish": {
+        "Metadata": ["globalid", "strStream", "dtmDate", "ysnLiveFish", "CreationDate"],
+        "LiveFish": ["globalid", "parentglobalid", "strLiveSpecies", "strLiveSex", "ysnPairs", "ysnReddBuilding", "intNumRedds", "strLiveFishRedd", "strReddID", "SHAPE", "CreationDate"],
+    },
+    "Carcasses": {
+        "Metadata": ["globalid", "strStream", "dtmDate", "ysnCarcasses", "CreationDate"],
+        "Carcass": ["globalid", "parentglobalid", "strCarcassSpecies", "strCarcassSex", "strDecomposedFresh", "intNumCarcasses", "ysnCountedLast", "SHAPE", "CreationDate"],
+    },
+}
+
+### Summary sheets are built from the surveys and the records of other sheets
+SHEET_DEPENDENCIES = {
+    "Live Fish Summary": ["Metadata", "Live Fish"],
+    "Carcass Summary": ["Metadata", "Carcasses"],
+}
+
+### Fields requested from every layer whatever the sheets
+KEY_FIELDS = {
+    "Metadata": ["objectid", "globalid"],
+    "LiveFish": ["objectid", "globalid", "parentglobalid"],
+    "Carcass": ["objectid", "globalid", "parentglobalid"],
+    "Observer": ["objectid", "globalid", "parentglobalid"],
+}
+
+
+def source_fields(sheets=tuple(SHEET_FIELDS)):
+    """Returns a dictionary keyed by layer name of the source fields read to build *sheets*, in first use order
+    : param sheets: Names of the sheets, see SHEET_FIELDS
+    """
+    fields = {layer: list(KEY_FIELDS[layer]) for layer in rest.LAYERS}
+    pending = list(sheets)
+    while pending:
+        sheet = pending.pop(0)
+        pending.extend(SHEET_DEPENDENCIES.get(sheet, []))
+        for layer, names in SOURCE_FIELDS.get(sheet, {}).items():
+            fields[layer].extend(name for name in names if name not in fields[layer])
+    return fields
+
+
+def layer_fields(sheets=tuple(SHEET_FIELDS), backup=False, geometry=True):
+    """Returns a dictionary keyed by layer name of (out_fields, return_geometry) for the layer queries
+    : param sheets: Names of the sheets to build, see SHEET_FIELDS
+    : param backup: When True, every field and the geometry of every layer are requested, as the raw backup workbook and snapshots need them
+    : param geometry: When False, no geometry is requested unless *backup* is True, see geometry.GEOMETRY_MODES
+    """
+    if backup:
+        return {layer: (rest.OBSERVER_FIELDS if layer == "Observer" else "*", True) for layer in rest.LAYERS}
+    return {layer: ([name for name in names if name != "SHAPE"], geometry and "SHAPE" in names) for layer, names in source_fields(sheets).items()}
@@ -0,0 +1,273 @@
+### Join and summary stage of the salmon spawning survey data tools.
+### This is the transformation half of WLP_Salmon_Spawning_DataJoinSummary. It takes the four raw DataFrames keyed by layer name ("Metadata", "LiveFish", "Carcass", "Observer") and returns the sheets of the summary workbook, without any ArcGIS connection.
+
+import numpy as np
+import pandas as pd
+
+from .instrument import count_rows, stage
+from .joins import SurveyIndex
+from .keys import add_guid_keys, key_columns
+from .roster import season_roster
+from .schema import apply_categories, equals
+from .spec import SHEET_FIELDS, SURVEY_FIELDS
+from .rules import CARCASS_RULES, LIVE_FISH_RULES, apply_rules, live_fish_form
+from .times import format_dates, survey_times
+from .timezones import REPORT_TIMEZONE_COLUMNS, convert_timezones, local_wall_time
+
+### Sheet names of the summary workbook, in export order
+SUMMARY_SHEETS = list(SHEET_FIELDS)
+
+
+### ArcGIS Online stores date-time information in UTC by default. This function uses the pytz package to convert time zones and can be used to convert from UTC ("UTC") to localized time. For example, localized "US/Pacific" is either Pacific Standard Time UTC-8 or Pacific Daylight Time UTC-7 depending upon time of year.
+def change_timezone_of_field(df, source_date_time_field, new_date_time_field_suffix, source_timezone, new_timezone):
+    """Returns the values in *source_date_time_field* with its timezone converted to a new timezone within a new field *new_date_time_field*
+    : param df: The name of the spatially enabled or pandas DataFrame containing datetime fields
+    : param source_date_time_field: The name of the datetime field whose timezone is to be changed
+    : param new_date_time_field_suffix: Suffix appended to the end of the name of the source datetime field. This is used to create the new date time field name.
+    : param source_timezone: The name of the source timezone
+    : param new_timezone: The name of the converted timezone. For possible values, see https://gist.github.com/heyalexej/8bf688fd67d7199be4a1682b3eec7568
+    """
+    # Define the source timezone in the source_date_time_field
+    df[source_date_time_field] = df[source_date_time_field].dt.tz_localize(source_timezone)
+    # Define the name of the new date time field
+    new_date_time_field = f"{source_date_time_field}{new_date_time_field_suffix}"
+    # Convert the datetime in the source_date_time_field to the new timezone in a new field called new_date_time_field
+    df[new_date_time_field] = df[source_date_time_field].dt.tz_convert(new_timezone)
+
+
+def filter_year(sedfMetadata, year):
+    """Returns the Metadata records whose dtmDate falls in *year*
+    : param sedfMetadata: The Metadata DataFrame
+    : param year: The year of interest, as text or integer
+    """
+    return sedfMetadata[sedfMetadata["dtmDate"].dt.year == int(year)]
+
+
+def observer_names(dfObserver, sedfMetadataYYYY, year):
+    """Returns the roster.ObserverRoster of the surveyor full names of the surveys of the year, cached per season
+    : param dfObserver: The Observer DataFrame with GUID keys from keys.add_guid_keys
+    : param sedfMetadataYYYY: The Metadata records of the year of interest, with GUID keys
+    : param year: The year of interest
+    """
+    hi, lo = (sedfMetadataYYYY[col].to_numpy() for col in key_columns("globalid"))
+    return season_roster(dfObserver, year, hi, lo)
+
+
+def join_metadata_observer(sedfMetadataYYYY, roster, time_conflicts=None):
+    """Returns dfMetadataObserver, the surveys of the year joined with their surveyor names, with total survey time (see times.survey_times) and the fields of the Metadata sheet, indexed by the globalid key
+    : param sedfMetadataYYYY: The Metadata records of the year of interest, with GUID keys
+    : param roster: Surveyor names from observer_names
+    : param time_conflicts: Optional list; when given, the globalid and HH:MM times of each survey whose start, turn and end times cannot be put in order are appended to it
+    """
+    ### Join sedfMetadataYYYY with the surveyor names; strFullName is categorical, its text is written at export
+    dfMetadataObserver = sedfMetadataYYYY.copy(deep=False)
+    dfMetadataObserver["strFullName"] = roster.full_names(*(dfMetadataObserver[col].to_numpy() for col in key_columns("globalid")))
+
+    ### Manipulate date/time fields in dfMetadataObserver
+    ## Calculate total survey time from the local survey date and the HH:MM times; the duration stays a timedelta until export
+    dates = local_wall_time(dfMetadataObserver["dtmDate_Pacific"]).dt.normalize()
+    dfTimes = survey_times(dates, dfMetadataObserver["dtmManualTimeStart"], dfMetadataObserver["dtmManualTimeEnd"], dfMetadataObserver["dtmManualTimeTurn"])
+    dfMetadataObserver["dtmManualTimeTotal"] = dfTimes["dtmManualTimeTotal"]
+    if time_conflicts is not None:
+        ## Surveys whose times conflict keep an empty total survey time; they are listed in the run report for correction
+        dfConflicts = dfMetadataObserver.loc[dfTimes["ysnTimeConflict"].to_numpy(), ["globalid", "dtmManualTimeStart", "dtmManualTimeTurn", "dtmManualTimeEnd"]]
+        time_conflicts.extend(dfConflicts.astype(object).where(dfConflicts.notna(), None).to_dict("records"))
+
+    ## Strip time from dtmDate_Pacific
+    dfMetadataObserver["dtmDate_Pacific"] = format_dates(dates, '%m/%d/%Y')
+
+    ### Reset dfMetadataObserver in desired order and drop unneeded fields
+    dfMetadataObserver = dfMetadataObserver.set_index(key_columns("globalid"))
+    dfMetadataObserver = dfMetadataObserver[SHEET_FIELDS["Metadata"]]
+    return dfMetadataObserver
+
+
+def join_live_fish(surveys, dfMetadataObserver, sedfLiveFishLocation):
+    """Returns dfMetadataObserverLiveFish, the live fish records joined with their survey, in (strStream, survey date) order
+    : param surveys: joins.SurveyIndex of the surveys
+    : param dfMetadataObserver: Surveys from join_metadata_observer
+    : param sedfLiveFishLocation: The LiveFish DataFrame with GUID keys
+    """
+    ### Attach the survey fields of the sheet to sedfLiveFishLocation; the survey index is already in sort order
+    dfMetadataObserverLiveFish = surveys.attach("Live Fish", dfMetadataObserver[SURVEY_FIELDS["Live Fish"]], sedfLiveFishLocation)
+
+    ## Reset dfMetadataObserverLiveFish in desired order and drop unneeded fields
+    dfMetadataObserverLiveFish = dfMetadataObserverLiveFish[SHEET_FIELDS["Live Fish"]]
+    return dfMetadataObserverLiveFish
+
+
+def join_carcasses(surveys, dfMetadataObserver, sedfCarcassLocation):
+    """Returns dfMetadataObserverCarcasses, the carcass records joined with their survey, in (strStream, survey date) order
+    : param surveys: joins.SurveyIndex of the surveys
+    : param dfMetadataObserver: Surveys from join_metadata_observer
+    : param sedfCarcassLocation: The Carcass DataFrame with GUID keys
+    """
+    ### Attach the survey fields of the sheet to sedfCarcassLocation; the survey index is already in sort order
+    dfMetadataObserverCarcasses = surveys.attach("Carcasses", dfMetadataObserver[SURVEY_FIELDS["Carcasses"]], sedfCarcassLocation)
+    ## Reset dfMetadataObserverCarcasses in desired order and drop unneeded fields
+    dfMetadataObserverCarcasses = dfMetadataObserverCarcasses[SHEET_FIELDS["Carcasses"]]
+    return dfMetadataObserverCarcasses
+
+
+def _sum_live_fish(df, by):
+    ## Group by GUID and species; sum the numeric fields
+    dfLiveFishSummary = df.groupby(by, as_index=False, observed=True).agg(
+        intNumRedds=('intNumRedds', 'sum'),
+        intReddBuilding=('intReddBuilding', 'sum'),
+        dblPairs=('dblPairs', 'sum'),
+        intMales=('intMales', 'sum'),
+        intFemales=('intFemales', 'sum'),
+        intUnknown=('intUnknown', 'sum')
+    )
+    ## Create field for sum of live fish
+    dfLiveFishSummary['intLiveFish'] = dfLiveFishSummary[['intMales', 'intFemales', 'intUnknown']].sum(axis=1)
+    return dfLiveFishSummary
+
+
+def derive_live_fish(dfMetadataObserverLiveFish):
+    """Returns the live fish records with the count fields of rules.LIVE_FISH_RULES
+    : param dfMetadataObserverLiveFish: Live fish records from join_live_fish
+    """
+    ### Live fish data entered prior to 11/5/2021 are in different format; each record's form version selects its rules so all records are derived and grouped in one pass
+    dfLiveFish = dfMetadataObserverLiveFish.copy(deep=False)
+    dfLiveFish["intLiveFishForm"] = live_fish_form(dfLiveFish["CreationDate_Pacific_x"])
+    apply_rules(dfLiveFish, LIVE_FISH_RULES)
+    ## Records without a creation date match no form version and are left out, as before
+    if (dfLiveFish["intLiveFishForm"] < 0).any():
+        dfLiveFish = dfLiveFish[dfLiveFish["intLiveFishForm"] >= 0]
+    return dfLiveFish
+
+
+def group_live_fish(dfLiveFish):
+    """Returns dfLiveFishSummary, the live fish counts per survey and species
+    : param dfLiveFish: Live fish records from derive_live_fish
+    """
+    return _sum_live_fish(dfLiveFish, key_columns("globalid") + ['strLiveSpecies'])
+
+
+def summarize_live_fish(dfMetadataObserverLiveFish):
+    """Returns dfLiveFishSummary, the live fish counts per survey and species
+    : param dfMetadataObserverLiveFish: Live fish records from join_live_fish
+    """
+    return group_live_fish(derive_live_fish(dfMetadataObserverLiveFish))
+
+
+def derive_carcasses(dfMetadataObserverCarcasses):
+    """Returns the carcass records with the count fields of rules.CARCASS_RULES
+    : param dfMetadataObserverCarcasses: Carcass records from join_carcasses
+    """
+    dfMetadataObserverCarcasses = dfMetadataObserverCarcasses.copy()
+    ### Create fields for counting carcasses; see rules.CARCASS_RULES for the null ysnCountedLast assumptions
+    apply_rules(dfMetadataObserverCarcasses, CARCASS_RULES)
+    return dfMetadataObserverCarcasses
+
+
+def group_carcasses(dfMetadataObserverCarcasses):
+    """Returns dfCarcassSummary, the carcass counts per survey and species
+    : param dfMetadataObserverCarcasses: Carcass records from derive_carcasses
+    """
+    ## Group by GUID and species; sum the numeric fields; add field for new carcasses
+    dfCarcassSummary = dfMetadataObserverCarcasses.groupby(by=key_columns("globalid") + ['strCarcassSpecies'], as_index=False, observed=True).agg(
+        intNumCarcasses=('intNumCarcasses', 'sum'),
+        intCountedLast=('intCountedLast', 'sum'),
+        intNewMales=('intNewMales', 'sum'),
+        intNewFemales=('intNewFemales', 'sum'),
+        intNewJuveniles=('intNewJuveniles', 'sum'),
+        intNewUnknown=('intNewUnknown', 'sum'),
+    )
+    dfCarcassSummary['intNewNumCarcasses'] = dfCarcassSummary['intNumCarcasses'] - dfCarcassSummary['intCountedLast']
+    return dfCarcassSummary
+
+
+def summarize_carcasses(dfMetadataObserverCarcasses):
+    """Returns dfCarcassSummary, the carcass counts per survey and species
+    : param dfMetadataObserverCarcasses: Carcass records from join_carcasses
+    """
+    return group_carcasses(derive_carcasses(dfMetadataObserverCarcasses))
+
+
+def merge_summaries(surveys, dfMetadataObserver, dfLiveFishSummary, dfCarcassSummary):
+    """Returns (dfLiveFishSummary, dfCarcassSummary) joined back onto every survey of the year in (strStream, survey date) order, with zero counts for surveys that saw no live fish or carcasses
+    : param surveys: joins.SurveyIndex of the surveys
+    : param dfMetadataObserver: Surveys from join_metadata_observer
+    : param dfLiveFishSummary: Live fish counts from summarize_live_fish
+    : param dfCarcassSummary: Carcass counts from summarize_carcasses
+    """
+    ### Copy dfMetadataObserver as start of summary data frames
+    dfSummary = dfMetadataObserver.copy()
+    # Calculate zeroes; the fields are new, so surveys not marked "no" get NaN, also in a season without surveys
+    dfSummary['intLiveFish'] = np.where(equals(dfSummary['ysnLiveFish'], "no"), 0.0, np.nan)
+    dfSummary['intCarcasses'] = np.where(equals(dfSummary['ysnCarcasses'], "no"), 0.0, np.nan)
+    # Join
+    dfLiveFishSummary = surveys.attach("Live Fish Summary", dfSummary, dfLiveFishSummary, how="left", on=key_columns("globalid"))
+    dfCarcassSummary = surveys.attach("Carcass Summary", dfSummary, dfCarcassSummary, how="left", on=key_columns("globalid"))
+
+    ### Cleanup dfLiveFishSummary
+    dfLiveFishSummary.loc[(dfLiveFishSummary["intLiveFish_x"].isna()), 'intLiveFish_x'] = 0
+    dfLiveFishSummary.loc[(dfLiveFishSummary["intLiveFish_y"].isna()), 'intLiveFish_y'] = 0
+    dfLiveFishSummary["intLiveFish"] = dfLiveFishSummary["intLiveFish_x"] + dfLiveFishSummary["intLiveFish_y"]
+    dfLiveFishSummary = dfLiveFishSummary[SHEET_FIELDS["Live Fish Summary"]]
+
+    ### Cleanup dfCarcassSummary
+    dfCarcassSummary.loc[(dfCarcassSummary["intCarcasses"].isna()), 'intCarcasses'] = 0
+    dfCarcassSummary.loc[(dfCarcassSummary["intNumCarcasses"].isna()), 'intNumCarcasses'] = 0
+    dfCarcassSummary["intTotalCarcasses"] = dfCarcassSummary["intCarcasses"] + dfCarcassSummary["intNumCarcasses"]
+    dfCarcassSummary = dfCarcassSummary[SHEET_FIELDS["Carcass Summary"]]
+    return dfLiveFishSummary, dfCarcassSummary
+
+
+def build_summary(frames, year, timings=None, report=None, memo=None):
+    """Returns a dictionary of the summary workbook sheets keyed by sheet name (see SUMMARY_SHEETS)
+    : param frames: Dictionary of raw DataFrames keyed by layer name, with naive UTC datetime fields
+    : param year: The year of interest
+    : param timings: Optional dictionary; when given, the seconds taken by the survey index and by each join are added to it
+    : param report: Optional instrument.RunReport recording each stage
+    : param memo: Optional memo.SummaryMemo, or aggregate.SurveyAggregates; when given, only the records of surveys without stored summaries, or of records changed since the last run, are derived and grouped
+    """
+    with stage(report, "categories", count_rows(frames)) as record:
+        ## Coded fields become categoricals unless the source already loaded them with their domains
+        frames = apply_categories(frames)
+        record["intRowsOut"] = count_rows(frames)
+    with stage(report, "timezones", count_rows(frames)) as record:
+        frames = convert_timezones(frames, REPORT_TIMEZONE_COLUMNS)
+        record["intRowsOut"] = count_rows(frames)
+    with stage(report, "guid_keys", count_rows(frames)) as record:
+        frames = add_guid_keys(frames)
+        record["intRowsOut"] = count_rows(frames)
+    with stage(report, "observers", len(frames["Observer"])) as record:
+        sedfMetadataYYYY = filter_year(frames["Metadata"], year)
+        roster = observer_names(frames["Observer"], sedfMetadataYYYY, year)
+        record["timeConflicts"] = []
+        dfMetadataObserver = join_metadata_observer(sedfMetadataYYYY, roster, record["timeConflicts"])
+        record["intRowsOut"] = len(dfMetadataObserver)
+    with stage(report, "joins", count_rows([dfMetadataObserver, frames["LiveFish"], frames["Carcass"]])) as record:
+        ## Index the surveys once and order them once on stream and Pacific survey date
+        surveys = SurveyIndex(dfMetadataObserver, local_wall_time(sedfMetadataYYYY["dtmDate_Pacific"]).dt.normalize())
+        dfMetadataObserverLiveFish = join_live_fish(surveys, dfMetadataObserver, frames["LiveFish"])
+        dfMetadataObserverCarcasses = join_carcasses(surveys, dfMetadataObserver, frames["Carcass"])
+        record["intRowsOut"] = count_rows([dfMetadataObserverLiveFish, dfMetadataObserverCarcasses])
+    if memo is None:
+        with stage(report, "rules", count_rows([dfMetadataObserverLiveFish, dfMetadataObserverCarcasses])) as record:
+            dfLiveFish = derive_live_fish(dfMetadataObserverLiveFish)
+            dfCarcasses = derive_carcasses(dfMetadataObserverCarcasses)
+            record["intRowsOut"] = count_rows([dfLiveFish, dfCarcasses])
+        with stage(report, "groupby", count_rows([dfLiveFish, dfCarcasses])) as record:
+            dfLiveFishSummary = group_live_fish(dfLiveFish)
+            dfCarcassSummary = group_carcasses(dfCarcasses)
+            record["intRowsOut"] = count_rows([dfLiveFishSummary, dfCarcassSummary])
+    else:
+        with stage(report, "memo", count_rows([dfMetadataObserverLiveFish, dfMetadataObserverCarcasses])) as record:
+            dfLiveFishSummary = memo.summarize(year, "Live Fish", dfMetadataObserverLiveFish, derive_live_fish, group_live_fish)
+            dfCarcassSummary = memo.summarize(year, "Carcasses", dfMetadataObserverCarcasses, derive_carcasses, group_carcasses)
+            ## The Carcasses sheet shows the carcass count fields of every record, as the script wrote it
+            dfCarcasses = derive_carcasses(dfMetadataObserverCarcasses)
+            record["intRowsOut"] = count_rows([dfLiveFishSummary, dfCarcassSummary])
+            for stats in memo.stats.values():
+                for key, value in stats.items():
+                    record[key] = record.get(key, 0) + value
+    with stage(report, "merge", count_rows([dfLiveFishSummary, dfCarcassSummary])) as record:
+        dfLiveFishSummary, dfCarcassSummary = merge_summaries(surveys, dfMetadataObserver, dfLiveFishSummary, dfCarcassSummary)
+        record["intRowsOut"] = count_rows([dfLiveFishSummary, dfCarcassSummary])
+    if timings is not None:
+        timings.update(surveys.timings)
+    return dict(zip(SUMMARY_SHEETS, [dfMetadataObserver, dfMetadataObserverLiveFish, dfCarcasses, dfLiveFishSummary, dfCarcassSummary]))
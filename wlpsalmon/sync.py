@@ -0,0 +1,130 @@
+### Local sync cache for the salmon spawning survey feature service.
+### The first run does a full pull of each layer. Later runs request only records whose EditDate is at or after the stored high-water mark and merge them into the cached records by globalid. Records deleted from the service are found by requesting the object ids of the layer, which takes one request, and are dropped from the cache. The globalids pulled and deleted by each sync are kept in SyncCache.changes.
+
+import json
+import os
+import time
+
+import pandas as pd
+
+from . import rest
+
+### Name of the file holding the high-water marks within the cache directory
+STATE_FILE = "sync_state.json"
+
+
+def edit_date_where(high_water_mark, edit_date_field="EditDate"):
+    """Returns a where clause selecting records edited at or after *high_water_mark*. The comparison is inclusive because the service truncates timestamps in where clauses; records already in the cache are replaced by the merge.
+    : param high_water_mark: Naive UTC timestamp of the most recent edit in the cache
+    : param edit_date_field: The name of the edit tracking field
+    """
+    return f"{edit_date_field} >= TIMESTAMP '{pd.Timestamp(high_water_mark).strftime('%Y-%m-%d %H:%M:%S')}'"
+
+
+def drop_deleted(dfCached, object_ids, key="objectid"):
+    """Returns (dfCached, dfDeleted): the cached records whose object id is still on the service, and the others
+    : param dfCached: DataFrame of previously synced records
+    : param object_ids: Object ids of every record of the layer on the service, from rest.query_ids
+    : param key: The name of the object id field
+    """
+    deleted = ~dfCached[key].isin(object_ids)
+    if not deleted.any():
+        return dfCached, dfCached.iloc[:0]
+    return dfCached[~deleted].reset_index(drop=True), dfCached[deleted]
+
+
+def merge_by_globalid(dfCached, dfDelta, key="globalid"):
+    """Returns the cached records updated with the delta records. A record found in both is replaced by its delta version.
+    : param dfCached: DataFrame of previously synced records
+    : param dfDelta: DataFrame of records edited since the last sync
+    : param key: The name of the unique record identifier field
+    """
+    if dfDelta.empty:
+        return dfCached
+    dfMerged = pd.concat([dfCached[~dfCached[key].isin(dfDelta[key])], dfDelta], ignore_index=True)
+    return dfMerged
+
+
+class SyncCache:
+    """Cache directory holding one pickled DataFrame per layer plus the high-water mark of each layer
+    : param cache_dir: Directory for the cached layers; created if it does not exist
+    : param service_url: The url of the FeatureServer
+    : param token: Optional ArcGIS token
+    """
+
+    def __init__(self, cache_dir, service_url=rest.SERVICE_URL, token=None):
+        self.cache_dir = cache_dir
+        self.service_url = service_url
+        self.token = token
+        os.makedirs(cache_dir, exist_ok=True)
+        self.state = self._read_state()
+        # Globalids pulled and deleted by the last sync of each layer, or None after a full pull
+        self.changes = {}
+
+    def _read_state(self):
+        path = os.path.join(self.cache_dir, STATE_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_state(self):
+        with open(os.path.join(self.cache_dir, STATE_FILE), "w") as f:
+            json.dump(self.state, f, indent=2)
+
+    def _layer_path(self, layer):
+        return os.path.join(self.cache_dir, layer + ".pkl")
+
+    def cached(self, layer):
+        """Returns the cached DataFrame of a layer, or None if the layer has never been synced
+        : param layer: The name of the layer as found in rest.LAYERS
+        """
+        path = self._layer_path(layer)
+        if layer not in self.state or not os.path.exists(path):
+            return None
+        return pd.read_pickle(path)
+
+    def sync_layer(self, layer, out_fields="*", stats=None):
+        """Returns the up to date DataFrame of a layer after pulling the records edited since the last sync
+        : param layer: The name of the layer as found in rest.LAYERS
+        : param out_fields: Field names to request
+        : param stats: Optional rest.TransferStats counting the requests, pages and bytes
+        """
+        dfCached = self.cached(layer)
+        if layer == "Observer" and out_fields == "*":
+            out_fields = rest.OBSERVER_FIELDS
+        high_water_mark = None if dfCached is None else self.state[layer]["high_water_mark"]
+        where = "1=1" if high_water_mark is None else edit_date_where(high_water_mark)
+        dfDelta = rest.fetch_layer(self.service_url, layer, where=where, out_fields=out_fields, token=self.token, stats=stats)
+        if dfCached is None:
+            df = dfDelta
+            self.changes[layer] = None
+        else:
+            ## Deleted records cannot be found by EditDate; every object id still on the service is listed instead
+            object_ids = rest.query_ids(rest.layer_url(self.service_url, layer), token=self.token, stats=stats)
+            dfCached, dfDeleted = drop_deleted(dfCached, object_ids)
+            df = merge_by_globalid(dfCached, dfDelta)
+            self.changes[layer] = {"upserted": dfDelta["globalid"].tolist() if len(dfDelta) else [], "deleted": dfDeleted["globalid"].tolist()}
+
+        df.to_pickle(self._layer_path(layer))
+        high_water_mark = df["EditDate"].max() if len(df) else None
+        self.state[layer] = {
+            "high_water_mark": None if pd.isna(high_water_mark) else pd.Timestamp(high_water_mark).isoformat(),
+            "last_sync": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "full_pull": dfCached is None,
+            "records_pulled": len(dfDelta),
+            "records_deleted": 0 if self.changes[layer] is None else len(self.changes[layer]["deleted"]),
+            "records_cached": len(df),
+        }
+        self._write_state()
+        return df
+
+    def sync(self, layers=tuple(rest.LAYERS), transfer=None):
+        """Returns a dictionary of up to date DataFrames keyed by layer name
+        : param layers: Names of the layers to sync
+        : param transfer: Optional dictionary; when given, the rest.TransferStats of each layer are added to it keyed by layer name
+        """
+        transfer = {} if transfer is None else transfer
+        for layer in layers:
+            transfer[layer] = rest.TransferStats()
+        return {layer: self.sync_layer(layer, stats=transfer[layer]) for layer in layers}
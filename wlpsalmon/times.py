@@ -0,0 +1,61 @@
+### Survey times: the HH:MM text of the manual start, turn and end times, parsed into minute offsets and added to the survey date.
+### A season holds at most a few hundred distinct time texts, so each distinct text is parsed once and its offset is taken for every survey. No date is formatted and parsed back. Durations stay timedelta64 until export writes them as text.
+
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 24 * 60
+
+### HH:MM text of a time of day; one-digit hours are accepted, as the "%H:%M" format did
+TIME_PATTERN = r"^\s*(\d{1,2}):(\d{2})\s*$"
+
+
+def minute_offsets(times):
+    """Returns a float64 array of the minutes after midnight of HH:MM texts, NaN for nulls and for text that is not a time of day
+    : param times: Series of HH:MM text, plain or categorical
+    """
+    codes, uniques = pd.factorize(times)
+    parts = pd.Series(np.asarray(uniques, dtype=object), dtype=object).astype(str).str.extract(TIME_PATTERN)
+    hours = pd.to_numeric(parts[0]).to_numpy(dtype=float)
+    minutes = pd.to_numeric(parts[1]).to_numpy(dtype=float)
+    offsets = np.where((hours < 24) & (minutes < 60), hours * 60 + minutes, np.nan)
+    ## Code -1, a null time, takes the trailing NaN
+    return np.append(offsets, np.nan)[codes]
+
+
+def format_dates(dates, date_format="%m/%d/%Y"):
+    """Returns the dates as text, formatting each distinct date once; None for NaT
+    : param dates: Series of naive datetimes
+    : param date_format: strftime format
+    """
+    codes, uniques = pd.factorize(dates)
+    text = np.append(pd.DatetimeIndex(uniques).strftime(date_format).to_numpy(dtype=object), None)
+    return pd.Series(text[codes], index=dates.index, dtype="str", name=dates.name)
+
+
+def survey_times(dates, start, end, turn=None):
+    """Returns a DataFrame indexed as *dates* with the start, turn and end datetimes of each survey, its duration, dtmManualTimeTotal, as timedelta64, and ysnTimeConflict. The turn time decides whether a survey crossed midnight: a survey is in order when start <= turn <= end on the survey date, or when the end is earlier than the start and the turn falls before midnight (turn >= start) or after it (turn <= end), in which case the end, and a turn after midnight, are taken on the next day. Surveys whose times cannot be put in that order, for example 10:00 to 09:30 turning at 09:45, or an end earlier than the start with no turn, get NaT turn, end and duration and ysnTimeConflict True. Start or end times that are null or not HH:MM give NaT without a conflict.
+    : param dates: Series of the naive local survey dates, at midnight
+    : param start: Series of the HH:MM start times
+    : param end: Series of the HH:MM end times
+    : param turn: Optional Series of the HH:MM turn times; without it every survey is taken as having no turn time
+    """
+    start_minutes = minute_offsets(start)
+    end_minutes = minute_offsets(end)
+    turn_minutes = minute_offsets(turn) if turn is not None else np.full(len(dates), np.nan)
+    no_turn = np.isnan(turn_minutes)
+    ## NaN comparisons are False, so a survey missing its start or end time is neither in order nor in conflict
+    same_day = (start_minutes <= end_minutes) & (no_turn | ((start_minutes <= turn_minutes) & (turn_minutes <= end_minutes)))
+    crossing = (end_minutes < start_minutes) & ((turn_minutes >= start_minutes) | (turn_minutes <= end_minutes))
+    conflict = (np.isfinite(start_minutes) & np.isfinite(end_minutes)) & ~(same_day | crossing)
+    end_minutes = np.where(conflict, np.nan, end_minutes + np.where(crossing, MINUTES_PER_DAY, 0))
+    turn_minutes = np.where(conflict, np.nan, turn_minutes + np.where(crossing & (turn_minutes < start_minutes), MINUTES_PER_DAY, 0))
+    times = {"dtmManualTimeStart_dt": start_minutes}
+    if turn is not None:
+        times["dtmManualTimeTurn_dt"] = turn_minutes
+    times["dtmManualTimeEnd_dt"] = end_minutes
+    midnight = dates.to_numpy(dtype="datetime64[ns]")
+    df = pd.DataFrame({field: midnight + pd.to_timedelta(minutes, unit="m").to_numpy() for field, minutes in times.items()}, index=dates.index)
+    df["dtmManualTimeTotal"] = pd.to_timedelta(end_minutes - start_minutes, unit="m")
+    df["ysnTimeConflict"] = conflict
+    return df
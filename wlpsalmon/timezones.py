@@ -0,0 +1,95 @@
+### Timezone conversion for the datetime fields of the survey layers.
+### ArcGIS Online stores date-time information in UTC. The UTC instants of every datetime field of a frame are read once as int64 nanoseconds, and the local wall time is computed from a precomputed table of the timezone's DST transitions (taken from pytz) with one np.searchsorted per column. _Pacific fields are only created for the fields the report uses.
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytz
+
+### Datetime fields the summary workbook reads in Pacific time, keyed by layer name. Other fields keep only their UTC value. The child CreationDate_Pacific fields are not exported but keep the CreationDate_Pacific_x name of the joined sheets.
+REPORT_TIMEZONE_COLUMNS = {"Metadata": ["dtmDate", "CreationDate"], "LiveFish": ["CreationDate"], "Carcass": ["CreationDate"]}
+
+_NAT = np.iinfo(np.int64).min
+
+
+@lru_cache(maxsize=None)
+def dst_table(tz_name):
+    """Returns (transitions, offsets): the UTC instants in int64 nanoseconds at which the UTC offset of *tz_name* changes, and the offset in nanoseconds that applies from each of them
+    : param tz_name: The name of the timezone, for example "US/Pacific"
+    """
+    tz = pytz.timezone(tz_name)
+    transition_times = getattr(tz, "_utc_transition_times", None)
+    if not transition_times:
+        # UTC and fixed offset zones
+        offset = getattr(tz, "_utcoffset", None) or pd.Timedelta(0)
+        return np.array([_NAT + 1], dtype=np.int64), np.array([pd.Timedelta(offset).value], dtype=np.int64)
+    # The first transition is datetime(1, 1, 1), outside the nanosecond range; it stands for "always"
+    transitions = np.array([_NAT + 1] + [pd.Timestamp(t).value for t in transition_times[1:]], dtype=np.int64)
+    offsets = np.array([pd.Timedelta(info[0]).value for info in tz._transition_info], dtype=np.int64)
+    return transitions, offsets
+
+
+def utc_offsets(utc_ns, tz_name):
+    """Returns the UTC offset of *tz_name* in int64 nanoseconds at each UTC instant; NaT instants get 0
+    : param utc_ns: Array of UTC instants in int64 nanoseconds, NaT as the int64 minimum
+    : param tz_name: The name of the timezone
+    """
+    transitions, offsets = dst_table(tz_name)
+    utc_ns = np.asarray(utc_ns, dtype=np.int64)
+    result = offsets[np.searchsorted(transitions, utc_ns, side="right") - 1]
+    result[utc_ns == _NAT] = 0
+    return result
+
+
+def utc_int64(series, source_timezone="UTC"):
+    """Returns the UTC instants of a datetime Series as int64 nanoseconds, NaT as the int64 minimum
+    : param series: Naive datetimes in *source_timezone*, or timezone aware datetimes
+    : param source_timezone: The timezone of naive datetimes
+    """
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+    elif source_timezone != "UTC":
+        series = series.dt.tz_localize(source_timezone).dt.tz_convert("UTC").dt.tz_localize(None)
+    return series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def local_wall_time(series, tz_name=None):
+    """Returns the naive local wall time of a datetime Series, computed from the DST transition table
+    : param series: Timezone aware datetimes, or naive UTC datetimes when *tz_name* is given
+    : param tz_name: The target timezone; defaults to the timezone of *series*
+    """
+    if tz_name is None:
+        tz_name = str(series.dt.tz)
+    utc_ns = utc_int64(series)
+    local_ns = utc_ns + utc_offsets(utc_ns, tz_name)
+    local_ns[utc_ns == _NAT] = _NAT
+    return pd.Series(local_ns.view("datetime64[ns]"), index=series.index, name=series.name)
+
+
+def _aware(utc_ns, index, tz_name):
+    # Relabels UTC instants with a timezone; no wall time is computed until a .dt accessor or export needs it
+    return pd.Series(utc_ns.view("datetime64[ns]"), index=index).dt.tz_localize("UTC").dt.tz_convert(tz_name)
+
+
+def convert_timezones(frames, columns=None, source_timezone="UTC", new_timezone="US/Pacific", suffix="_Pacific"):
+    """Returns shallow copies of *frames* in which every naive datetime field is localized to UTC, and fields listed in *columns* get a converted copy with *suffix*
+    : param frames: Dictionary of raw DataFrames keyed by layer name
+    : param columns: Dictionary of the fields to convert keyed by layer name, for example REPORT_TIMEZONE_COLUMNS; None converts every datetime field, as the backup workbook needs
+    : param source_timezone: The timezone of the naive datetime fields
+    : param new_timezone: The name of the converted timezone
+    : param suffix: Suffix appended to the name of each converted field
+    """
+    converted = {}
+    for layer, df in frames.items():
+        df = df.copy(deep=False)
+        datetime_cols = list(df.select_dtypes(include=['datetime64']).columns)
+        wanted = datetime_cols if columns is None else [col for col in columns.get(layer, []) if col in datetime_cols]
+        ## Read the UTC instants of all datetime fields once
+        utc = {col: utc_int64(df[col], source_timezone) for col in datetime_cols}
+        for col in datetime_cols:
+            df[col] = _aware(utc[col], df.index, "UTC")
+        for col in wanted:
+            df[col + suffix] = _aware(utc[col], df.index, new_timezone)
+        converted[layer] = df
+    return converted